@@ -1 +1,29 @@
-from .api import *
+import sys
+
+# Named one by one rather than with ``from .api import *``, which would
+# import requests for RequestException straight away.
+from .api import (BadgeKitAPI, BadgeKitException, APIError,
+        ResourceNotFound, ResourceConflict, ValidationError)
+
+
+__all__ = [
+        'BadgeKitAPI',
+        'BadgeKitException',
+        'APIError',
+        'ResourceNotFound',
+        'ResourceConflict',
+        'ValidationError',
+        'RequestException',
+        ]
+
+
+if sys.version_info < (3, 7):
+    from .api import RequestException
+
+
+def __getattr__(name):
+    # RequestException is loaded from requests on first use; see badgekit.api.
+    if name == 'RequestException':
+        from .api import RequestException
+        return RequestException
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
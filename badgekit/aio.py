@@ -0,0 +1,211 @@
+"""
+An :mod:`asyncio` interface to the BadgeKit API.
+
+:class:`AsyncBadgeKitAPI` offers the same ``list``, ``get``, ``create``,
+``ping``, ``server_version``, ``require_server_version`` and
+``get_public_url`` methods as :class:`badgekit.BadgeKitAPI`, as coroutines
+running on an :mod:`aiohttp` client session.  It requires Python 3 and the
+``aiohttp`` package (``pip install badgekit-api-client[async]``).
+
+.. code-block:: python
+
+    async with AsyncBadgeKitAPI('http://api.example.com/', 'secr3t') as bk:
+        badges = await bk.list('badge', system='mysystem')
+
+Paths, errors and the signed JWT claims are exactly those of the
+synchronous client, so the two can be used side by side.
+"""
+
+import asyncio
+try:
+    from urlparse import urljoin
+except ImportError:
+    from urllib.parse import urljoin
+
+import aiohttp
+import requests
+
+from .api import (APIError, raise_error, _api_plural, _make_path,
+        _make_auth, _check_server_version, _form_fields, default_json_loads)
+
+
+__all__ = [
+        'AsyncBadgeKitAPI',
+        ]
+
+
+def _forwarded_headers(request):
+    """
+    The headers of a request prepared by :mod:`requests` to send with
+    :mod:`aiohttp`, which works out the body's length itself.  The
+    ``Content-Type`` is kept: aiohttp would call an encoded form
+    ``application/octet-stream``.
+    """
+    return dict((name, value) for name, value in request.headers.items()
+            if name.lower() != 'content-length')
+
+
+class AsyncBadgeKitAPI(object):
+    """
+    A coroutine-based interface with the BadgeKit API server.
+
+    :param baseurl: the URL of the badgekit-api server.
+    :param secret: the client secret.
+    :param key: the name of the client secret, for the server to see.
+    :param defaults: a dict of default arguments, which can be overridden by
+        actual arguments to the methods.
+    :param max_concurrency: the most requests that may be in flight at once;
+        further calls wait their turn.  This also sizes the connection pool.
+    :param session: an :class:`aiohttp.ClientSession` to use instead of the
+        one the client builds for itself on first use.
+    :param json_loads: a function decoding response bodies from bytes; see
+        :class:`badgekit.BadgeKitAPI`.
+
+    The client must be used from a single event loop.  Use it as an async
+    context manager, or ``await`` :meth:`close`, to release its connections.
+    """
+    def __init__(self, baseurl, secret, key='master', defaults=None,
+            max_concurrency=100, session=None, json_loads=None):
+        self.baseurl = baseurl
+        self.auth = _make_auth(secret, key)
+
+        if defaults:
+            self.defaults = dict(defaults)
+        else:
+            self.defaults = {}
+
+        self.json_loads = json_loads or default_json_loads()
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._owns_session = session is None
+        self.session = session
+
+    def _get_session(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+
+    async def close(self):
+        """
+        Closes the client's own session.  A ``session`` passed in to the
+        constructor is left for its owner to close.
+        """
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _sign(self, method, url, data=None, auth=True):
+        """
+        Prepares the request with :mod:`requests`, so that its body is
+        encoded, and its JWT claims computed, exactly as the synchronous
+        client would.
+        """
+        request = requests.Request(method, url, data=data).prepare()
+        if auth:
+            self.auth(request)
+        return request
+
+    async def _send(self, method, url, data=None, auth=True):
+        """
+        Sends one request, and returns ``(status, decoded body, request)``.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            # Signed only once it may be sent, so that a request that waited
+            # its turn does not go out with an expired JWT.
+            request = self._sign(method, url, data, auth)
+            async with self._get_session().request(
+                    request.method, request.url,
+                    data=request.body,
+                    headers=_forwarded_headers(request)) as resp:
+                content = await resp.read()
+                return resp.status, self._json_loads(content), request
+
+    def _json_loads(self, content):
+        try:
+            return self.json_loads(content)
+        except ValueError as e:
+            raise APIError("Invalid JSON in BadgeKit response")
+
+    async def ping(self):
+        """Tests the server's availability - returns True if
+        server is available, False otherwise."""
+        try:
+            status, resp_dict, request = await self._send(
+                    'GET', urljoin(self.baseurl, '/'))
+            return status == 200 and resp_dict['app'] == 'BadgeKit API'
+        except aiohttp.ClientConnectionError:
+            return False
+
+    async def list(self, kind, **kwargs):
+        """
+        Lists objects present in some container or badge.
+        See :meth:`badgekit.BadgeKitAPI.list`.
+        """
+        path_args = dict(self.defaults, **kwargs)
+        path = _make_path(_api_plural(kind), **path_args)
+        status, resp_obj, request = await self._send(
+                'GET', urljoin(self.baseurl, path))
+        if status != 200:
+            raise_error(resp_obj, request, status)
+        return resp_obj
+
+    async def get(self, **kwargs):
+        """
+        Retrieves some object from the API.
+        See :meth:`badgekit.BadgeKitAPI.get`.
+        """
+        path_args = dict(self.defaults, **kwargs)
+        path = _make_path(**path_args)
+        status, resp_obj, request = await self._send(
+                'GET', urljoin(self.baseurl, path))
+        if status != 200:
+            raise_error(resp_obj, request, status)
+        return resp_obj
+
+    async def create(self, kind, data, **kwargs):
+        """
+        Create an object in the API.
+        See :meth:`badgekit.BadgeKitAPI.create`.
+        """
+        path_args = dict(self.defaults, **kwargs)
+        path = _make_path(_api_plural(kind), **path_args)
+        if isinstance(data, dict):
+            data = _form_fields(data)
+        status, resp_obj, request = await self._send(
+                'POST', urljoin(self.baseurl, path), data=data)
+        if status != 201:
+            raise_error(resp_obj, request, status)
+        return resp_obj
+
+    async def server_version(self):
+        """Returns the server's reported version as a string."""
+        status, resp_dict, request = await self._send(
+                'GET', urljoin(self.baseurl, '/'))
+        return resp_dict['version']
+
+    async def require_server_version(self, required_version):
+        """
+        Require a certain version of the BadgeKit API Server.
+        See :meth:`badgekit.BadgeKitAPI.require_server_version`.
+        """
+        version = await self.server_version()
+        _check_server_version(version, required_version, self.baseurl)
+
+    async def get_public_url(self, url):
+        """
+        GET a URL, and parse its JSON, checking for known errors.  Useful for
+        public URLs on the BadgeKit API server (e.g. assertions).
+        """
+        status, resp_obj, request = await self._send('GET', url, auth=False)
+        if status != 200:
+            raise_error(resp_obj, request, status)
+        return resp_obj
@@ -32,37 +32,55 @@ can import them straight from :mod:`badgekit`.
 """
 
 
-import requests
+# requests, requests_jwt and json are imported where they are first used,
+# so that ``import badgekit`` stays cheap for short-lived processes.
 import posixpath
-import requests_jwt
-from distutils.version import StrictVersion
+import re
+import sys
 try:
-    from urlparse import urljoin
+    from urlparse import urljoin, urlsplit
     from urllib import urlencode
 except ImportError:
-    from urllib.parse import urljoin, urlencode
-import json
-import collections
-from requests.exceptions import RequestException
+    from urllib.parse import urljoin, urlsplit, urlencode
+import threading
+import time
 
 
 __all__ = [
         'BadgeKitAPI',
         'BadgeKitException',
-        'RequestException',
         'APIError',
         'ResourceNotFound',
         'ResourceConflict',
         'ValidationError',
+        'RequestException',
         ]
 
 
+if sys.version_info < (3, 7):
+    # No module __getattr__ before Python 3.7: import it up front.
+    from requests.exceptions import RequestException
+
+
+def __getattr__(name):
+    # Loads :class:`requests.RequestException` on first use.
+    if name == 'RequestException':
+        from requests.exceptions import RequestException
+        globals()['RequestException'] = RequestException
+        return RequestException
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
 class BadgeKitException(Exception):
     pass
 
 class APIError(BadgeKitException):
     "Thrown for unexpected problems, maybe problems in this library, or invalid JSON from the server."
 
+    #: The HTTP status of the response, if the server sent an error this
+    #: library does not know.
+    status = None
+
 class CodedBadgeKitException(BadgeKitException):
     def __init__(self, resp_obj, request):
         self.info = resp_obj
@@ -98,7 +116,7 @@ errors = {
         'ValidationError': ValidationError,
         }
 
-def raise_error(resp_obj, request):
+def raise_error(resp_obj, request, status=None):
     try:
         # Find a specific exception for this code, if it exists
         exc_type = errors[resp_obj['code']]
@@ -107,9 +125,11 @@ def raise_error(resp_obj, request):
         resp_obj['message']
         resp_obj['code']
     except:
-        raise APIError(
+        e = APIError(
                 "Problem with %s %s: %s"
                         % (request.method, request.url, repr(resp_obj)))
+        e.status = status
+        raise e
 
     raise exc_type(resp_obj, request)
 
@@ -133,6 +153,8 @@ _path_order = (
 # above, everything is easy :)
 _possible_query_params = (
         'archived',
+        'page',
+        'count',
         )
 
 
@@ -143,6 +165,16 @@ def _api_plural(noun):
         return noun
 
 
+def _other_page(page_data, page):
+    "True if ``pageData`` says it is not the page asked for."
+    if not isinstance(page_data, dict) or page_data.get('page') is None:
+        return False
+    try:
+        return int(page_data['page']) != page
+    except (TypeError, ValueError):
+        return False
+
+
 def _make_path(*args, **kwargs):
     '''
     Constructs URL paths such as 'systems/{system}/issuers/{issuer}.
@@ -158,7 +190,14 @@ def _make_path(*args, **kwargs):
         parts.extend(args)
 
     path = posixpath.join(*parts)
+    return path + _make_query(kwargs)
+
 
+def _make_query(kwargs):
+    '''
+    Constructs the query string, such as '?archived=true', for the query
+    parameters among ``kwargs``; or '' if there are none.
+    '''
     # If the API ever supports duplicate parameters, we would need
     # to change this to a defaultdict(list) or FieldStorage or similar.
     params = {}
@@ -173,16 +212,177 @@ def _make_path(*args, **kwargs):
         params[param] = value
 
     if params:
-        path = '%s?%s' % (path,
-                urlencode(params))
-    return path
+        return '?' + urlencode(params)
+    return ''
+
+
+def _form_fields(data):
+    '''
+    The fields of a dict of data as ``(name, value)`` pairs, to send as a
+    form.  Lists and dicts, such as a badge's ``criteria``, are given in the
+    bracketed form that the server's form parser reads back as arrays and
+    objects (``criteria[0][description]=...``); ``None`` values are left out.
+    '''
+    fields = []
+    for key, value in data.items():
+        _add_field(fields, key, value)
+    return fields
+
+
+def _add_field(fields, name, value):
+    if value is None:
+        return
+    if isinstance(value, (list, tuple)):
+        for index, item in enumerate(value):
+            _add_field(fields, '%s[%d]' % (name, index), item)
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            _add_field(fields, '%s[%s]' % (name, key), item)
+    else:
+        fields.append((name, value))
+
+
+def _innermost_kind(location):
+    '''
+    Returns the last kind in ``_path_order`` named in ``location``, which is
+    the kind of object that ``get(**location)`` returns.
+    '''
+    for field in reversed(_path_order):
+        if location.get(field) is not None:
+            return field
+    return None
+
+
+def _make_auth(secret, key):
+    '''
+    Builds the JWT authorization that the BadgeKit API server expects:
+    the key name, an expiry, and the request's path, method and body hash.
+    '''
+    import requests_jwt
+    auth = requests_jwt.JWTAuth(secret)
+    auth.add_field('key', key)
+    auth.expire(30)
+    auth.add_field('path', requests_jwt.payload_path)
+    auth.add_field('method', requests_jwt.payload_method)
+    auth.add_field('body', _payload_body)
+    return auth
+
+
+def _payload_body(request):
+    '''
+    The JWT's body claim, as :func:`requests_jwt.payload_body` makes it,
+    but also for bytes and for streamed bodies, which hash themselves a
+    chunk at a time.
+    '''
+    if request.method not in ('POST', 'PUT'):
+        return None
+    import hashlib
+    body = request.body
+    if hasattr(body, 'sha256'):
+        digest = body.sha256()
+    else:
+        if body is None:
+            body = b''
+        elif not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()
+    return {'hash': digest, 'alg': 'sha256'}
+
+
+def _identity(key, secret):
+    '''
+    Who a client signs as: its key name and a hash of its secret, so the
+    secret itself need not be kept.
+    '''
+    import hashlib
+    if not isinstance(secret, bytes):
+        secret = secret.encode('utf-8')
+    return key, hashlib.sha256(secret).hexdigest()
+
+
+_version_re = re.compile(r'^(\d+)\.(\d+)(?:\.(\d+))?(?:([ab])(\d+))?$')
+
+
+def _parse_version(version):
+    '''
+    Parses a version number such as '1.2', '0.5.3' or '1.0b2' into a tuple
+    that compares as the versions do, with the rules (and the
+    :class:`ValueError` for anything else) of distutils' StrictVersion.
+    '''
+    match = _version_re.match(version)
+    if match is None:
+        raise ValueError("invalid version number '%s'" % version)
+    major, minor, patch, pre, pre_number = match.groups()
+    release = (int(major), int(minor), int(patch or 0))
+    if pre is None:
+        # A final release sorts after its pre-releases.
+        return release + ((1,),)
+    return release + ((0, pre, int(pre_number)),)
+
+
+def _check_server_version(version, required_version, server_url):
+    '''
+    Raises :class:`ValueError` if ``version`` is older than ``required_version``.
+    '''
+    if _parse_version(version) < _parse_version(required_version):
+        raise ValueError(
+                ("Version {required_version} or greater "
+                + "of BadgeKit-API server required, but "
+                + "{server_url} is only version {version}.")
+                .format(**locals()))
+
+
+def default_json_loads():
+    '''
+    Returns the fastest available function for decoding JSON from bytes:
+    :func:`orjson.loads` or :func:`ujson.loads` if either package is
+    installed, or else :func:`json.loads`.
+    '''
+    for name in ('orjson', 'ujson'):
+        try:
+            return __import__(name).loads
+        except ImportError:
+            pass
+    return _stdlib_json_loads
+
+
+def _stdlib_json_loads(content):
+    '''
+    Decodes JSON with :func:`json.loads`, which only takes bytes from
+    Python 3.6 on.
+    '''
+    import json
+    if isinstance(content, bytes) and sys.version_info[0] >= 3:
+        content = content.decode('utf-8')
+    return json.loads(content)
+
+
+def _make_session(pool_connections, pool_maxsize, pool_block, keep_alive):
+    '''
+    Builds a :class:`requests.Session` whose connection pools are sized
+    for talking to one BadgeKit API server from several threads.
+    '''
+    import requests
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+    return session
 
 
 class BadgeKitAPI(object):
     """
     A class representing an interface with the BadgeKit API server.
 
-    :param baseurl: the URL of the badgekit-api server.
+    :param baseurl: the URL of the badgekit-api server.  May also be a list
+        of the URLs of several replicas of the server, or a
+        :class:`badgekit.balance.ReplicaSet`, to spread requests across
+        them.
     :param secret: the client secret.
     :param key: the name of the client secret, for the server to see.
     :param defaults: a dict of default arguments, which can be overridden by actual arguments to the functions.
@@ -198,31 +398,220 @@ class BadgeKitAPI(object):
     info around to all your code that uses the api:
 
     >>> bk = BadgeKitAPI('http://api.example.com/', 'secr3t', defaults={'system': 'mysystem'})
+
+    All requests go through one :class:`requests.Session`, so TCP (and TLS)
+    connections to the server are kept alive and reused between calls
+    instead of being opened afresh for every request.
+
+    :param session: a :class:`requests.Session` to use instead of the one
+        the client builds for itself.  The pool arguments below are ignored
+        when a session is supplied.
+    :param pool_connections: the number of per-host connection pools to keep.
+    :param pool_maxsize: the maximum number of connections kept open to one
+        host.  Set this to at least the number of threads sharing the client.
+    :param pool_block: if true, a thread that finds all ``pool_maxsize``
+        connections busy waits for one to free up; otherwise an extra,
+        throwaway connection is opened.
+    :param keep_alive: if false, ask the server to close each connection
+        after its response (the behavior of older versions of this client).
+    :param cache: a :class:`badgekit.cache.ResponseCache` in which to keep
+        the results of :meth:`get` and :meth:`list`.  By default nothing is
+        cached.
+    :param json_loads: a function decoding a response body, passed as
+        bytes, into Python objects.  It must raise :class:`ValueError` on
+        invalid input.  Defaults to :func:`default_json_loads`.
+    :param records: if true, :meth:`list`, :meth:`get` and the iterating
+        methods return compact :mod:`badgekit.records` objects instead of
+        dicts.
+    :param hedge: a :class:`badgekit.hedge.HedgePolicy`.  If given, ``GET``
+        requests that are slow to be answered are sent a second time, and
+        the first answer is used.
+    :param coalesce: if true, concurrent :meth:`get`, :meth:`list` and
+        :meth:`get_public_url` calls for the same URL, made with the same
+        key and secret, share one request and its result (each caller gets
+        its own copy) or exception.  May also be a
+        :class:`badgekit.singleflight.SingleFlight` to share between
+        clients.
+    :param metrics: a :class:`badgekit.metrics.Metrics` in which to record
+        the latency, size and outcome of every request.
+    :param handshake: a :class:`badgekit.handshake.Handshake` keeping the
+        server's name and version, so that :meth:`server_version` and
+        :meth:`require_server_version` need not ask the server each time.
+        If true, a handshake shared by all clients in the process is used.
+    :param limiter: a :class:`badgekit.limiter.AdaptiveLimiter` bounding
+        the requests in flight, by a limit that follows how the server
+        copes.  Requests wait for a free slot before they are sent.
+
+    A client may be shared between threads: the underlying urllib3 pools
+    hand each in-flight request its own connection.  Use the client as a
+    context manager, or call :meth:`close`, to release the connections:
+
+    >>> with BadgeKitAPI('http://api.example.com/', 'secr3t') as bk:
+    ...     bk.ping()
+    True
     """
-    def __init__(self, baseurl, secret, key='master', defaults=None):
+    def __init__(self, baseurl, secret, key='master', defaults=None,
+            session=None, pool_connections=10, pool_maxsize=10,
+            pool_block=False, keep_alive=True, cache=None, json_loads=None,
+            records=False, hedge=None, coalesce=False, metrics=None,
+            handshake=None, limiter=None):
+        self._owns_replicas = isinstance(baseurl, (list, tuple))
+        if self._owns_replicas:
+            from .balance import ReplicaSet
+            baseurl = ReplicaSet(baseurl)
+        if hasattr(baseurl, 'replicas'):
+            self.replicas = baseurl
+            baseurl = baseurl.baseurl
+        else:
+            self.replicas = None
         self.baseurl = baseurl
-
-        auth = requests_jwt.JWTAuth(secret)
-        auth.add_field('key', key)
-        auth.expire(30)
-        auth.add_field('path', requests_jwt.payload_path)
-        auth.add_field('method', requests_jwt.payload_method)
-        auth.add_field('body', requests_jwt.payload_body)
-        self.auth = auth
+        self.auth = _make_auth(secret, key)
 
         if defaults:
             self.defaults = dict(defaults)
         else:
             self.defaults = {}
 
+        if session is None:
+            session = _make_session(pool_connections, pool_maxsize,
+                    pool_block, keep_alive)
+            self._owns_session = True
+        else:
+            self._owns_session = False
+        self.session = session
+        self.cache = cache
+        self.json_loads = json_loads or default_json_loads()
+        self.records = records
+        self.hedge = hedge
+        if coalesce is True:
+            from .singleflight import SingleFlight
+            coalesce = SingleFlight()
+        self.coalesce = coalesce or None
+        if self.coalesce is not None:
+            # Callers with other credentials must not share answers.
+            self._identity = _identity(key, secret)
+        self.metrics = metrics
+        if handshake is True:
+            from .handshake import shared_handshake
+            handshake = shared_handshake()
+        self.handshake = handshake
+        self.limiter = limiter
+        self._local = threading.local()
+
+    def close(self):
+        """
+        Releases the pooled connections held by this client.
+
+        Only a session (or replica set) created by the client itself is
+        closed; one passed in to the constructor is left for its owner to
+        close.  The hedge policy's worker threads are stopped; the policy
+        starts new ones if it is used again.
+        """
+        if self._owns_session:
+            self.session.close()
+        if self._owns_replicas:
+            self.replicas.close()
+        if self.hedge is not None:
+            self.hedge.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _send(self, method, url, auth=True, **kwargs):
+        """
+        Sends one request through the client's pooled session, hedging it
+        if it is a ``GET`` and the client has a hedge policy.
+        """
+        auth = self.auth if auth else None
+        if self.metrics is not None:
+            return self._send_measured(method, url, auth, kwargs)
+        return self._request(method, url, auth, kwargs)
+
+    def _request(self, method, url, auth, kwargs):
+        if (self.hedge is not None and method == 'GET'
+                and not kwargs.get('stream')):
+            return self.hedge.call(lambda: self._request_once(
+                method, url, auth, kwargs))
+        return self._request_once(method, url, auth, kwargs)
+
+    def _request_once(self, method, url, auth, kwargs):
+        if self.limiter is not None:
+            return self.limiter.call(lambda: self._dispatch(
+                method, url, auth, kwargs), route=(method, self._route(url)))
+        return self._dispatch(method, url, auth, kwargs)
+
+    def _dispatch(self, method, url, auth, kwargs):
+        if self.replicas is not None and self.replicas.owns(url):
+            return self.replicas.request(self.session, method, url, auth,
+                    kwargs)
+        return self.session.request(method, url, auth=auth, **kwargs)
+
+    def _send_measured(self, method, url, auth, kwargs):
+        """
+        Sends a request as :meth:`_send` does, recording it in the
+        client's metrics.
+        """
+        from .metrics import _TimedAuth, _sign_time
+        route = self._route(url)
+        self._local.route = (method, route)
+        if auth is not None:
+            auth = _TimedAuth(auth)
+
+        from requests.exceptions import RequestException
+        start = time.time()
+        try:
+            resp = self._request(method, url, auth, kwargs)
+        except RequestException as e:
+            self.metrics.observe_request(method, route, time.time() - start,
+                    sign=_sign_time(e.request), error=type(e).__name__)
+            raise
+        latency = time.time() - start
+
+        body = resp.request.body
+        if kwargs.get('stream'):
+            received = int(resp.headers.get('Content-Length') or 0)
+        else:
+            received = len(resp.content)
+        self.metrics.observe_request(method, route, latency,
+                status=resp.status_code,
+                sent=len(body) if body else 0,
+                received=received,
+                sign=_sign_time(resp.request))
+        return resp
+
+    def _route(self, url):
+        from .metrics import route_template
+        path = urlsplit(url).path
+        base = urlsplit(self.baseurl).path.rstrip('/')
+        if base and path.startswith(base + '/'):
+            path = path[len(base):]
+        return route_template(path)
+
+    def _raise_error(self, resp_obj, request, status=None):
+        """
+        Raises the exception for an error response, as :func:`raise_error`
+        does, recording it in the client's metrics.
+        """
+        try:
+            raise_error(resp_obj, request, status)
+        except BadgeKitException as e:
+            if self.metrics is not None:
+                self.metrics.observe_error(request.method,
+                        self._route(request.url), type(e).__name__)
+            raise
+
     def ping(self):
         """Tests the server's availability - returns True if
         server is available, False otherwise."""
+        from requests import ConnectionError
         try:
-            resp = requests.get(urljoin(self.baseurl, '/'), auth=self.auth)
-            resp_dict = self._json_loads(resp.text)
+            resp = self._send('GET', urljoin(self.baseurl, '/'))
+            resp_dict = self._json_loads(resp.content)
             return resp.status_code == 200 and resp_dict['app'] == 'BadgeKit API'
-        except requests.ConnectionError:
+        except ConnectionError:
             return False
 
     def list(self, kind, **kwargs):
@@ -244,12 +633,141 @@ class BadgeKitAPI(object):
         kind_plural = _api_plural(kind)
         path_args = dict(self.defaults, **kwargs)
         path = _make_path(kind_plural, **path_args)
-        resp = requests.get(urljoin(self.baseurl, path), auth=self.auth)
-        resp_obj = self._json_loads(resp.text)
-        if resp.status_code != 200:
-            raise_error(resp_obj, resp.request)
+        return self._list_path(path, kind)
+
+    def _list_path(self, path, kind):
+        resp_obj = self._read(path, kind)
+        if self.records:
+            from .records import from_list
+            return from_list(kind, resp_obj)
         return resp_obj
 
+    def iter_list(self, kind, chunk_size=65536, **kwargs):
+        """
+        Lists objects like :meth:`list`, but yields them one by one as the
+        response is read.
+
+        >>> for instance in bk.iter_list('instance', system='mysystem', badge='b'):
+        ...     print(instance['email'])
+
+        The response body is streamed and decoded incrementally, so memory
+        use stays flat however large the collection is.  Only the items of
+        the collection are yielded (the elements of ``"instances"`` above);
+        any other top-level fields of the response are skipped.  The request
+        is sent when iteration starts, and bypasses the response cache.
+        """
+        from .jsonstream import iter_json_array
+
+        kind_plural = _api_plural(kind)
+        path_args = dict(self.defaults, **kwargs)
+        path = _make_path(kind_plural, **path_args)
+        resp = self._send('GET', urljoin(self.baseurl, path), stream=True)
+        try:
+            if resp.status_code != 200:
+                self._raise_error(self._json_loads(resp.content), resp.request,
+                        resp.status_code)
+            items = iter_json_array(resp.iter_content(chunk_size), kind_plural)
+            if self.records:
+                from .records import record_types
+                record_type = record_types[kind]
+                items = (record_type(item) for item in items)
+            for item in items:
+                yield item
+        finally:
+            resp.close()
+
+    def iter_pages(self, kind, count=100, prefetch=True, **kwargs):
+        """
+        Lists objects a page at a time, yielding each page's response.
+
+        :param kind: The kind of object to list, as for :meth:`list`.
+        :param count: The number of objects to ask for per page.
+        :param prefetch: If true, each next page is requested in the
+            background while the caller works on the current one.
+
+        >>> for page in bk.iter_pages('instance', system='mysystem', badge='b'):
+        ...     handle(page['instances'])
+
+        The remaining keyword arguments specify the location, as for
+        :meth:`list`.  Pages are requested with the ``page`` and ``count``
+        query parameters.  Iteration stops after the page that reaches the
+        ``total`` in the server's ``pageData``, or, if the server does not
+        report a total, after the first page with fewer than ``count`` items.
+        It also stops if the server turns out to ignore paging: if it sends
+        more than ``count`` items without ``pageData``, a page other than
+        the one asked for, or the same items again.
+        """
+        kind_plural = _api_plural(kind)
+        path_args = dict(self.defaults, **kwargs)
+        page = path_args.pop('page', 1)
+        path_args.pop('count', None)
+        executor = None
+        if prefetch:
+            from concurrent.futures import ThreadPoolExecutor
+            executor = ThreadPoolExecutor(max_workers=1)
+
+        def fetch(page):
+            path = _make_path(kind_plural, page=page, count=count, **path_args)
+            return self._read(path, kind)
+
+        try:
+            pending = None
+            previous = None
+            resp_obj = fetch(page)
+            while True:
+                items = resp_obj.get(kind_plural) or []
+                page_data = resp_obj.get('pageData')
+                if previous is not None and (items == previous or
+                        _other_page(page_data, page)):
+                    return
+                previous = items
+                page_data = page_data or {}
+                total = page_data.get('total')
+                if total is not None:
+                    last = page * count >= total
+                elif 'pageData' not in resp_obj and len(items) > count:
+                    # Everything at once.
+                    last = True
+                else:
+                    last = len(items) < count
+
+                if not last and executor is not None:
+                    pending = executor.submit(fetch, page + 1)
+                if items or page == 1:
+                    yield resp_obj
+                if last or not items:
+                    return
+
+                page += 1
+                if pending is not None:
+                    resp_obj, pending = pending.result(), None
+                else:
+                    resp_obj = fetch(page)
+        finally:
+            if executor is not None:
+                if pending is not None:
+                    pending.cancel()
+                executor.shutdown(wait=False)
+
+    def iter_all(self, kind, count=100, prefetch=True, **kwargs):
+        """
+        Lists objects across all pages, yielding them one at a time.
+
+        >>> for instance in bk.iter_all('instance', system='mysystem', badge='b'):
+        ...     print(instance['email'])
+
+        The arguments are those of :meth:`iter_pages`.
+        """
+        kind_plural = _api_plural(kind)
+        for resp_obj in self.iter_pages(kind, count=count, prefetch=prefetch,
+                **kwargs):
+            items = resp_obj.get(kind_plural) or []
+            if self.records:
+                from .records import to_records
+                items = to_records(kind, items)
+            for item in items:
+                yield item
+
     def get(self, **kwargs):
         """
         Retrieves some object from the API.
@@ -266,12 +784,51 @@ class BadgeKitAPI(object):
         """
         path_args = dict(self.defaults, **kwargs)
         path = _make_path(**path_args)
-        resp = requests.get(urljoin(self.baseurl, path), auth=self.auth)
-        resp_obj = self._json_loads(resp.text)
+        return self._get_path(path, _innermost_kind(path_args))
 
-        if resp.status_code != 200:
-            raise_error(resp_obj, resp.request)
+    def _get_path(self, path, kind):
+        resp_obj = self._read(path, kind)
+        if self.records and kind is not None:
+            from .records import from_get
+            return from_get(kind, resp_obj)
+        return resp_obj
 
+    def _read(self, path, kind):
+        """
+        GETs ``path``, consulting and updating the response cache, if any.
+        """
+        url = urljoin(self.baseurl, path)
+        if self.coalesce is not None:
+            return self.coalesce.do((self._identity, url),
+                    lambda: self._fetch(url, path, kind))
+        return self._fetch(url, path, kind)
+
+    def _fetch(self, url, path, kind):
+        cache = self.cache
+        if cache is None:
+            resp = self._send('GET', url)
+            resp_obj = self._json_loads(resp.content)
+            if resp.status_code != 200:
+                self._raise_error(resp_obj, resp.request, resp.status_code)
+            return resp_obj
+
+        cached, headers = cache.lookup(path)
+        if cached is not None:
+            return cached
+
+        resp = self._send('GET', url, headers=headers)
+        if resp.status_code == 304 and headers:
+            cached = cache.revalidated(path)
+            if cached is not None:
+                return cached
+            resp = self._send('GET', url)
+
+        resp_obj = self._json_loads(resp.content)
+        if resp.status_code != 200:
+            self._raise_error(resp_obj, resp.request, resp.status_code)
+        cache.store(path, kind, resp_obj,
+                etag=resp.headers.get('ETag'),
+                last_modified=resp.headers.get('Last-Modified'))
         return resp_obj
 
     def create(self, kind, data, **kwargs):
@@ -289,19 +846,136 @@ class BadgeKitAPI(object):
         Use this method to ``POST`` a URL that ends with a kind of object.
         For instance, the above code would post to ``/systems/mysystem/badges`` with
         ``data`` as the body of the request.
+
+        Values in ``data`` may be files opened in binary mode, or
+        :class:`badgekit.upload.Upload` objects naming paths, such as a
+        badge's ``image``; the object is then sent as streamed
+        ``multipart/form-data``.
         """
         path_args = dict(self.defaults, **kwargs)
         path = _make_path(_api_plural(kind), **path_args)
-        resp = requests.post(urljoin(self.baseurl, path),
-                data=data,
-                auth=self.auth)
-        resp_obj = self._json_loads(resp.text)
+        return self._create_path(path, data)
+
+    def _create_path(self, path, data):
+        from .upload import MultipartBody, _has_uploads
+        if _has_uploads(data):
+            with MultipartBody(data) as body:
+                resp = self._send('POST', urljoin(self.baseurl, path),
+                        data=body,
+                        headers={'Content-Type': body.content_type})
+        else:
+            if isinstance(data, dict):
+                data = _form_fields(data)
+            resp = self._send('POST', urljoin(self.baseurl, path), data=data)
+        if self.cache is not None:
+            self.cache.invalidate(path.split('?')[0])
+        resp_obj = self._json_loads(resp.content)
 
         if resp.status_code != 201:
-            raise_error(resp_obj, resp.request)
+            self._raise_error(resp_obj, resp.request, resp.status_code)
 
         return resp_obj
 
+    def create_many(self, kind, items, max_in_flight=None, ordered=False,
+            **kwargs):
+        """
+        Create many objects of one kind, in parallel.
+
+        :param kind: The kind of object to create - 'badge', 'instance', etc.
+        :param items: An iterable of data dicts, one per object.
+        :param max_in_flight: The most ``create`` calls running at once.
+            Defaults to 10, or to the ``max_limit`` of the client's
+            limiter, which then decides how many of them may send.
+        :param ordered: If true, results are reported in input order;
+            otherwise, as they complete.
+
+        >>> results = bk.create_many('instance', recipients,
+        ...         system='mysystem', badge='stupendous-badge')
+        >>> for outcome in results:
+        ...     if not outcome.ok:
+        ...         print(outcome.data, outcome.error)
+        >>> results.stats['per_second']
+
+        The remaining keyword arguments specify the location, as for
+        :meth:`create`.  Returns a :class:`badgekit.bulk.BulkCreate`, which
+        yields a :class:`badgekit.bulk.CreateResult` per item.  Errors from
+        the server or the network are reported in the results, not raised.
+
+        ``items`` is consumed lazily, so it may be a generator.  Keep
+        ``pool_maxsize`` at least ``max_in_flight`` so every worker gets a
+        pooled connection.
+        """
+        from .bulk import BulkCreate
+        if max_in_flight is None:
+            max_in_flight = (self.limiter.max_limit
+                    if self.limiter is not None else 10)
+        return BulkCreate(self, kind, items, kwargs,
+                max_in_flight=max_in_flight, ordered=ordered)
+
+    def outbox(self, path, **kwargs):
+        """
+        Returns a :class:`badgekit.outbox.Outbox` that spools ``create``
+        calls to the file ``path`` and sends them in the background.
+
+        >>> outbox = bk.outbox('/var/spool/badgekit/awards.spool')
+        >>> outbox.create('instance', {'email': 'user@example.com'},
+        ...         system='mysystem', badge='stupendous-badge')
+
+        The keyword arguments are passed on to the outbox.
+        """
+        from .outbox import Outbox
+        return Outbox(self, path, **kwargs)
+
+    def crawl(self, kinds=None, max_depth=None, max_workers=8, **kwargs):
+        """
+        Walks the objects inside a location, breadth-first and in parallel.
+
+        :param kinds: The kinds of object to list; the walk does not go
+            below an object whose children are of other kinds.  Defaults to
+            systems, issuers, programs and badges; add ``'instance'`` or
+            ``'application'`` to go further.
+        :param max_depth: The most levels below the starting location to
+            list, or None for no limit.
+        :param max_workers: The most listings fetched at once.
+
+        >>> for node in bk.crawl(system='mysystem'):
+        ...     print(node.kind, node.location)
+
+        The remaining keyword arguments give the starting location, as for
+        :meth:`get`; with none, the walk starts by listing the systems.
+        Returns a :class:`badgekit.crawl.Crawl`, which yields a
+        :class:`badgekit.crawl.Node` per object found, as soon as its
+        parent's listing arrives.
+        """
+        from .crawl import Crawl, default_kinds
+        path_args = dict(self.defaults, **kwargs)
+        location = dict((field, value) for field, value in path_args.items()
+                if field in _path_order and value is not None)
+        return Crawl(self, location,
+                kinds=default_kinds if kinds is None else kinds,
+                max_depth=max_depth, max_workers=max_workers)
+
+    def resource(self, **kwargs):
+        """
+        Returns a :class:`badgekit.resources.Resource` bound to a location.
+
+        >>> badge = bk.resource(system='mysystem', badge='stupendous-badge')
+        >>> badge.list('instance')
+        { ... }
+
+        The keyword arguments, merged with the client's defaults, give the
+        location, as for :meth:`get`.  The same handles can be built one
+        level at a time with the kind methods, such as
+        ``bk.system('mysystem').badge('stupendous-badge')``.
+        """
+        from .resources import Resource
+        path_args = dict(self.defaults, **kwargs)
+        location = dict((field, value) for field, value in path_args.items()
+                if field in _path_order and value is not None)
+        params = dict((param, value) for param, value in path_args.items()
+                if param in _possible_query_params and value is not None)
+        return Resource(self, location, params)
+
     def update(self, data, **kwargs):
         "Update an object - not implemented yet"
         raise NotImplementedError()
@@ -310,18 +984,39 @@ class BadgeKitAPI(object):
         "Delete an object - not implemented yet"
         raise NotImplementedError()
 
-    def _json_loads(self, text):
+    def _json_loads(self, content):
+        if self.metrics is not None:
+            start = time.time()
+            method, route = getattr(self._local, 'route', (None, None))
         try:
-            return json.loads(text)
+            resp_obj = self.json_loads(content)
         except ValueError as e:
+            if self.metrics is not None:
+                self.metrics.observe_error(method, route, 'APIError')
             raise APIError("Invalid JSON in BadgeKit response")
+        if self.metrics is not None:
+            self.metrics.observe_decode(method, route, time.time() - start)
+        return resp_obj
 
     def server_version(self):
         """Returns the server's reported version as a string."""
-        resp = requests.get(urljoin(self.baseurl, '/'), auth=self.auth)
-        resp_dict = self._json_loads(resp.text)
+        if self.handshake is not None:
+            return self.handshake.info(self).version
+        resp = self._send('GET', urljoin(self.baseurl, '/'))
+        resp_dict = self._json_loads(resp.content)
         return resp_dict['version']
 
+    def server_info(self):
+        """
+        Returns a :class:`badgekit.handshake.ServerInfo` with the server's
+        name, version and feature flags, from the client's handshake if it
+        has one.
+        """
+        if self.handshake is not None:
+            return self.handshake.info(self)
+        from .handshake import Handshake
+        return Handshake(ttl=0, max_stale=0).info(self)
+
     def require_server_version(self, required_version):
         """
         Require a certain version of the BadgeKit API Server.
@@ -330,29 +1025,43 @@ class BadgeKitAPI(object):
         particular features, it makes sense to check the server version so that
         you get "fail-early" behavior from your application.  This method
         checks the supplied ``required_version`` against the server's
-        version, parses them with :class:`distutils.version.StrictVersion`, and
-        compares them.  If the server version is strictly less than
+        version, parses them as :class:`distutils.version.StrictVersion`
+        would, and compares them.  If the server version is strictly less than
         ``required_version``, a :class:`ValueError` is raised with an
         informative error message.
         """
         version = self.server_version()
-        server_url = self.baseurl
-        if StrictVersion(version) < StrictVersion(required_version):
-            raise ValueError(
-                    ("Version {required_version} or greater "
-                    + "of BadgeKit-API server required, but "
-                    + "{server_url} is only version {version}.")
-                    .format(**locals()))
+        _check_server_version(version, required_version, self.baseurl)
 
     def get_public_url(self, url):
         """
         GET a URL, and parse its JSON, checking for known errors.  Useful for
         public URLs on the BadgeKit API server (e.g. assertions).
         """
-        resp = requests.get(url)
-        resp_obj = self._json_loads(resp.text)
+        if self.coalesce is not None:
+            return self.coalesce.do((None, url),
+                    lambda: self._fetch_public(url))
+        return self._fetch_public(url)
+
+    def _fetch_public(self, url):
+        resp = self._send('GET', url, auth=False)
+        resp_obj = self._json_loads(resp.content)
 
         if resp.status_code != 200:
-            raise_error(resp_obj, resp.request)
+            self._raise_error(resp_obj, resp.request, resp.status_code)
 
         return resp_obj
+
+
+def _kind_method(kind):
+    def bind(self, slug):
+        return self.resource(**{kind: slug})
+    bind.__name__ = kind
+    bind.__doc__ = (
+            "Returns a :class:`badgekit.resources.Resource` for the %s "
+            "``slug``; see :meth:`resource`." % kind)
+    return bind
+
+
+for _kind in _path_order:
+    setattr(BadgeKitAPI, _kind, _kind_method(_kind))
@@ -0,0 +1,106 @@
+"""
+ASGI middleware that checks the signed calls BadgeKit API makes to a
+webhook, as :class:`badgekit.webhook.WebhookMiddleware` does for WSGI.
+It requires Python 3.
+
+.. code-block:: python
+
+    from badgekit.asgi import WebhookMiddleware
+    from badgekit.webhook import WebhookVerifier
+
+    app = WebhookMiddleware(app, WebhookVerifier({'master': 'secr3t'}),
+            prefix='/hooks/')
+"""
+
+import json
+
+from .webhook import WebhookError, _requote
+
+
+__all__ = [
+        'WebhookMiddleware',
+        ]
+
+
+class WebhookMiddleware(object):
+    """
+    ASGI middleware that checks webhook calls before they reach the
+    application.
+
+    :param app: the ASGI application.
+    :param verifier: a :class:`badgekit.webhook.WebhookVerifier`.
+    :param prefix: if given, only calls to paths starting with it are
+        checked; others go straight to the application.
+
+    Calls that do not check out are answered with ``403`` and a JSON error.
+    Calls that do reach the application with their claims in
+    ``scope['badgekit.webhook']``; their body, which had to be read to be
+    checked, is received again as one message.
+    """
+    def __init__(self, app, verifier, prefix=None):
+        self.app = app
+        self.verifier = verifier
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        # The token signs the path as sent; scope['path'] is decoded.
+        raw_path = scope.get('raw_path')
+        if raw_path:
+            path = raw_path.split(b'?', 1)[0].decode('latin-1')
+        else:
+            path = _requote((scope.get('root_path', '') +
+                scope['path']).encode('utf-8'))
+        if scope.get('query_string'):
+            path += '?' + scope['query_string'].decode('latin-1')
+        if self.prefix is not None and not path.startswith(self.prefix):
+            return await self.app(scope, receive, send)
+
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] != 'http.request':
+                # The client went away.
+                return
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        body = b''.join(chunks)
+
+        authorization = None
+        for name, value in scope.get('headers', ()):
+            if name.lower() == b'authorization':
+                authorization = value.decode('latin-1')
+                break
+        try:
+            claims = self.verifier.verify(authorization, scope['method'],
+                    path, body)
+        except WebhookError as e:
+            reply = json.dumps({
+                'code': 'Unauthorized',
+                'message': str(e),
+                }).encode('utf-8')
+            await send({
+                'type': 'http.response.start',
+                'status': 403,
+                'headers': [
+                    (b'content-type', b'application/json'),
+                    (b'content-length', str(len(reply)).encode('ascii')),
+                    ],
+                })
+            await send({'type': 'http.response.body', 'body': reply})
+            return
+
+        replayed = [False]
+
+        async def replay():
+            if not replayed[0]:
+                replayed[0] = True
+                return {'type': 'http.request', 'body': body,
+                        'more_body': False}
+            return await receive()
+
+        scope = dict(scope)
+        scope['badgekit.webhook'] = claims
+        return await self.app(scope, replay, send)
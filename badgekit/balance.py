@@ -0,0 +1,276 @@
+"""
+Client-side load balancing across BadgeKit API replicas.
+
+Give :class:`badgekit.BadgeKitAPI` a list of base URLs, or a
+:class:`ReplicaSet` to choose how requests are spread, and each request is
+sent to one of the replicas:
+
+>>> bk = BadgeKitAPI(['http://api1.example.com/', 'http://api2.example.com/'],
+...         'secr3t')
+>>> from badgekit.balance import ReplicaSet
+>>> replicas = ReplicaSet(['http://api1.example.com/',
+...         'http://api2.example.com/'], strategy='latency')
+>>> bk = BadgeKitAPI(replicas, 'secr3t')
+
+URLs are still built from the first replica's base URL, with
+:func:`~urlparse.urljoin` and the API's paths, so the response cache,
+request coalescing and metrics see one server; just before a request is
+sent, its base is swapped for the chosen replica's.
+
+A replica that fails ``max_failures`` requests in a row (connection errors
+or 5xx responses) is taken out of rotation.  A background thread then
+pings it, as :meth:`~badgekit.BadgeKitAPI.ping` does, every
+``check_interval`` seconds, and puts it back once it answers.  A ``GET``
+that cannot reach its replica is retried once on another.  If every
+replica is out of rotation, requests go to all of them as if they were
+healthy, rather than failing outright.
+"""
+
+import random
+import threading
+import time
+try:
+    from urlparse import urljoin, urlsplit
+except ImportError:
+    from urllib.parse import urljoin, urlsplit
+
+
+__all__ = [
+        'ReplicaSet',
+        ]
+
+
+strategies = ('least_outstanding', 'latency')
+
+
+class _Replica(object):
+    __slots__ = ('url', 'root', 'origin', 'outstanding', 'latency',
+            'requests', 'failures', 'consecutive_failures', 'healthy')
+
+    def __init__(self, url):
+        self.url = url
+        # urljoin(url, path) is root + path, and urljoin(url, '/path') is
+        # origin + '/path'.
+        self.root = urljoin(url, '.')
+        parts = urlsplit(url)
+        self.origin = '%s://%s' % (parts.scheme, parts.netloc)
+        self.outstanding = 0
+        self.latency = None
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.healthy = True
+
+
+class ReplicaSet(object):
+    """
+    A set of replicas of one BadgeKit API server.
+
+    :param urls: the base URLs of the replicas.  URLs are built from the
+        first; the others should have the same layout.
+    :param strategy: ``'least_outstanding'`` sends each request to the
+        replica with the fewest requests in flight, choosing at random
+        between ties; ``'latency'`` chooses at random, weighting each
+        replica by the inverse of its recent latency times its requests in
+        flight.
+    :param max_failures: how many failures in a row take a replica out of
+        rotation.
+    :param check_interval: seconds between health checks of replicas out
+        of rotation.
+    :param check_timeout: seconds to wait for a health check's answer.
+
+    A replica set may be shared between clients, which then balance their
+    load together.
+    """
+    def __init__(self, urls, strategy='least_outstanding', max_failures=3,
+            check_interval=5.0, check_timeout=2.0):
+        if not urls:
+            raise ValueError("At least one base URL is needed")
+        if strategy not in strategies:
+            raise ValueError("Unknown strategy %r; choose from %s"
+                    % (strategy, ', '.join(strategies)))
+        self.replicas = [_Replica(url) for url in urls]
+        self.strategy = strategy
+        self.max_failures = max_failures
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self._checker = None
+        self._session = None
+        self._closed = threading.Event()
+
+    @property
+    def baseurl(self):
+        "The base URL that requests' URLs are built from."
+        return self.replicas[0].url
+
+    def _choose(self, exclude=None):
+        with self._lock:
+            candidates = [r for r in self.replicas
+                    if r.healthy and r is not exclude]
+            if not candidates:
+                candidates = [r for r in self.replicas if r is not exclude]
+            if not candidates:
+                candidates = list(self.replicas)
+
+            if self.strategy == 'least_outstanding':
+                fewest = min(r.outstanding for r in candidates)
+                replica = self._random.choice(
+                        [r for r in candidates if r.outstanding == fewest])
+            else:
+                replica = self._weighted(candidates)
+            replica.outstanding += 1
+            replica.requests += 1
+            return replica
+
+    def _weighted(self, candidates):
+        latencies = [r.latency for r in candidates if r.latency is not None]
+        default = sum(latencies) / len(latencies) if latencies else 0.01
+        weights = [1.0 / (max(r.latency or default, 1e-4) * (r.outstanding + 1))
+                for r in candidates]
+        point = self._random.random() * sum(weights)
+        for replica, weight in zip(candidates, weights):
+            point -= weight
+            if point < 0:
+                return replica
+        return candidates[-1]
+
+    def _done(self, replica, latency, failed):
+        with self._lock:
+            replica.outstanding -= 1
+            if failed:
+                replica.failures += 1
+                replica.consecutive_failures += 1
+                if (replica.healthy and
+                        replica.consecutive_failures >= self.max_failures):
+                    replica.healthy = False
+                    self._start_checker()
+            else:
+                replica.consecutive_failures = 0
+                if latency is not None:
+                    if replica.latency is None:
+                        replica.latency = latency
+                    else:
+                        replica.latency += 0.2 * (latency - replica.latency)
+
+    def _rebase(self, url, replica):
+        first = self.replicas[0]
+        if url.startswith(first.root):
+            return replica.root + url[len(first.root):]
+        return replica.origin + url[len(first.origin):]
+
+    def owns(self, url):
+        "True if ``url`` is on the first replica, and so may be balanced."
+        first = self.replicas[0]
+        return url.startswith(first.root) or url.startswith(first.origin + '/')
+
+    def request(self, session, method, url, auth, kwargs):
+        """
+        Sends a request, built for the first replica, to the best replica
+        now.  Used by :class:`badgekit.BadgeKitAPI`.
+        """
+        from requests.exceptions import ConnectionError, Timeout
+        self._session = session
+        replica = self._choose()
+        for attempt in (1, 2):
+            start = time.time()
+            try:
+                resp = session.request(method, self._rebase(url, replica),
+                        auth=auth, **kwargs)
+            except (ConnectionError, Timeout):
+                self._done(replica, None, failed=True)
+                if method != 'GET' or attempt == 2 or len(self.replicas) < 2:
+                    raise
+                replica = self._choose(exclude=replica)
+                continue
+            except Exception:
+                self._done(replica, None, failed=False)
+                raise
+            latency = time.time() - start
+            failed = resp.status_code >= 500
+            if kwargs.get('stream'):
+                # In flight until its body has been read.
+                self._done_on_close(resp, replica, latency, failed)
+            else:
+                self._done(replica, latency, failed)
+            return resp
+
+    def _done_on_close(self, resp, replica, latency, failed):
+        close = resp.close
+        closed = []
+
+        def done_on_close():
+            try:
+                close()
+            finally:
+                if not closed:
+                    closed.append(True)
+                    self._done(replica, latency, failed)
+        resp.close = done_on_close
+
+    def check(self, session=None, replicas=None):
+        """
+        Pings replicas (by default, all of them) at their base URLs, putting
+        those that answer back into rotation and taking those that do not
+        out.  Returns the URLs of the healthy replicas.
+        """
+        session = session or self._session
+        if session is None:
+            import requests
+            session = requests
+        for replica in replicas or list(self.replicas):
+            try:
+                resp = session.get(replica.root,
+                        timeout=self.check_timeout)
+                healthy = (resp.status_code == 200 and
+                        resp.json().get('app') == 'BadgeKit API')
+            except Exception:
+                healthy = False
+            with self._lock:
+                replica.healthy = healthy
+                if healthy:
+                    replica.consecutive_failures = 0
+                else:
+                    self._start_checker()
+        return [r.url for r in self.replicas if r.healthy]
+
+    def _start_checker(self):
+        # Called with the lock held.  The checker clears the field, with the
+        # lock held, as it decides to stop; so a replica going down at that
+        # moment starts a new checker rather than being left unchecked.
+        if self._checker is not None:
+            return
+        self._checker = threading.Thread(target=self._check_until_healthy)
+        self._checker.daemon = True
+        self._checker.start()
+
+    def _check_until_healthy(self):
+        try:
+            while not self._closed.wait(self.check_interval):
+                with self._lock:
+                    down = [r for r in self.replicas if not r.healthy]
+                    if not down:
+                        self._checker = None
+                        return
+                self.check(replicas=down)
+        finally:
+            with self._lock:
+                if self._checker is threading.current_thread():
+                    self._checker = None
+
+    def stats(self):
+        "Returns each replica's state and counters, as a list of dicts."
+        with self._lock:
+            return [{
+                'url': r.url,
+                'healthy': r.healthy,
+                'outstanding': r.outstanding,
+                'latency': r.latency,
+                'requests': r.requests,
+                'failures': r.failures,
+                } for r in self.replicas]
+
+    def close(self):
+        "Stops the background health checks."
+        self._closed.set()
@@ -0,0 +1,162 @@
+"""
+Bulk operations on the BadgeKit API.
+
+:meth:`badgekit.BadgeKitAPI.create_many` runs many ``create`` calls through
+a thread pool.  Items are pulled from the input iterable only as slots free
+up, so a generator of millions of recipients is never held in memory, and
+each call's outcome is reported as a :class:`CreateResult`.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .api import BadgeKitException, RequestException
+
+
+__all__ = [
+        'BulkCreate',
+        'CreateResult',
+        ]
+
+
+class CreateResult(object):
+    """
+    The outcome of creating one item.
+
+    :attr index: the item's position in the input.
+    :attr data: the item itself.
+    :attr result: the server's response, if the item was created.
+    :attr error: the :class:`badgekit.BadgeKitException` (such as
+        :class:`badgekit.ResourceConflict` or :class:`badgekit.ValidationError`)
+        or :class:`badgekit.RequestException` raised instead, if any.
+    """
+    __slots__ = ('index', 'data', 'result', 'error')
+
+    def __init__(self, index, data, result=None, error=None):
+        self.index = index
+        self.data = data
+        self.result = result
+        self.error = error
+
+    @property
+    def ok(self):
+        "True if the item was created."
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return '<CreateResult %d: created>' % self.index
+        return '<CreateResult %d: %s>' % (self.index, type(self.error).__name__)
+
+
+class BulkCreate(object):
+    """
+    An iterable of :class:`CreateResult`, one per input item.
+
+    Returned by :meth:`badgekit.BadgeKitAPI.create_many`; see there for the
+    arguments.  Nothing is sent until iteration starts.  Once iteration is
+    over, :attr:`stats` holds the counts and throughput of the run.
+    """
+    def __init__(self, api, kind, items, location, max_in_flight=10,
+            ordered=False):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.api = api
+        self.kind = kind
+        self.items = items
+        self.location = location
+        self.max_in_flight = max_in_flight
+        self.ordered = ordered
+        self.stats = {
+                'submitted': 0,
+                'succeeded': 0,
+                'failed': 0,
+                'errors': {},
+                'elapsed': 0.0,
+                'per_second': 0.0,
+                }
+
+    def _create(self, item):
+        index, data = item
+        try:
+            result = self.api.create(self.kind, data, **self.location)
+        except (BadgeKitException, RequestException) as e:
+            return CreateResult(index, data, error=e)
+        return CreateResult(index, data, result=result)
+
+    def _record(self, outcome):
+        stats = self.stats
+        if outcome.ok:
+            stats['succeeded'] += 1
+        else:
+            stats['failed'] += 1
+            name = type(outcome.error).__name__
+            stats['errors'][name] = stats['errors'].get(name, 0) + 1
+
+    def __iter__(self):
+        start = time.time()
+        stats = self.stats
+
+        def submitted():
+            for item in enumerate(self.items):
+                stats['submitted'] += 1
+                yield item
+
+        try:
+            for index, outcome in _bounded_map(self._create, submitted(),
+                    self.max_in_flight, self.ordered):
+                self._record(outcome)
+                yield outcome
+        finally:
+            elapsed = time.time() - start
+            stats['elapsed'] = elapsed
+            if elapsed > 0:
+                stats['per_second'] = (
+                        stats['succeeded'] + stats['failed']) / elapsed
+
+
+def _bounded_map(func, items, max_in_flight, ordered=True):
+    '''
+    Calls ``func`` on each of ``items`` in a pool of ``max_in_flight``
+    threads, and yields ``(index, result)`` pairs: in the order of
+    ``items`` if ``ordered``, else as the calls finish.
+
+    Items are taken from ``items`` only as slots free up, and a result
+    waiting on a slower predecessor still holds its slot, so however long
+    the input, no more than ``max_in_flight`` items are held at once.
+    '''
+    items = enumerate(items)
+    pending = {}
+    done_early = {}
+    next_index = 0
+    exhausted = False
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        try:
+            while True:
+                while (not exhausted and
+                        len(pending) + len(done_early) < max_in_flight):
+                    try:
+                        index, item = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending[executor.submit(func, item)] = index
+
+                if not pending:
+                    break
+
+                finished = wait(pending, return_when=FIRST_COMPLETED)[0]
+                for future in finished:
+                    index = pending.pop(future)
+                    if ordered:
+                        done_early[index] = future.result()
+                    else:
+                        yield index, future.result()
+
+                while next_index in done_early:
+                    yield next_index, done_early.pop(next_index)
+                    next_index += 1
+        finally:
+            for future in pending:
+                future.cancel()
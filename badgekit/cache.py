@@ -0,0 +1,178 @@
+"""
+An in-memory cache of BadgeKit API responses.
+
+Pass a :class:`ResponseCache` to :class:`badgekit.BadgeKitAPI` to keep the
+results of :meth:`~badgekit.BadgeKitAPI.get` and
+:meth:`~badgekit.BadgeKitAPI.list` for a while:
+
+>>> from badgekit.cache import ResponseCache
+>>> cache = ResponseCache(maxsize=5000, ttl=60, ttls={'instance': 5})
+>>> bk = BadgeKitAPI('http://api.example.com/', 'secr3t', cache=cache)
+
+Entries are keyed on the request path built by the client, including any
+query parameters, and the least recently used entry is dropped when the
+cache is full.  A fresh entry is returned without contacting the server.
+Once an entry's time to live has passed, it is revalidated with
+``If-None-Match`` / ``If-Modified-Since`` if the server sent an ``ETag`` or
+``Last-Modified`` header, and refetched otherwise.  Creating an object
+drops every entry under the path it was posted to.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+
+__all__ = [
+        'ResponseCache',
+        ]
+
+
+class _Entry(object):
+    __slots__ = ('value', 'kind', 'expires', 'etag', 'last_modified')
+
+    def __init__(self, value, kind, expires, etag, last_modified):
+        self.value = value
+        self.kind = kind
+        self.expires = expires
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def validators(self):
+        "Headers asking the server whether this entry is still current."
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache(object):
+    """
+    A size-bounded, least-recently-used cache of decoded responses.
+
+    :param maxsize: the most entries to keep.
+    :param ttl: how long, in seconds, an entry is used without asking the
+        server.
+    :param ttls: a dict of per-kind times to live, overriding ``ttl``.  The
+        kind of a ``list`` is the kind listed; the kind of a ``get`` is the
+        innermost object in its location, e.g. ``'badge'`` for
+        ``get(system='s', badge='b')``.
+    :param copy: if true (the default), callers get a deep copy of the
+        cached value, so changing a result cannot change the cache.
+
+    The cache is safe to share between threads and between clients talking
+    to the same server.  Its counters are available from :meth:`stats`.
+    """
+    def __init__(self, maxsize=1024, ttl=60, ttls=None, copy=True):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self.copy = copy
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _ttl(self, kind):
+        return self.ttls.get(kind, self.ttl)
+
+    def _copy(self, value):
+        return copy.deepcopy(value) if self.copy else value
+
+    def lookup(self, key):
+        """
+        Returns ``(value, None)`` for a fresh entry, ``(None, headers)``
+        with revalidation headers for a stale one that can be revalidated,
+        and ``(None, None)`` otherwise.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, None
+            if entry.expires > time.time():
+                self.hits += 1
+                self._move_to_end(key)
+                return self._copy(entry.value), None
+            self.misses += 1
+            headers = entry.validators()
+            if not headers:
+                del self._entries[key]
+                return None, None
+            return None, headers
+
+    def revalidated(self, key):
+        """
+        Marks a stale entry as confirmed current by the server (a 304), and
+        returns its value, or None if it has been dropped meanwhile.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self.revalidations += 1
+            entry.expires = time.time() + self._ttl(entry.kind)
+            self._move_to_end(key)
+            return self._copy(entry.value)
+
+    def store(self, key, kind, value, etag=None, last_modified=None):
+        "Caches ``value`` for ``key``, evicting old entries if needed."
+        ttl = self._ttl(kind)
+        if ttl <= 0 and not (etag or last_modified):
+            return
+        entry = _Entry(self._copy(value), kind, time.time() + ttl,
+                etag, last_modified)
+        with self._lock:
+            self._entries[key] = entry
+            self._move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, prefix):
+        """
+        Drops the entry for ``prefix`` and every entry below it, e.g.
+        ``'systems/s/badges'`` drops ``'systems/s/badges?archived=true'``
+        and ``'systems/s/badges/b'``.
+        """
+        with self._lock:
+            doomed = [key for key in self._entries
+                    if key == prefix
+                    or key.startswith(prefix + '/')
+                    or key.startswith(prefix + '?')]
+            for key in doomed:
+                del self._entries[key]
+            self.invalidations += len(doomed)
+
+    def clear(self):
+        "Drops every entry."
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        "Returns the cache's counters as a dict."
+        with self._lock:
+            return {
+                    'size': len(self._entries),
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'revalidations': self.revalidations,
+                    'evictions': self.evictions,
+                    'invalidations': self.invalidations,
+                    }
+
+    def _move_to_end(self, key):
+        try:
+            self._entries.move_to_end(key)
+        except AttributeError:
+            # Python 2's OrderedDict has no move_to_end
+            self._entries[key] = self._entries.pop(key)
@@ -0,0 +1,159 @@
+"""
+Parallel crawling of a BadgeKit system.
+
+:meth:`badgekit.BadgeKitAPI.crawl` walks the tree of systems, issuers,
+programs and badges breadth-first, listing each object's children as soon
+as the object itself has been found, with a bounded pool of workers:
+
+>>> for node in bk.crawl(system='mysystem'):
+...     print(node.kind, node.location, node.data['name'])
+
+Objects are yielded as their parent's listing arrives, so a caller can
+start working on the first issuers while the badges of the last are still
+being fetched.  The walk can be limited to some kinds, and to some depth
+below the starting location.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .api import BadgeKitException, RequestException, _api_plural, \
+        _innermost_kind, _make_path
+
+
+__all__ = [
+        'Crawl',
+        'Node',
+        ]
+
+
+# The kinds listed inside an object of each kind; None is the server root.
+_children = {
+        None: ('system',),
+        'system': ('issuer',),
+        'issuer': ('program',),
+        'program': ('badge',),
+        'badge': ('instance', 'application'),
+        'application': ('evidence', 'comment'),
+        }
+
+default_kinds = ('system', 'issuer', 'program', 'badge')
+
+
+class Node(object):
+    """
+    An object found by a crawl.
+
+    :attr kind: the object's kind, such as ``'badge'``.
+    :attr location: the object's location, as a dict of keyword arguments
+        that :meth:`badgekit.BadgeKitAPI.get` would accept.
+    :attr data: the object, as it appeared in its parent's listing (a
+        record, if the client returns records).
+    :attr depth: how many levels below the crawl's starting location the
+        object is.
+    """
+    __slots__ = ('kind', 'location', 'data', 'depth')
+
+    def __init__(self, kind, location, data, depth):
+        self.kind = kind
+        self.location = location
+        self.data = data
+        self.depth = depth
+
+    def __repr__(self):
+        return '<Node %s>' % _make_path(**self.location)
+
+
+class Crawl(object):
+    """
+    An iterable of :class:`Node`, one per object found.
+
+    Returned by :meth:`badgekit.BadgeKitAPI.crawl`; see there for the
+    arguments.  Nothing is fetched until iteration starts.  A listing that
+    fails does not stop the crawl: the error is kept in :attr:`failures`,
+    as ``(path, exception)`` pairs, and counted in :attr:`stats`.
+    """
+    def __init__(self, api, location, kinds=default_kinds, max_depth=None,
+            max_workers=8):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.api = api
+        self.location = location
+        self.kinds = frozenset(kinds)
+        self.max_depth = max_depth
+        self.max_workers = max_workers
+        self.failures = []
+        self.stats = {
+                'listings': 0,
+                'objects': 0,
+                'errors': {},
+                'elapsed': 0.0,
+                }
+
+    def _list(self, kind, location, depth):
+        path = _make_path(_api_plural(kind), **location)
+        try:
+            resp_obj = self.api._read(path, kind)
+        except (BadgeKitException, RequestException) as e:
+            return kind, location, depth, path, None, e
+        return kind, location, depth, path, resp_obj, None
+
+    def _child_kinds(self, kind):
+        return [child for child in _children.get(kind, ())
+                if child in self.kinds]
+
+    def __iter__(self):
+        start = time.time()
+        pending = set()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            def expand(kind, location, depth):
+                if self.max_depth is not None and depth >= self.max_depth:
+                    return
+                for child in self._child_kinds(kind):
+                    pending.add(executor.submit(self._list, child, location,
+                        depth + 1))
+
+            try:
+                expand(_innermost_kind(self.location), self.location, 0)
+                while pending:
+                    finished = wait(pending, return_when=FIRST_COMPLETED)[0]
+                    pending.difference_update(finished)
+                    for future in finished:
+                        for node in self._found(future.result(), expand):
+                            yield node
+            finally:
+                for future in pending:
+                    future.cancel()
+                self.stats['elapsed'] = time.time() - start
+
+    def _found(self, listed, expand):
+        '''
+        Starts listing the children of the objects in a finished listing,
+        and returns them as nodes.
+        '''
+        kind, parent, depth, path, resp_obj, error = listed
+        self.stats['listings'] += 1
+        if error is not None:
+            self.failures.append((path, error))
+            name = type(error).__name__
+            self.stats['errors'][name] = self.stats['errors'].get(name, 0) + 1
+            return []
+
+        items = resp_obj.get(_api_plural(kind)) or []
+        nodes = []
+        for item in items:
+            slug = item.get('slug')
+            if slug is None:
+                continue
+            location = dict(parent)
+            location[kind] = slug
+            expand(kind, location, depth)
+            nodes.append(Node(kind, location, item, depth))
+        self.stats['objects'] += len(nodes)
+
+        if self.api.records:
+            from .records import to_record
+            for node in nodes:
+                node.data = to_record(kind, node.data)
+        return nodes
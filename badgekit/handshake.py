@@ -0,0 +1,269 @@
+"""
+A shared, cached handshake with the BadgeKit API server.
+
+:meth:`~badgekit.BadgeKitAPI.server_version` and
+:meth:`~badgekit.BadgeKitAPI.require_server_version` ask the server's root,
+``GET /``, for its name and version.  With a :class:`Handshake`, that
+request is made once per base URL and its answer kept, for every client
+sharing the handshake:
+
+>>> from badgekit.handshake import Handshake
+>>> handshake = Handshake(ttl=300, path='/tmp/badgekit-handshake.json',
+...         features={'paging': '0.3.0'})
+>>> bk = BadgeKitAPI('http://api.example.com/', 'secr3t', handshake=handshake)
+>>> bk.require_server_version('0.2.2')
+>>> bk.server_info().features
+{'paging': True}
+
+Pass ``handshake=True`` to share one handshake among all the clients of a
+process.  An answer is used as is for ``ttl`` seconds.  After that, for up
+to ``max_stale`` seconds more, callers still get it straight away while a
+background thread asks the server again, so a slow server never stalls a
+worker that only wanted the version.  Only once an answer is older than
+that, or if there is none, do callers wait for the server; concurrent
+callers then share one request.
+
+With a ``path``, answers are also kept in a JSON file, so that processes
+(such as preforked workers) share them: one starting after the first takes
+its answer, and one whose answer has grown stale first looks for a fresher
+one there.  The file is replaced atomically, under a lock on
+``path + '.lock'`` on POSIX systems, and can be deleted at any time.
+"""
+
+import json
+import os
+import threading
+import time
+try:
+    from urlparse import urljoin
+except ImportError:
+    from urllib.parse import urljoin
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .api import _parse_version
+from .singleflight import SingleFlight
+
+
+__all__ = [
+        'Handshake',
+        'ServerInfo',
+        'shared_handshake',
+        ]
+
+
+_replace = getattr(os, 'replace', os.rename)
+
+
+class ServerInfo(object):
+    """
+    What the server said about itself.
+
+    :attr baseurl: the server's base URL.
+    :attr app: the application name, normally ``'BadgeKit API'``.
+    :attr version: the version, as a string.
+    :attr features: a dict of feature flags, true for each feature whose
+        minimum version the server has reached.
+    :attr fetched: when the answer was fetched, as a Unix time.
+    """
+    __slots__ = ('baseurl', 'app', 'version', 'features', 'fetched')
+
+    def __init__(self, baseurl, app, version, features, fetched):
+        self.baseurl = baseurl
+        self.app = app
+        self.version = version
+        self.features = features
+        self.fetched = fetched
+
+    def at_least(self, version):
+        "True if the server's version is ``version`` or later."
+        return _parse_version(self.version) >= _parse_version(version)
+
+    def __repr__(self):
+        return '<ServerInfo %s: %s %s>' % (self.baseurl, self.app, self.version)
+
+
+class Handshake(object):
+    """
+    A cache of server handshakes, keyed by base URL.
+
+    :param ttl: seconds to use an answer without asking the server again.
+    :param max_stale: seconds after ``ttl`` during which an answer is still
+        used, while it is refreshed in the background.
+    :param path: a JSON file in which to share answers between processes.
+    :param features: a dict mapping feature names to the first server
+        version that has them, from which each answer's feature flags are
+        worked out.
+
+    A handshake is safe to share between threads and between clients.
+    """
+    def __init__(self, ttl=300, max_stale=3600, path=None, features=None):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.path = path
+        self.features = dict(features or {})
+        self._entries = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight(copy=False)
+        self.stats = {
+                'hits': 0,
+                'stale_hits': 0,
+                'disk_hits': 0,
+                'fetches': 0,
+                'background_refreshes': 0,
+                'errors': 0,
+                }
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _make_info(self, baseurl, app, version, fetched):
+        features = {}
+        for name, minimum in self.features.items():
+            try:
+                features[name] = (
+                        _parse_version(version) >= _parse_version(minimum))
+            except ValueError:
+                features[name] = False
+        return ServerInfo(baseurl, app, version, features, fetched)
+
+    def info(self, api):
+        """
+        Returns the :class:`ServerInfo` of the server ``api`` talks to,
+        asking the server only if there is no usable answer.
+        """
+        key = api.baseurl.rstrip('/')
+        entry = self._entries.get(key)
+        if self.path is not None and (entry is None or
+                time.time() - entry.fetched >= self.ttl):
+            # Another process may have asked the server since.
+            saved = self._load(key)
+            if saved is not None and (entry is None or
+                    saved.fetched > entry.fetched):
+                self._count('disk_hits')
+                with self._lock:
+                    current = self._entries.get(key)
+                    if current is None or current.fetched < saved.fetched:
+                        self._entries[key] = saved
+                entry = saved
+
+        if entry is not None:
+            age = time.time() - entry.fetched
+            if age < self.ttl:
+                self._count('hits')
+                return entry
+            if age < self.ttl + self.max_stale:
+                self._count('stale_hits')
+                self._refresh_in_background(api, key)
+                return entry
+
+        return self._flight.do(key, lambda: self._fetch(api, key))
+
+    def invalidate(self, baseurl=None):
+        """
+        Forgets the answer for ``baseurl``, or all answers, in this
+        process.  The file given as ``path`` is left alone.
+        """
+        with self._lock:
+            if baseurl is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(baseurl.rstrip('/'), None)
+
+    def _fetch(self, api, key):
+        self._count('fetches')
+        resp = api._send('GET', urljoin(api.baseurl, '/'))
+        resp_obj = api._json_loads(resp.content)
+        if resp.status_code != 200:
+            api._raise_error(resp_obj, resp.request, resp.status_code)
+        info = self._make_info(key, resp_obj.get('app'), resp_obj['version'],
+                time.time())
+        with self._lock:
+            self._entries[key] = info
+        if self.path is not None:
+            self._save(info)
+        return info
+
+    def _refresh_in_background(self, api, key):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            self.stats['background_refreshes'] += 1
+
+        def refresh():
+            try:
+                self._flight.do(key, lambda: self._fetch(api, key))
+            except Exception:
+                # The stale answer stays in use; the next caller tries again.
+                self._count('errors')
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        thread = threading.Thread(target=refresh)
+        thread.daemon = True
+        thread.start()
+
+    def _read_file(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _load(self, key):
+        saved = self._read_file().get(key)
+        if not isinstance(saved, dict):
+            return None
+        try:
+            return self._make_info(key, saved.get('app'), saved['version'],
+                    float(saved['fetched']))
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def _save(self, info):
+        # Other processes, and threads, update the file too: read, change
+        # and replace it under a lock, so that no one's answer is lost.
+        temp = '%s.%d.%d.tmp' % (self.path, os.getpid(),
+                threading.current_thread().ident)
+        lock_file = None
+        try:
+            if fcntl is not None:
+                lock_file = open(self.path + '.lock', 'a')
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            saved = self._read_file()
+            saved[info.baseurl] = {
+                    'app': info.app,
+                    'version': info.version,
+                    'fetched': info.fetched,
+                    }
+            with open(temp, 'w') as f:
+                json.dump(saved, f)
+            _replace(temp, self.path)
+        except (IOError, OSError):
+            # Sharing is an optimization; a read-only disk only loses it.
+            self._count('errors')
+        finally:
+            if lock_file is not None:
+                lock_file.close()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_handshake():
+    """
+    Returns the :class:`Handshake` used by every client created with
+    ``handshake=True``.
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Handshake()
+        return _shared
@@ -0,0 +1,178 @@
+"""
+Hedged requests, to cut the tail latency of idempotent calls.
+
+With a :class:`HedgePolicy`, a ``GET`` that has not been answered after a
+short delay is sent a second time, and whichever copy answers first is
+used.  A slow response from one overloaded server process then costs the
+delay plus a normal response time, rather than the whole slow response:
+
+>>> from badgekit.hedge import HedgePolicy
+>>> bk = BadgeKitAPI('http://api.example.com/', 'secr3t',
+...         hedge=HedgePolicy(percentile=95, max_extra=0.05))
+
+Only ``GET`` requests are hedged: those made by ``get``, ``list``,
+``ping``, ``server_version`` and ``get_public_url``.  ``create`` is never
+sent twice.
+"""
+
+import collections
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FutureTimeout
+
+
+__all__ = [
+        'HedgePolicy',
+        ]
+
+
+class HedgePolicy(object):
+    """
+    Decides when to send a duplicate request, and runs both copies.
+
+    :param delay: a fixed delay, in seconds, before hedging.  If None, the
+        delay follows the observed latencies (see ``percentile``).
+    :param percentile: hedge requests slower than this percentile of the
+        latencies seen recently.
+    :param initial_delay: the delay used until enough latencies have been
+        seen to estimate the percentile.
+    :param min_delay: the shortest delay ever used.
+    :param max_extra: the most hedges to send, as a fraction of all
+        requests, so that hedging cannot more than slightly add to the load
+        on a struggling server.
+    :param window: how many recent latencies to keep.
+    :param max_workers: the size of the thread pool running the requests.
+    :param queue_timeout: seconds a request may wait for a free worker
+        before it is sent from the calling thread instead, unhedged.
+
+    A policy, with its counters, may be shared between clients.
+    """
+    def __init__(self, delay=None, percentile=95, initial_delay=0.1,
+            min_delay=0.005, max_extra=0.1, window=1000, max_workers=32,
+            queue_timeout=1.0):
+        self.fixed_delay = delay
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_extra = max_extra
+        self.delay = delay if delay is not None else initial_delay
+        self._latencies = collections.deque(maxlen=window)
+        self._new_samples = 0
+        self._lock = threading.Lock()
+        self.max_workers = max_workers
+        self.queue_timeout = queue_timeout
+        self._executor = None
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _record(self, latency):
+        with self._lock:
+            self._latencies.append(latency)
+            self._new_samples += 1
+            if self.fixed_delay is None and self._new_samples >= 50:
+                self._new_samples = 0
+                ordered = sorted(self._latencies)
+                index = int(len(ordered) * self.percentile / 100.0)
+                self.delay = max(self.min_delay,
+                        ordered[min(index, len(ordered) - 1)])
+
+    def _timed(self, func):
+        start = time.time()
+        result = func()
+        self._record(time.time() - start)
+        return result
+
+    def _submit(self, func):
+        while True:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                            max_workers=self.max_workers)
+                executor = self._executor
+            try:
+                return executor.submit(func)
+            except RuntimeError:
+                # Closed by another client just now; start a new pool.
+                with self._lock:
+                    if self._executor is executor:
+                        self._executor = None
+
+    def _may_hedge(self):
+        with self._lock:
+            if self.hedges + 1 > self.max_extra * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    def call(self, func):
+        """
+        Calls ``func``, and calls it again if it is slower than the current
+        delay.  Returns the first successful result; if both calls fail,
+        raises the first call's exception.  A losing result is closed, if
+        it can be.
+        """
+        with self._lock:
+            self.requests += 1
+            delay = self.delay
+
+        # The delay runs from when the primary starts, not from when it
+        # was queued: otherwise, with the pool saturated, every queued call
+        # would hedge, adding load just when there is least room for it.
+        started = threading.Event()
+
+        def run_primary():
+            started.set()
+            return self._timed(func)
+
+        primary = self._submit(run_primary)
+        if not started.wait(self.queue_timeout) and primary.cancel():
+            # The pool is saturated, or was shut down under us.
+            return self._timed(func)
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeout:
+            pass
+        if not self._may_hedge():
+            return primary.result()
+
+        hedge = self._submit(lambda: self._timed(func))
+        pending = set([primary, hedge])
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    for loser in pending:
+                        loser.add_done_callback(_close_result)
+                    return future.result()
+        return primary.result()
+
+    def stats(self):
+        "Returns the policy's counters and current delay as a dict."
+        with self._lock:
+            return {
+                    'requests': self.requests,
+                    'hedges': self.hedges,
+                    'hedge_wins': self.hedge_wins,
+                    'delay': self.delay,
+                    }
+
+    def close(self):
+        """
+        Stops the policy's worker threads.  A policy used again afterwards
+        starts new ones, so closing one shared between clients is safe.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+def _close_result(future):
+    if future.exception() is None:
+        close = getattr(future.result(), 'close', None)
+        if close is not None:
+            close()
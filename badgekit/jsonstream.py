@@ -0,0 +1,130 @@
+"""
+Incremental decoding of large JSON collections.
+
+BadgeKit API listings are a JSON object with the collection under one key,
+e.g. ``{"instances": [{...}, {...}, ...]}``.  :func:`iter_json_array` reads
+such a document from an iterable of byte chunks and yields the elements of
+that one array as soon as each is complete, so only one element is held in
+memory at a time, rather than the whole body and its decoded tree.
+"""
+
+import codecs
+import json
+
+from .api import APIError
+
+
+__all__ = [
+        'iter_json_array',
+        ]
+
+
+_whitespace = ' \t\n\r'
+
+_decoder = json.JSONDecoder()
+
+# Drop the consumed part of the buffer once it is this long
+_compact_at = 1 << 16
+
+
+class _Reader(object):
+    '''
+    A str buffer over a stream of byte chunks, with a read position.
+    '''
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        "Reads one more chunk; returns False at the end of the stream."
+        if self.eof:
+            return False
+        if self.pos >= _compact_at:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        try:
+            for chunk in self.chunks:
+                text = self.decoder.decode(chunk)
+                if text:
+                    self.buf += text
+                    return True
+            self.buf += self.decoder.decode(b'', True)
+        except UnicodeDecodeError:
+            raise APIError("Invalid UTF-8 in BadgeKit response")
+        self.eof = True
+        return False
+
+    def peek(self):
+        "Returns the next non-whitespace character, or '' at the end."
+        while True:
+            buf, pos = self.buf, self.pos
+            while pos < len(buf) and buf[pos] in _whitespace:
+                pos += 1
+            self.pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise APIError("Invalid JSON in BadgeKit response")
+        self.pos += 1
+        return char
+
+    def value(self):
+        '''
+        Decodes the JSON value at the read position, reading more of the
+        stream until it is complete.
+        '''
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                if self.eof:
+                    raise APIError("Invalid JSON in BadgeKit response")
+            else:
+                # A number at the very end of the buffer might continue
+                # in the next chunk.
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            # Read as much again as is buffered before trying again, so a
+            # large value is decoded a few times, not once for every chunk.
+            pending = len(self.buf) - self.pos
+            while len(self.buf) - self.pos <= 2 * pending and self.fill():
+                pass
+
+
+def iter_json_array(chunks, key):
+    """
+    Yields the elements of the array under ``key`` in a JSON object read
+    from ``chunks``, an iterable of UTF-8 encoded byte strings.
+
+    Values under other keys are decoded and discarded.  Nothing is yielded
+    if the object has no such key.  Raises :class:`badgekit.APIError` if
+    the document is not valid JSON.
+    """
+    reader = _Reader(chunks)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        name = reader.value()
+        reader.expect(':')
+        if name == key and reader.peek() == '[':
+            reader.pos += 1
+            if reader.peek() == ']':
+                return
+            while True:
+                yield reader.value()
+                if reader.expect(',]') == ']':
+                    return
+        reader.value()
+        if reader.expect(',}') == '}':
+            return
@@ -0,0 +1,181 @@
+"""
+Adaptive concurrency limiting, for bulk work against the BadgeKit API.
+
+A fixed number of threads either leaves a server idle or pushes it into
+timeouts.  Give :class:`badgekit.BadgeKitAPI` an :class:`AdaptiveLimiter`
+and every request it sends first waits for a slot, while the number of
+slots follows what the server can take: it grows by one for each round of
+healthy responses, and is cut by half when a response is slow, a ``429``
+or ``5xx`` (such as ``503``), or a connection error or timeout.  This is
+the additive-increase, multiplicative-decrease (AIMD) rule that TCP uses
+for its congestion window.
+
+>>> from badgekit.limiter import AdaptiveLimiter
+>>> limiter = AdaptiveLimiter(initial=4, max_limit=64)
+>>> bk = BadgeKitAPI('http://api.example.com/', 'secr3t', limiter=limiter)
+>>> for result in bk.create_many('instance', recipients, system='s', badge='b'):
+...     pass
+>>> limiter.stats()
+{'limit': 23, 'in_flight': 0, 'throughput': 310.5, ...}
+
+The limiter only holds requests back; bulk helpers such as
+:meth:`~badgekit.BadgeKitAPI.create_many`, :meth:`~badgekit.BadgeKitAPI.crawl`
+and :func:`badgekit.snapshot.import_snapshot` still need enough threads to
+fill the slots.  ``create_many`` sizes its pool to ``max_limit`` by itself.
+
+A response is slow if it takes more than ``tolerance`` times the fastest
+of the last ``window`` responses for the same route, such as
+``GET systems/:system``: a ``create`` is not judged against a ``ping``.  Failures of requests sent before the
+last cut do not cut the limit again, so one burst of errors halves it only
+once.
+"""
+
+import collections
+import threading
+import time
+
+
+__all__ = [
+        'AdaptiveLimiter',
+        ]
+
+
+class AdaptiveLimiter(object):
+    """
+    An AIMD limit on the number of requests in flight.
+
+    :param initial: the limit to start at.
+    :param min_limit: the limit is never cut below this.
+    :param max_limit: the limit never grows past this.
+    :param decrease: the factor the limit is multiplied by when the server
+        shows signs of overload.
+    :param tolerance: how many times slower than the fastest recent
+        response a response may be before it counts as slow.  None turns
+        latency-based cuts off.
+    :param window: how many recent latencies, per route, to judge
+        slowness against.
+    :param throughput_window: seconds over which throughput is measured.
+
+    A limiter is safe to share between threads and clients; clients that
+    share one share its slots.
+    """
+    def __init__(self, initial=4, min_limit=1, max_limit=64, decrease=0.5,
+            tolerance=3.0, window=100, throughput_window=5.0):
+        if not 1 <= min_limit <= initial <= max_limit:
+            raise ValueError(
+                    "Need 1 <= min_limit <= initial <= max_limit")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.tolerance = tolerance
+        self.throughput_window = throughput_window
+        self.window = window
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._latencies = {}
+        self._completions = collections.deque()
+        self._last_cut = 0.0
+        self._cond = threading.Condition(threading.Lock())
+        self.successes = 0
+        self.overloads = 0
+        self.cuts = 0
+
+    @property
+    def limit(self):
+        "The current number of slots."
+        return int(self._limit)
+
+    @property
+    def throughput(self):
+        "Requests completed per second, over the last ``throughput_window``."
+        with self._cond:
+            return self._throughput(time.time())
+
+    def _trim(self, now):
+        completions = self._completions
+        while completions and completions[0] < now - self.throughput_window:
+            completions.popleft()
+
+    def _throughput(self, now):
+        self._trim(now)
+        return len(self._completions) / float(self.throughput_window)
+
+    def acquire(self):
+        """
+        Waits for a free slot and takes it.  Returns the time the slot was
+        taken, to pass to :meth:`release`.
+        """
+        with self._cond:
+            while self._in_flight >= int(self._limit):
+                self._cond.wait()
+            self._in_flight += 1
+        return time.time()
+
+    def release(self, started, status=None, error=None, route=None):
+        """
+        Frees a slot taken at ``started``, and adjusts the limit by how the
+        request went: its HTTP ``status``, or the ``error`` raised instead.
+        Its latency is judged against those of other requests for the same
+        ``route``.
+        """
+        now = time.time()
+        latency = now - started
+        with self._cond:
+            self._in_flight -= 1
+            self._completions.append(now)
+            self._trim(now)
+            latencies = self._latencies.get(route)
+            if latencies is None:
+                latencies = self._latencies[route] = collections.deque(
+                        maxlen=self.window)
+            overloaded = self._overloaded(latency, status, error, latencies)
+            if overloaded:
+                self.overloads += 1
+                if started >= self._last_cut:
+                    self._limit = max(float(self.min_limit),
+                            self._limit * self.decrease)
+                    self._last_cut = now
+                    self.cuts += 1
+            elif error is None:
+                self.successes += 1
+                latencies.append(latency)
+                # One more slot per limit's worth of healthy responses.
+                self._limit = min(float(self.max_limit),
+                        self._limit + 1.0 / self._limit)
+            self._cond.notify_all()
+
+    def _overloaded(self, latency, status, error, latencies):
+        if error is not None:
+            from requests.exceptions import ConnectionError, Timeout
+            return isinstance(error, (ConnectionError, Timeout))
+        if status is not None and (status == 429 or status >= 500):
+            return True
+        if self.tolerance is not None and len(latencies) >= 10:
+            return latency > self.tolerance * min(latencies)
+        return False
+
+    def call(self, send, route=None):
+        """
+        Calls ``send()``, which returns a response, in a slot.  ``route``
+        names what kind of request it is, as for :meth:`release`.
+        """
+        started = self.acquire()
+        try:
+            resp = send()
+        except Exception as e:
+            self.release(started, error=e, route=route)
+            raise
+        self.release(started, status=resp.status_code, route=route)
+        return resp
+
+    def stats(self):
+        "Returns the limit, the requests in flight, throughput and counters."
+        with self._cond:
+            return {
+                    'limit': int(self._limit),
+                    'in_flight': self._in_flight,
+                    'throughput': self._throughput(time.time()),
+                    'successes': self.successes,
+                    'overloads': self.overloads,
+                    'cuts': self.cuts,
+                    }
@@ -0,0 +1,362 @@
+"""
+Load generation, for sizing BadgeKit API deployments.
+
+:class:`LoadGenerator` drives a mix of ``list``, ``get`` and ``create`` calls
+through a :class:`badgekit.BadgeKitAPI`, either as fast as a fixed number of
+workers can go, or at a target rate.  The ``badgekit-loadgen`` command runs
+it from the shell and prints a report:
+
+.. code-block:: sh
+
+    badgekit-loadgen http://api.example.com/ --secret secr3t \\
+        --system mysystem --badge load-test --rate 200 --duration 60
+
+    # Against a stand-in server on this machine, to try the tool out
+    badgekit-loadgen --stand-in --rate 200 --duration 10
+
+At a target rate, the load is open-loop: request ``i`` is due at
+``start + i / rate`` whether or not earlier requests have been answered,
+and its latency is counted from when it was due, not from when a worker got
+round to sending it.  A server that stalls therefore shows up in the
+percentiles as the wait it caused every request queued behind it, rather
+than as one slow request (the "coordinated omission" that closed-loop
+tools suffer from).  If the workers cannot keep up with the rate, add more
+with ``--concurrency``.
+
+Requests made during the warm-up period are sent but not counted.
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+
+from .api import BadgeKitAPI, BadgeKitException, RequestException, \
+        _path_order
+
+
+__all__ = [
+        'LoadGenerator',
+        'format_report',
+        'main',
+        'parse_mix',
+        ]
+
+
+operations = ('list', 'get', 'create')
+
+
+def parse_mix(text):
+    """
+    Parses a mix of operations such as ``'list=1,get=4,create=5'`` into a
+    list of ``(operation, weight)`` pairs.
+    """
+    mix = []
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in operations:
+            raise ValueError("Unknown operation %r; choose from %s"
+                    % (name, ', '.join(operations)))
+        weight = float(weight) if weight else 1.0
+        if weight < 0:
+            raise ValueError("Weight of %r must not be negative" % name)
+        mix.append((name, weight))
+    if not sum(weight for name, weight in mix):
+        raise ValueError("The mix must have some weight")
+    return mix
+
+
+def _percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100.0))
+    return ordered[index]
+
+
+def _summarize(latencies):
+    latencies = sorted(latencies)
+    if not latencies:
+        return {}
+    return {
+            'mean': sum(latencies) / len(latencies),
+            'p50': _percentile(latencies, 50),
+            'p90': _percentile(latencies, 90),
+            'p99': _percentile(latencies, 99),
+            'p99.9': _percentile(latencies, 99.9),
+            'max': latencies[-1],
+            }
+
+
+class LoadGenerator(object):
+    """
+    Sends a mix of calls to the API, and measures their latency.
+
+    :param api: the :class:`badgekit.BadgeKitAPI` to call through.
+    :param mix: a list of ``(operation, weight)`` pairs, where operation is
+        ``'list'``, ``'get'`` or ``'create'``; see :func:`parse_mix`.
+    :param location: keyword arguments giving the object that is fetched by
+        ``get``; ``list`` and ``create`` work on the instances inside it.
+        Usually a badge.
+    :param rate: the target requests per second.  If None, each worker
+        sends its next request as soon as the last one is answered.
+    :param concurrency: the number of worker threads, and so the most
+        requests in flight at once.
+    :param duration: seconds to send requests for, after the warm-up.
+    :param warmup: seconds to send requests for before counting them.
+    :param create_kind: the kind of object that ``create`` creates and
+        ``list`` lists.
+    :param seed: a seed for choosing operations, to make runs repeatable.
+    """
+    def __init__(self, api, mix, location, rate=None, concurrency=10,
+            duration=10.0, warmup=2.0, create_kind='instance', seed=None):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be positive")
+        self.api = api
+        self.mix = mix
+        self.location = location
+        self.rate = rate
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.create_kind = create_kind
+        self._random = random.Random(seed)
+        self._run_id = '%x' % int(time.time() * 1000)
+        self._lock = threading.Lock()
+
+        total = float(sum(weight for name, weight in mix))
+        self._cumulative = []
+        running = 0.0
+        for name, weight in mix:
+            running += weight / total
+            self._cumulative.append((running, name))
+
+    def _choose(self):
+        point = self._random.random()
+        for bound, name in self._cumulative:
+            if point < bound:
+                return name
+        return self._cumulative[-1][1]
+
+    def _call(self, operation, index):
+        if operation == 'get':
+            return self.api.get(**self.location)
+        if operation == 'list':
+            return self.api.list(self.create_kind, **self.location)
+        data = {
+                'slug': 'loadgen-%s-%d' % (self._run_id, index),
+                'email': 'loadgen+%s-%d@example.org' % (self._run_id, index),
+                }
+        return self.api.create(self.create_kind, data, **self.location)
+
+    def _work(self, start, measure_from, end, results):
+        while True:
+            with self._lock:
+                index = self._next
+                self._next += 1
+                operation = self._choose()
+            if self.rate is not None:
+                due = start + index / self.rate
+                if due >= end:
+                    return
+                wait = due - time.time()
+                if wait > 0:
+                    time.sleep(wait)
+            else:
+                due = time.time()
+                if due >= end:
+                    return
+
+            sent = time.time()
+            error = None
+            try:
+                self._call(operation, index)
+            except (BadgeKitException, RequestException) as e:
+                error = type(e).__name__
+            finished = time.time()
+
+            if due >= measure_from:
+                results.append((operation, finished - due, finished - sent,
+                    error))
+
+    def run(self):
+        """
+        Runs the load, and returns a report as a dict; see
+        :func:`format_report`.
+        """
+        self._next = 0
+        results = []
+        start = time.time()
+        measure_from = start + self.warmup
+        end = measure_from + self.duration
+        threads = [threading.Thread(target=self._work,
+            args=(start, measure_from, end, results))
+            for i in range(self.concurrency)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = max(time.time(), end) - measure_from
+        return self._report(results, elapsed)
+
+    def _report(self, results, elapsed):
+        by_operation = {}
+        for operation, latency, service, error in results:
+            entry = by_operation.setdefault(operation,
+                    {'latencies': [], 'service': [], 'errors': {}})
+            entry['latencies'].append(latency)
+            entry['service'].append(service)
+            if error is not None:
+                entry['errors'][error] = entry['errors'].get(error, 0) + 1
+
+        report = {
+                'target_rate': self.rate,
+                'concurrency': self.concurrency,
+                'duration': elapsed,
+                'requests': len(results),
+                'errors': sum(1 for result in results if result[3]),
+                'throughput': len(results) / elapsed if elapsed else 0.0,
+                'latency': _summarize(result[1] for result in results),
+                'operations': {},
+                }
+        for operation, entry in by_operation.items():
+            report['operations'][operation] = {
+                    'requests': len(entry['latencies']),
+                    'errors': entry['errors'],
+                    'throughput': len(entry['latencies']) / elapsed,
+                    'latency': _summarize(entry['latencies']),
+                    'service_time': _summarize(entry['service']),
+                    }
+        return report
+
+
+def format_report(report):
+    """
+    Formats a report from :meth:`LoadGenerator.run` as a table.  Latencies
+    are counted from when each request was due; service times from when it
+    was actually sent.
+    """
+    lines = []
+    target = report['target_rate']
+    lines.append('%d requests in %.1fs: %.1f/s%s, %d errors' % (
+        report['requests'], report['duration'], report['throughput'],
+        ' (target %g/s)' % target if target else '', report['errors']))
+    lines.append('')
+    lines.append('%-8s %8s %8s %9s %9s %9s %9s %9s %9s' % ('', 'requests',
+        'errors', 'req/s', 'p50 ms', 'p90 ms', 'p99 ms', 'p99.9 ms', 'max ms'))
+
+    def row(name, requests, errors, throughput, latency):
+        lines.append('%-8s %8d %8d %9.1f %9.2f %9.2f %9.2f %9.2f %9.2f' % (
+            name, requests, errors, throughput,
+            1000 * latency.get('p50', 0), 1000 * latency.get('p90', 0),
+            1000 * latency.get('p99', 0), 1000 * latency.get('p99.9', 0),
+            1000 * latency.get('max', 0)))
+
+    for name, entry in sorted(report['operations'].items()):
+        row(name, entry['requests'], sum(entry['errors'].values()),
+                entry['throughput'], entry['latency'])
+    row('all', report['requests'], report['errors'], report['throughput'],
+            report['latency'])
+
+    errors = {}
+    for entry in report['operations'].values():
+        for name, count in entry['errors'].items():
+            errors[name] = errors.get(name, 0) + count
+    if errors:
+        lines.append('')
+        for name, count in sorted(errors.items()):
+            lines.append('%s: %d' % (name, count))
+    return '\n'.join(lines)
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog='badgekit-loadgen',
+            description='Send a mix of calls to a BadgeKit API server, '
+            'and report latency and throughput.')
+    parser.add_argument('baseurl', nargs='?',
+            help='the base URL of the API; omit with --stand-in')
+    parser.add_argument('--secret', default='secret',
+            help='the secret to sign requests with')
+    parser.add_argument('--key', default='master',
+            help='the key (in the JWT) the secret belongs to')
+    parser.add_argument('--mix', default='list=1,get=4,create=5',
+            help='weights of each operation (default: %(default)s)')
+    parser.add_argument('--rate', type=float,
+            help='target requests per second; without this, each worker '
+            'sends requests back to back')
+    parser.add_argument('--concurrency', type=int, default=10,
+            help='worker threads, and so the most requests in flight')
+    parser.add_argument('--duration', type=float, default=10.0,
+            help='seconds to measure for')
+    parser.add_argument('--warmup', type=float, default=2.0,
+            help='seconds to send requests for before measuring')
+    for kind in _path_order:
+        if kind != 'instance':
+            parser.add_argument('--' + kind,
+                    help='the %s that calls work in' % kind)
+    parser.add_argument('--stand-in', action='store_true',
+            help='run against a stand-in server on this machine')
+    parser.add_argument('--latency', type=float, default=0.0,
+            help='with --stand-in, seconds the server waits per request')
+    parser.add_argument('--json', metavar='FILE',
+            help='also write the report to FILE as JSON')
+    parser.add_argument('--seed', type=int,
+            help='seed for choosing operations')
+    return parser
+
+
+def main(argv=None):
+    "Runs the ``badgekit-loadgen`` command."
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if not args.baseurl and not args.stand_in:
+        parser.error('give a base URL, or --stand-in')
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    location = dict((kind, getattr(args, kind)) for kind in _path_order
+            if kind != 'instance' and getattr(args, kind))
+    server = None
+    baseurl = args.baseurl
+    if args.stand_in:
+        from .testing import StandInServer
+        location.setdefault('system', 'loadgen')
+        location.setdefault('badge', 'loadgen-badge')
+        server = StandInServer(secret=args.secret, latency=args.latency)
+        baseurl = server.url
+        levels = {}
+        for kind in _path_order:
+            if kind in location:
+                server.populate(kind, [{'slug': location[kind]}], **levels)
+                levels[kind] = location[kind]
+    elif 'badge' not in location:
+        parser.error('--badge is required, to create and list instances in')
+
+    api = BadgeKitAPI(baseurl, args.secret, key=args.key,
+            pool_maxsize=args.concurrency)
+    try:
+        generator = LoadGenerator(api, mix, location, rate=args.rate,
+                concurrency=args.concurrency, duration=args.duration,
+                warmup=args.warmup, seed=args.seed)
+        report = generator.run()
+    finally:
+        api.close()
+        if server is not None:
+            server.close()
+
+    print(format_report(report))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    return 1 if report['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
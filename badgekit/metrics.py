@@ -0,0 +1,263 @@
+"""
+Request metrics for the BadgeKit API client.
+
+Pass a :class:`Metrics` to :class:`badgekit.BadgeKitAPI` to record, for
+each HTTP method and route, how many requests were made, their latency,
+status codes, bytes sent and received, the errors raised, and how the time
+was split between signing the JWT, waiting on the network and decoding
+JSON:
+
+>>> from badgekit.metrics import Metrics
+>>> metrics = Metrics()
+>>> bk = BadgeKitAPI('http://api.example.com/', 'secr3t', metrics=metrics)
+>>> bk.list('badge', system='mysystem')
+>>> metrics.snapshot()['GET systems/:system/badges']['count']
+1
+>>> print(metrics.prometheus())
+
+Routes are URL paths with the slugs replaced by the kind of object they
+name, such as ``systems/:system/badges/:badge/instances``.  Without a
+``metrics`` argument, the client records nothing, and pays only a check
+of ``None`` per request.
+"""
+
+import bisect
+import threading
+import time
+
+from .api import _api_plural, _path_order
+
+
+__all__ = [
+        'Metrics',
+        'route_template',
+        ]
+
+
+_singular = dict((_api_plural(kind), kind) for kind in _path_order)
+
+# Upper bounds of the latency histogram buckets, in seconds
+default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+        10.0)
+
+_phases = ('sign', 'network', 'decode')
+
+
+def route_template(path):
+    """
+    Returns the route of a path relative to the server, e.g.
+    ``'systems/:system/badges'`` for ``'systems/mysystem/badges?archived=true'``.
+    Paths outside the known API structure end in ``*``.
+    """
+    parts = [part for part in path.split('?', 1)[0].split('/') if part]
+    route = []
+    for i in range(0, len(parts), 2):
+        kind = _singular.get(parts[i])
+        if kind is None:
+            route.append('*')
+            break
+        route.append(parts[i])
+        if i + 1 < len(parts):
+            route.append(':' + kind)
+    return '/'.join(route) or '/'
+
+
+class _Series(object):
+    '''
+    Everything recorded for one method and route.
+    '''
+    def __init__(self, buckets):
+        self.count = 0
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.latency_sum = 0.0
+        self.statuses = {}
+        self.errors = {}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.phase_sums = dict((phase, 0.0) for phase in _phases)
+        self.phase_counts = dict((phase, 0) for phase in _phases)
+
+
+class Metrics(object):
+    """
+    A thread-safe store of request metrics.
+
+    :param buckets: the upper bounds, in seconds, of the latency histogram
+        buckets.
+
+    One ``Metrics`` may be shared between several clients.
+    """
+    def __init__(self, buckets=default_buckets):
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _get_series(self, method, route):
+        key = (method, route)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series(self.buckets)
+        return series
+
+    def observe_request(self, method, route, latency, status=None,
+            sent=0, received=0, sign=0.0, error=None):
+        """
+        Records one request.  ``latency`` is the whole time spent sending
+        it and receiving the response, of which ``sign`` was spent signing
+        it; the rest counts as network time.  ``error`` is the name of the
+        exception raised in place of a response, if any.
+        """
+        bucket = bisect.bisect_left(self.buckets, latency)
+        with self._lock:
+            series = self._get_series(method, route)
+            series.count += 1
+            series.bucket_counts[bucket] += 1
+            series.latency_sum += latency
+            if status is not None:
+                series.statuses[status] = series.statuses.get(status, 0) + 1
+            if error is not None:
+                series.errors[error] = series.errors.get(error, 0) + 1
+            series.bytes_sent += sent
+            series.bytes_received += received
+            for phase, seconds in (('sign', sign), ('network', latency - sign)):
+                series.phase_sums[phase] += seconds
+                series.phase_counts[phase] += 1
+
+    def observe_decode(self, method, route, seconds):
+        "Records time spent decoding a response's JSON."
+        with self._lock:
+            series = self._get_series(method, route)
+            series.phase_sums['decode'] += seconds
+            series.phase_counts['decode'] += 1
+
+    def observe_error(self, method, route, error):
+        "Records an exception, by name, raised for a response."
+        with self._lock:
+            series = self._get_series(method, route)
+            series.errors[error] = series.errors.get(error, 0) + 1
+
+    def reset(self):
+        "Forgets everything recorded so far."
+        with self._lock:
+            self._series = {}
+
+    def snapshot(self):
+        """
+        Returns everything recorded as a dict, keyed by ``'METHOD route'``.
+        Histogram buckets are cumulative, as in Prometheus, and keyed by
+        their upper bound.
+        """
+        result = {}
+        with self._lock:
+            for (method, route), series in self._series.items():
+                cumulative, running = [], 0
+                for count in series.bucket_counts:
+                    running += count
+                    cumulative.append(running)
+                bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+                result['%s %s' % (method, route)] = {
+                        'method': method,
+                        'route': route,
+                        'count': series.count,
+                        'latency': {
+                            'sum': series.latency_sum,
+                            'buckets': dict(zip(bounds, cumulative)),
+                            },
+                        'statuses': dict(series.statuses),
+                        'errors': dict(series.errors),
+                        'bytes_sent': series.bytes_sent,
+                        'bytes_received': series.bytes_received,
+                        'phases': dict((phase, {
+                            'sum': series.phase_sums[phase],
+                            'count': series.phase_counts[phase],
+                            }) for phase in _phases),
+                        }
+        return result
+
+    def prometheus(self, prefix='badgekit'):
+        """
+        Returns everything recorded in the Prometheus text exposition
+        format, with metric names starting with ``prefix``.
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append('# HELP %s_%s %s' % (prefix, name, help_text))
+            lines.append('# TYPE %s_%s %s' % (prefix, name, kind))
+
+        def sample(name, labels, value):
+            label_text = ','.join('%s="%s"' % (key, _escape(value))
+                    for key, value in labels)
+            lines.append('%s_%s{%s} %s' % (prefix, name, label_text, value))
+
+        metric('request_duration_seconds', 'histogram',
+                'Time from sending a request to receiving its response.')
+        for series in snapshot.values():
+            labels = [('method', series['method']), ('route', series['route'])]
+            bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+            for bound in bounds:
+                sample('request_duration_seconds_bucket',
+                        labels + [('le', bound)],
+                        series['latency']['buckets'][bound])
+            sample('request_duration_seconds_sum', labels,
+                    series['latency']['sum'])
+            sample('request_duration_seconds_count', labels, series['count'])
+
+        metric('responses_total', 'counter', 'Responses, by status code.')
+        for series in snapshot.values():
+            labels = [('method', series['method']), ('route', series['route'])]
+            for status, count in sorted(series['statuses'].items()):
+                sample('responses_total', labels + [('status', status)], count)
+
+        metric('errors_total', 'counter', 'Exceptions raised, by type.')
+        for series in snapshot.values():
+            labels = [('method', series['method']), ('route', series['route'])]
+            for error, count in sorted(series['errors'].items()):
+                sample('errors_total', labels + [('exception', error)], count)
+
+        metric('bytes_total', 'counter', 'Request and response body bytes.')
+        for series in snapshot.values():
+            labels = [('method', series['method']), ('route', series['route'])]
+            sample('bytes_total', labels + [('direction', 'sent')],
+                    series['bytes_sent'])
+            sample('bytes_total', labels + [('direction', 'received')],
+                    series['bytes_received'])
+
+        metric('phase_seconds_total', 'counter',
+                'Time spent signing, on the network, and decoding JSON.')
+        for series in snapshot.values():
+            labels = [('method', series['method']), ('route', series['route'])]
+            for phase in _phases:
+                sample('phase_seconds_total', labels + [('phase', phase)],
+                        series['phases'][phase]['sum'])
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _TimedAuth(object):
+    '''
+    Wraps a requests auth object, noting on each request the time it took
+    to sign, so that a request sent twice, as hedged ones are, has each
+    copy timed on its own.
+    '''
+    __slots__ = ('auth',)
+
+    def __init__(self, auth):
+        self.auth = auth
+
+    def __call__(self, request):
+        start = time.time()
+        try:
+            return self.auth(request)
+        finally:
+            request._badgekit_sign = time.time() - start
+
+
+def _sign_time(request):
+    "The time spent signing ``request``, as noted by :class:`_TimedAuth`."
+    return getattr(request, '_badgekit_sign', 0.0)
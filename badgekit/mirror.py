@@ -0,0 +1,428 @@
+"""
+A local SQLite mirror of a badge system.
+
+Questions such as "which of these emails already hold this badge" take a
+``list`` or ``get`` per badge or per learner against the API.  A
+:class:`Mirror` copies a system's issuers, programs, badges and instances
+into a SQLite database once, keeps it up to date with :meth:`Mirror.refresh`,
+and answers such questions from indexed tables:
+
+>>> from badgekit.mirror import Mirror
+>>> mirror = Mirror(bk, 'mysystem', 'mysystem.sqlite')
+>>> mirror.refresh()
+{'requests': 120, 'changed': 120, 'unchanged': 0, ...}
+>>> mirror.holders('stupendous-badge', emails)
+set(['learner@example.org', ...])
+>>> mirror.instances(issuer='myissuer', since='2014-06-02')
+[{...}, ...]
+
+Each collection (the issuers, an issuer's programs, the badges, a badge's
+instances) is stored with the ``ETag`` the server sent for it and a hash of
+its body.  A refresh asks for each collection with ``If-None-Match``, and
+only rewrites the rows of collections whose body has changed, so once the
+mirror is current a refresh costs one small request per collection.  The
+instance collections of different badges are fetched in parallel.
+
+Issue dates are stored as ISO 8601 strings in UTC, so that they sort and
+compare as dates; timestamps, and dates with a UTC offset, from the server
+are converted.
+"""
+
+import datetime
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+try:
+    from urlparse import urljoin
+except ImportError:
+    from urllib.parse import urljoin
+
+from .api import _api_plural, _make_path
+
+
+__all__ = [
+        'Mirror',
+        ]
+
+
+_schema = '''
+CREATE TABLE IF NOT EXISTS collections (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    etag TEXT,
+    digest TEXT,
+    refreshed REAL
+);
+CREATE TABLE IF NOT EXISTS issuers (
+    slug TEXT PRIMARY KEY,
+    name TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS programs (
+    issuer TEXT NOT NULL,
+    slug TEXT NOT NULL,
+    name TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (issuer, slug)
+);
+CREATE TABLE IF NOT EXISTS badges (
+    slug TEXT PRIMARY KEY,
+    issuer TEXT,
+    program TEXT,
+    name TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS badges_issuer ON badges (issuer, program);
+CREATE TABLE IF NOT EXISTS instances (
+    badge TEXT NOT NULL,
+    slug TEXT,
+    email TEXT,
+    issued_on TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS instances_badge ON instances (badge, issued_on);
+CREATE INDEX IF NOT EXISTS instances_email ON instances (email, badge);
+CREATE INDEX IF NOT EXISTS instances_slug ON instances (slug);
+CREATE INDEX IF NOT EXISTS instances_issued_on ON instances (issued_on);
+'''
+
+# SQLite allows at most 999 parameters in a statement.
+_max_params = 900
+
+_iso_re = re.compile(r'^(\d{4})-(\d{2})-(\d{2})'
+        r'(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:[.,](\d+))?)?)?'
+        r'\s*(Z|[+-]\d{2}(?::?\d{2})?)?$', re.IGNORECASE)
+
+
+_epoch = datetime.datetime(1970, 1, 1)
+
+
+def _parse_iso(value):
+    '''
+    Parses an ISO 8601 date or datetime string into a naive datetime in
+    UTC.  Returns None if it is not one, or names a day that does not exist.
+    '''
+    match = _iso_re.match(value.strip())
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, fraction, offset = match.groups()
+    try:
+        parsed = datetime.datetime(int(year), int(month), int(day),
+                int(hour or 0), int(minute or 0), int(second or 0),
+                int((fraction or '0')[:6].ljust(6, '0')))
+    except ValueError:
+        return None
+    if offset and offset.upper() != 'Z':
+        digits = offset[1:].replace(':', '')
+        delta = datetime.timedelta(hours=int(digits[:2]),
+                minutes=int(digits[2:] or 0))
+        parsed = parsed - delta if offset[0] == '+' else parsed + delta
+    return parsed
+
+
+def _format(value):
+    "Formats a naive UTC datetime, with microseconds only if it has any."
+    result = value.strftime('%Y-%m-%dT%H:%M:%S')
+    if value.microsecond:
+        result += '.%06d' % value.microsecond
+    return result
+
+
+def _iso(value):
+    '''
+    Returns a date, datetime, timestamp or ISO 8601 string as an ISO 8601
+    string in UTC, so that dates from the server and from callers compare
+    correctly.  Anything else, such as a date that does not exist, is
+    returned as it is.
+    '''
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.replace(tzinfo=None) - value.utcoffset()
+        return _format(value)
+    if isinstance(value, datetime.date):
+        return value.strftime('%Y-%m-%dT00:00:00')
+    if isinstance(value, (int, float)):
+        if value > 1e11:
+            # Milliseconds, as JavaScript counts them
+            value = value / 1000.0
+        return _format(_epoch + datetime.timedelta(seconds=value))
+    parsed = _parse_iso(value) if hasattr(value, 'strip') else None
+    if parsed is None:
+        # Not a date we know how to read; stored as it is.
+        return value
+    return _format(parsed)
+
+
+def _slug_of(value):
+    if isinstance(value, dict):
+        return value.get('slug')
+    return value
+
+
+class Mirror(object):
+    """
+    A SQLite copy of one system's issuers, programs, badges and instances.
+
+    :param api: the :class:`badgekit.BadgeKitAPI` to fetch through.
+    :param system: the slug of the system to mirror.
+    :param database: the SQLite database file, or ``':memory:'``.
+    :param max_workers: how many instance collections to fetch at once.
+
+    A mirror is meant to be used from one thread at a time; it uses
+    threads of its own only to fetch.  Call :meth:`close` when done.
+    """
+    def __init__(self, api, system, database=':memory:', max_workers=8):
+        self.api = api
+        self.system = system
+        self.max_workers = max_workers
+        self.db = sqlite3.connect(database)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(_schema)
+
+    def close(self):
+        "Closes the database."
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _path(self, kind, **location):
+        return _make_path(_api_plural(kind), system=self.system, **location)
+
+    def _fetch(self, path):
+        '''
+        GETs a collection, returning its decoded body, ETag and digest, or
+        None if it has not changed since it was last stored.
+        '''
+        row = self.db.execute(
+                'SELECT etag, digest FROM collections WHERE path = ?',
+                (path,)).fetchone()
+        return self._fetch_changed(path, row and row['etag'],
+                row and row['digest'])
+
+    def _fetch_changed(self, path, etag, digest):
+        api = self.api
+        headers = {'If-None-Match': etag} if etag else {}
+        resp = api._send('GET', urljoin(api.baseurl, path), headers=headers)
+        if resp.status_code == 304:
+            return None
+        new_digest = hashlib.sha1(resp.content).hexdigest()
+        resp_obj = api._json_loads(resp.content)
+        if resp.status_code != 200:
+            api._raise_error(resp_obj, resp.request, resp.status_code)
+        if new_digest == digest:
+            return None
+        return resp_obj, resp.headers.get('ETag'), new_digest
+
+    def _store_collection(self, path, kind, etag, digest):
+        self.db.execute('INSERT OR REPLACE INTO collections '
+                '(path, kind, etag, digest, refreshed) VALUES (?, ?, ?, ?, ?)',
+                (path, kind, etag, digest, time.time()))
+
+    def refresh(self):
+        """
+        Brings the mirror up to date with the server, and returns counts of
+        the collections checked as a dict: ``requests``, ``changed``,
+        ``unchanged``, and the ``elapsed`` seconds.
+        """
+        start = time.time()
+        stats = {'requests': 0, 'changed': 0, 'unchanged': 0}
+
+        def fetch(path):
+            stats['requests'] += 1
+            fetched = self._fetch(path)
+            stats['changed' if fetched else 'unchanged'] += 1
+            return fetched
+
+        with self.db:
+            self._refresh_issuers(fetch)
+            self._refresh_badges(fetch)
+            self._refresh_instances(stats)
+        stats['elapsed'] = time.time() - start
+        return stats
+
+    def _refresh_issuers(self, fetch):
+        path = self._path('issuer')
+        fetched = fetch(path)
+        if fetched is not None:
+            resp_obj, etag, digest = fetched
+            issuers = resp_obj.get('issuers') or []
+            self.db.execute('DELETE FROM issuers')
+            self.db.executemany(
+                    'INSERT OR REPLACE INTO issuers (slug, name, data) '
+                    'VALUES (?, ?, ?)',
+                    [(issuer.get('slug'), issuer.get('name'),
+                        json.dumps(issuer)) for issuer in issuers])
+            self._drop_stale('programs', 'issuer', 'issuers', 'program')
+            self._store_collection(path, 'issuer', etag, digest)
+
+        for (issuer,) in self.db.execute('SELECT slug FROM issuers').fetchall():
+            path = self._path('program', issuer=issuer)
+            fetched = fetch(path)
+            if fetched is None:
+                continue
+            resp_obj, etag, digest = fetched
+            self.db.execute('DELETE FROM programs WHERE issuer = ?', (issuer,))
+            self.db.executemany(
+                    'INSERT OR REPLACE INTO programs (issuer, slug, name, data) '
+                    'VALUES (?, ?, ?, ?)',
+                    [(issuer, program.get('slug'), program.get('name'),
+                        json.dumps(program))
+                        for program in resp_obj.get('programs') or []])
+            self._store_collection(path, 'program', etag, digest)
+
+    def _refresh_badges(self, fetch):
+        path = self._path('badge')
+        fetched = fetch(path)
+        if fetched is None:
+            return
+        resp_obj, etag, digest = fetched
+        self.db.execute('DELETE FROM badges')
+        self.db.executemany(
+                'INSERT OR REPLACE INTO badges (slug, issuer, program, name, data) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(badge.get('slug'), _slug_of(badge.get('issuer')),
+                    _slug_of(badge.get('program')), badge.get('name'),
+                    json.dumps(badge))
+                    for badge in resp_obj.get('badges') or []])
+        self._drop_stale('instances', 'badge', 'badges', 'instance')
+        self._store_collection(path, 'badge', etag, digest)
+
+    def _drop_stale(self, table, parent, parents, kind):
+        '''
+        Deletes the rows of ``table``, and the stored ``kind`` collections,
+        whose parent object is no longer in the ``parents`` table.
+        '''
+        self.db.execute('DELETE FROM %s WHERE %s NOT IN (SELECT slug FROM %s)'
+                % (table, parent, parents))
+        known = set(self._path(kind, **{parent: slug})
+                for (slug,) in self.db.execute('SELECT slug FROM %s' % parents))
+        for (path,) in self.db.execute(
+                'SELECT path FROM collections WHERE kind = ?',
+                (kind,)).fetchall():
+            if path not in known:
+                self.db.execute('DELETE FROM collections WHERE path = ?',
+                        (path,))
+
+    def _refresh_instances(self, stats):
+        badges = [slug for (slug,) in self.db.execute('SELECT slug FROM badges')]
+        stored = dict((row['path'], (row['etag'], row['digest']))
+                for row in self.db.execute(
+                    'SELECT path, etag, digest FROM collections'))
+        paths = [(badge, self._path('instance', badge=badge))
+                for badge in badges]
+
+        def fetch(item):
+            badge, path = item
+            etag, digest = stored.get(path, (None, None))
+            return badge, path, self._fetch_changed(path, etag, digest)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for badge, path, fetched in executor.map(fetch, paths):
+                stats['requests'] += 1
+                if fetched is None:
+                    stats['unchanged'] += 1
+                    continue
+                stats['changed'] += 1
+                resp_obj, etag, digest = fetched
+                self.db.execute('DELETE FROM instances WHERE badge = ?',
+                        (badge,))
+                self.db.executemany(
+                        'INSERT INTO instances '
+                        '(badge, slug, email, issued_on, data) '
+                        'VALUES (?, ?, ?, ?, ?)',
+                        [(badge, instance.get('slug'), instance.get('email'),
+                            _iso(instance.get('issuedOn')), json.dumps(instance))
+                            for instance in resp_obj.get('instances') or []])
+                self._store_collection(path, 'instance', etag, digest)
+
+    def _objects(self, sql, params=()):
+        return [json.loads(row['data'])
+                for row in self.db.execute(sql, params)]
+
+    def issuers(self):
+        "Returns the system's issuers."
+        return self._objects('SELECT data FROM issuers ORDER BY slug')
+
+    def programs(self, issuer=None):
+        "Returns the programs, of one issuer or of all of them."
+        if issuer is None:
+            return self._objects('SELECT data FROM programs ORDER BY issuer, slug')
+        return self._objects(
+                'SELECT data FROM programs WHERE issuer = ? ORDER BY slug',
+                (issuer,))
+
+    def badges(self, issuer=None, program=None):
+        "Returns the badges, optionally only those of an issuer or program."
+        where, params = [], []
+        if issuer is not None:
+            where.append('issuer = ?')
+            params.append(issuer)
+        if program is not None:
+            where.append('program = ?')
+            params.append(program)
+        sql = 'SELECT data FROM badges'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        return self._objects(sql + ' ORDER BY slug', params)
+
+    def instances(self, badge=None, email=None, issuer=None, program=None,
+            since=None, until=None):
+        """
+        Returns the badge instances matching all the conditions given.
+
+        :param badge: the slug of the badge issued.
+        :param email: the learner's email.
+        :param issuer: the slug of the issuer of the badge.
+        :param program: the slug of the program of the badge.
+        :param since: the earliest issue date, inclusive, as a date,
+            datetime, timestamp or ISO 8601 string.
+        :param until: the latest issue date, exclusive.
+        """
+        where, params = [], []
+        for column, value in (('i.badge', badge), ('i.email', email),
+                ('b.issuer', issuer), ('b.program', program)):
+            if value is not None:
+                where.append('%s = ?' % column)
+                params.append(value)
+        if since is not None:
+            where.append('i.issued_on >= ?')
+            params.append(_iso(since))
+        if until is not None:
+            where.append('i.issued_on < ?')
+            params.append(_iso(until))
+        sql = 'SELECT i.data FROM instances i'
+        if issuer is not None or program is not None:
+            sql += ' JOIN badges b ON b.slug = i.badge'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        return self._objects(sql + ' ORDER BY i.issued_on', params)
+
+    def holders(self, badge, emails):
+        """
+        Returns the set of ``emails`` that hold an instance of ``badge``.
+        """
+        emails = list(emails)
+        found = set()
+        for i in range(0, len(emails), _max_params):
+            chunk = emails[i:i + _max_params]
+            rows = self.db.execute(
+                    'SELECT DISTINCT email FROM instances '
+                    'WHERE badge = ? AND email IN (%s)'
+                    % ','.join('?' * len(chunk)), [badge] + chunk)
+            found.update(row['email'] for row in rows)
+        return found
+
+    def counts(self):
+        "Returns the number of rows mirrored, by table."
+        return dict((table, self.db.execute(
+            'SELECT COUNT(*) FROM %s' % table).fetchone()[0])
+            for table in ('issuers', 'programs', 'badges', 'instances'))
@@ -0,0 +1,419 @@
+"""
+A durable outbox, for creating objects without waiting for the server.
+
+Calls to :meth:`Outbox.create` are written to an append-only spool file
+and return at once; a background thread sends them to the server:
+
+>>> outbox = bk.outbox('/var/spool/badgekit/awards.spool')
+>>> outbox.create('instance', {'email': 'user@example.com'},
+...         system='mysystem', badge='stupendous-badge')
+'5d1c0e4a9e7b4a8f9c3d2b1a0f9e8d7c'
+>>> outbox.flush(timeout=30)
+True
+>>> outbox.close()
+
+Each call is one JSON line in the spool, written and flushed to disk with
+``fsync`` before :meth:`~Outbox.create` returns.  Once the server has
+answered, an acknowledgement line with the call's id follows it, so a
+process that restarts with the same spool sends exactly the calls that
+were never acknowledged.  A torn last line, from a crash part way through
+a write, is ignored.
+
+The drainer takes up to ``batch_size`` calls at a time and sends them
+``max_in_flight`` at once.  Network errors and :class:`badgekit.APIError`
+(such as a ``5xx``) are retried, waiting ``retry_delay`` seconds at first,
+twice as long after each failure, and at most ``max_retry_delay``.  A
+:class:`badgekit.ResourceConflict` means the object exists, and counts as
+sent.  Any other error from the server, such as
+:class:`badgekit.ValidationError`, or a ``4xx`` other than ``408`` and
+``429`` (such as the ``403`` for a wrong secret), will not go away by
+retrying: the call is acknowledged and appended to the dead-letter file,
+``path + '.failed'``, with the error.
+
+A call is only acknowledged after the server answered, so if the process
+dies in between, the call is sent again on restart.  For objects with a
+slug, the server then answers with a conflict, which counts as sent;
+otherwise the object may be created twice.
+
+Once ``compact_every`` calls have been acknowledged, the spool is rewritten
+with only the calls still pending, and atomically replaces the old one.
+Only one outbox may use a spool at a time; on POSIX systems a second one
+fails with :class:`OutboxLocked`.
+
+If the spool cannot be written, for instance because the disk is full, the
+drainer stops, and :meth:`~Outbox.flush` and :meth:`~Outbox.close` raise
+the error.  Calls not yet acknowledged stay in the spool.
+"""
+
+import collections
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .api import APIError, RequestException, ResourceConflict
+
+
+__all__ = [
+        'Outbox',
+        'OutboxLocked',
+        ]
+
+
+_replace = getattr(os, 'replace', os.rename)
+
+
+class OutboxLocked(Exception):
+    "Raised when another outbox is using the spool file."
+
+
+class _Call(object):
+    __slots__ = ('record', 'attempts', 'due')
+
+    def __init__(self, record):
+        self.record = record
+        self.attempts = 0
+        self.due = 0.0
+
+
+def _encode(record):
+    return json.dumps(record, sort_keys=True).encode('utf-8') + b'\n'
+
+
+def _read_records(path):
+    try:
+        f = open(path, 'rb')
+    except IOError:
+        return
+    with f:
+        for line in f:
+            try:
+                record = json.loads(line.decode('utf-8'))
+            except ValueError:
+                # A torn write; whatever follows was written after it.
+                continue
+            if isinstance(record, dict) and 'id' in record:
+                yield record
+
+
+class Outbox(object):
+    """
+    A spool of ``create`` calls, sent to the server in the background.
+
+    :param api: the :class:`badgekit.BadgeKitAPI` to send with.
+    :param path: the spool file.  Calls left in it by an earlier outbox are
+        sent too.
+    :param batch_size: the most calls taken from the spool at a time.
+    :param max_in_flight: the most calls sent at once.
+    :param retry_delay: seconds to wait before the first retry of a call.
+    :param max_retry_delay: the longest wait between retries.
+    :param max_attempts: if given, a call that has failed this many times
+        goes to the dead-letter file instead of being retried.
+    :param compact_every: how many acknowledgements to allow in the spool
+        before it is rewritten without them.
+    :param sync: if false, the spool is not flushed to disk.  Calls then
+        survive a crash of the process, but not of the machine.
+    :param start: if false, nothing is sent until :meth:`start` is called.
+
+    :attr stats: counts of calls queued, created, already existing,
+        retried and failed, and of compactions.
+    :attr error: the exception that stopped the drainer, if one did.
+
+    An outbox is safe to share between threads.
+    """
+    def __init__(self, api, path, batch_size=100, max_in_flight=8,
+            retry_delay=1.0, max_retry_delay=60.0, max_attempts=None,
+            compact_every=1000, sync=True, start=True):
+        self.api = api
+        self.path = path
+        self.failed_path = path + '.failed'
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_attempts = max_attempts
+        self.compact_every = compact_every
+        self.sync = sync
+        self.stats = {
+                'queued': 0,
+                'created': 0,
+                'existing': 0,
+                'retries': 0,
+                'failed': 0,
+                'compactions': 0,
+                }
+        self.error = None
+        # Writes to the spool hold _file_lock, and take _cond only to
+        # update the calls pending; never the other way round.
+        self._file_lock = threading.Lock()
+        self._cond = threading.Condition(threading.Lock())
+        self._pending = collections.OrderedDict()
+        self._in_flight = set()
+        self._acked = 0
+        self._closing = False
+        self._thread = None
+
+        self._lock_file = None
+        if fcntl is not None:
+            self._lock_file = open(path + '.lock', 'a')
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except (IOError, OSError):
+                self._lock_file.close()
+                raise OutboxLocked("%s is in use by another outbox" % path)
+
+        self._recover()
+        self._file = open(path, 'ab')
+        if start:
+            self.start()
+
+    def _recover(self):
+        torn = False
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b'\n'
+        for record in _read_records(self.path):
+            if record.get('op') == 'create':
+                self._pending[record['id']] = _Call(record)
+            elif record.get('op') == 'ack':
+                self._pending.pop(record['id'], None)
+                self._acked += 1
+        if self._acked or torn:
+            # Drop acknowledgements, and a torn line, before appending.
+            self._compact()
+
+    def _write(self, f, data):
+        f.write(data)
+        f.flush()
+        if self.sync:
+            os.fsync(f.fileno())
+
+    @property
+    def pending(self):
+        "The number of calls not yet acknowledged."
+        with self._cond:
+            return len(self._pending)
+
+    def create(self, kind, data, **kwargs):
+        """
+        Spools a call to :meth:`badgekit.BadgeKitAPI.create`, with the same
+        arguments, and returns its id once it is safely on disk.  Raises
+        :attr:`error` if the drainer has stopped.
+        """
+        record = {
+                'op': 'create',
+                'id': uuid.uuid4().hex,
+                'kind': kind,
+                'data': data,
+                'location': kwargs,
+                }
+        line = _encode(record)
+        with self._file_lock:
+            if self._file.closed:
+                raise ValueError("The outbox is closed")
+            if self.error is not None:
+                # Nothing would ever send it.
+                raise self.error
+            self._write(self._file, line)
+            with self._cond:
+                self._pending[record['id']] = _Call(record)
+                self.stats['queued'] += 1
+                self._cond.notify_all()
+        return record['id']
+
+    def start(self):
+        "Starts sending spooled calls in the background."
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._drain)
+                self._thread.daemon = True
+                self._thread.start()
+
+    def flush(self, timeout=None):
+        """
+        Waits until every spooled call has been acknowledged, or for
+        ``timeout`` seconds.  Returns true if nothing is left pending.
+        Raises :attr:`error` if the drainer has stopped.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while True:
+                if self.error is not None:
+                    raise self.error
+                if not self._pending:
+                    return True
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+                self._cond.wait(remaining)
+
+    def close(self, timeout=None):
+        """
+        Stops the drainer, after waiting up to ``timeout`` seconds for the
+        spool to empty, and closes the spool.  Calls still pending stay in
+        the spool for the next outbox.  Raises :attr:`error`, once closed,
+        if the drainer has stopped.
+        """
+        try:
+            if self._thread is not None:
+                self.flush(timeout)
+        finally:
+            with self._cond:
+                self._closing = True
+                self._cond.notify_all()
+            if self._thread is not None:
+                self._thread.join()
+            with self._file_lock:
+                self._file.close()
+            if self._lock_file is not None:
+                self._lock_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _next_batch(self):
+        # Waits for calls that are due, and takes them.  Returns None once
+        # the outbox is closing.
+        with self._cond:
+            while not self._closing:
+                now = time.time()
+                batch = []
+                wake = None
+                for call_id, call in self._pending.items():
+                    if call_id in self._in_flight:
+                        continue
+                    if call.due <= now:
+                        batch.append(call)
+                        if len(batch) == self.batch_size:
+                            break
+                    elif wake is None or call.due < wake:
+                        wake = call.due
+                if batch:
+                    self._in_flight.update(c.record['id'] for c in batch)
+                    return batch
+                self._cond.wait(None if wake is None else wake - now)
+            return None
+
+    def _drain(self):
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    return
+                futures = [executor.submit(self._send, call) for call in batch]
+                wait(futures)
+                try:
+                    self._finish(batch, [f.result() for f in futures])
+                except Exception as e:
+                    # Such as a full disk.  Stop, rather than send calls
+                    # that cannot be acknowledged.
+                    with self._cond:
+                        self.error = e
+                        self._cond.notify_all()
+                    return
+
+    def _send(self, call):
+        record = call.record
+        try:
+            self.api.create(record['kind'], record['data'],
+                    **record['location'])
+        except ResourceConflict:
+            return 'existing', None
+        except APIError as e:
+            if e.status is not None and 400 <= e.status < 500 and (
+                    e.status not in (408, 429)):
+                return 'failed', e
+            return 'retry', e
+        except RequestException as e:
+            return 'retry', e
+        except Exception as e:
+            # Such as a ValidationError, or data that cannot be sent at all.
+            return 'failed', e
+        return 'created', None
+
+    def _finish(self, batch, outcomes):
+        acks = []
+        dead = []
+        with self._cond:
+            for call, (outcome, error) in zip(batch, outcomes):
+                call_id = call.record['id']
+                call.attempts += 1
+                if outcome == 'retry':
+                    if (self.max_attempts is None or
+                            call.attempts < self.max_attempts):
+                        self._in_flight.discard(call_id)
+                        self.stats['retries'] += 1
+                        delay = min(self.max_retry_delay,
+                                self.retry_delay * 2 ** (call.attempts - 1))
+                        call.due = time.time() + delay * random.uniform(0.5, 1)
+                        continue
+                    outcome = 'failed'
+                if outcome == 'failed':
+                    dead.append(dict(call.record, op='failed',
+                        attempts=call.attempts, error=str(error),
+                        error_type=type(error).__name__))
+                acks.append({'op': 'ack', 'id': call_id, 'outcome': outcome})
+                self.stats[outcome] += 1
+            self._cond.notify_all()
+
+        if dead:
+            with open(self.failed_path, 'ab') as f:
+                self._write(f, b''.join(_encode(r) for r in dead))
+        if not acks:
+            return
+        with self._file_lock:
+            self._write(self._file, b''.join(_encode(r) for r in acks))
+            with self._cond:
+                for ack in acks:
+                    del self._pending[ack['id']]
+                    self._in_flight.discard(ack['id'])
+                self._acked += len(acks)
+                compact = self._acked >= self.compact_every
+                self._cond.notify_all()
+            if compact:
+                self._file.close()
+                try:
+                    self._compact()
+                finally:
+                    self._file = open(self.path, 'ab')
+
+    def _compact(self):
+        # Rewrites the spool with only the pending calls.  Called with the
+        # spool closed, and (once running) with _file_lock held.
+        with self._cond:
+            records = [call.record for call in self._pending.values()]
+        temp = '%s.%d.tmp' % (self.path, os.getpid())
+        with open(temp, 'wb') as f:
+            self._write(f, b''.join(_encode(r) for r in records))
+        _replace(temp, self.path)
+        if self.sync and hasattr(os, 'O_DIRECTORY'):
+            fd = os.open(os.path.dirname(os.path.abspath(self.path)),
+                    os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        with self._cond:
+            self._acked = 0
+            self.stats['compactions'] += 1
+
+    def failures(self):
+        """
+        Returns the calls in the dead-letter file, each with the ``error``
+        it failed with.
+        """
+        return [r for r in _read_records(self.failed_path)
+                if r.get('op') == 'failed']
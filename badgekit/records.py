@@ -0,0 +1,248 @@
+"""
+Compact record types for BadgeKit API objects.
+
+When a :class:`badgekit.BadgeKitAPI` is created with ``records=True``,
+:meth:`~badgekit.BadgeKitAPI.list` returns a list of records and
+:meth:`~badgekit.BadgeKitAPI.get` returns a single record, instead of the
+decoded JSON dicts:
+
+>>> bk = BadgeKitAPI('http://api.example.com/', 'secr3t', records=True)
+>>> badge = bk.get(system='mysystem', badge='stupendous-badge')
+>>> badge.name
+'Stupendous Badge'
+
+Records keep their fields in ``__slots__``, which takes a fraction of the
+memory of a dict per object.  Fields that the server sends but that a
+record type does not know about are kept too, and can still be read as
+attributes.  Nested objects, such as the badge inside an instance, are
+kept as they came from the server and only turned into records the first
+time they are read.
+"""
+
+
+__all__ = [
+        'Record',
+        'System',
+        'Issuer',
+        'Program',
+        'Badge',
+        'Instance',
+        'Application',
+        'Evidence',
+        'Comment',
+        'ClaimCode',
+        'record_types',
+        'to_record',
+        'to_records',
+        'from_list',
+        'from_get',
+        ]
+
+
+class _Nested(object):
+    '''
+    A field holding a nested object, or list of objects, which is turned
+    into records on first access.
+    '''
+    def __init__(self, slot, kind):
+        self.slot = slot
+        self.kind = kind
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        value = getattr(obj, self.slot)
+        if isinstance(value, dict):
+            value = to_record(self.kind, value)
+            setattr(obj, self.slot, value)
+        elif isinstance(value, list) and value and isinstance(value[0], dict):
+            value = to_records(self.kind, value)
+            setattr(obj, self.slot, value)
+        return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.slot, value)
+
+
+class _RecordType(type):
+    '''
+    Fills in ``__slots__`` from ``_fields`` and ``_nested``, and adds a
+    lazily-converting attribute for each nested field.
+    '''
+    def __new__(mcs, name, bases, attrs):
+        fields = tuple(attrs.get('_fields', ()))
+        nested = dict(attrs.get('_nested', {}))
+        attrs['__slots__'] = (tuple(attrs.get('__slots__', ())) + fields
+                + tuple('_' + field for field in nested))
+        for field, kind in nested.items():
+            attrs[field] = _Nested('_' + field, kind)
+        attrs['_all_fields'] = fields + tuple(sorted(nested))
+        return type.__new__(mcs, name, bases, attrs)
+
+
+# Python 2 and 3 spell metaclasses differently; this works in both.
+_RecordBase = _RecordType('_RecordBase', (object,), {'__slots__': ()})
+
+
+class Record(_RecordBase):
+    """
+    Base class of the record types.  Construct one from the dict the
+    server returned for an object.
+    """
+    __slots__ = ('_extra',)
+    _fields = ()
+    _nested = {}
+
+    def __init__(self, data):
+        fields, nested = self._fields, self._nested
+        for field in self.__slots__:
+            setattr(self, field, None)
+        extra = None
+        for key, value in data.items():
+            if key in nested:
+                setattr(self, '_' + key, value)
+            elif key in fields:
+                setattr(self, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        self._extra = extra
+
+    def __getattr__(self, name):
+        # Only called when normal lookup fails: look in the unknown fields.
+        extra = object.__getattribute__(self, '_extra')
+        if extra is not None and name in extra:
+            return extra[name]
+        raise AttributeError(name)
+
+    def to_dict(self):
+        """
+        Returns the object as a dict.  Known fields that the server did not
+        send are included as None.
+        """
+        result = {}
+        for field in self._all_fields:
+            value = getattr(self, field)
+            if isinstance(value, Record):
+                value = value.to_dict()
+            elif isinstance(value, list) and value and isinstance(value[0], Record):
+                value = [item.to_dict() for item in value]
+            result[field] = value
+        if self._extra:
+            result.update(self._extra)
+        return result
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        ident = getattr(self, 'slug', None) or getattr(self, 'id', None)
+        return '<%s %r>' % (type(self).__name__, ident)
+
+
+_container_fields = ('id', 'slug', 'url', 'name', 'description', 'email',
+        'imageUrl')
+
+
+class System(Record):
+    _fields = _container_fields
+
+
+class Issuer(Record):
+    _fields = _container_fields
+    _nested = {'system': 'system'}
+
+
+class Program(Record):
+    _fields = _container_fields
+    _nested = {'issuer': 'issuer'}
+
+
+class Badge(Record):
+    _fields = ('id', 'slug', 'name', 'strapline', 'earnerDescription',
+            'consumerDescription', 'issuerUrl', 'rubricUrl', 'timeValue',
+            'timeUnits', 'limit', 'unique', 'created', 'imageUrl', 'type',
+            'archived', 'criteriaUrl', 'criteria', 'categories', 'tags',
+            'evidenceType', 'milestones', 'alignments')
+    _nested = {'system': 'system', 'issuer': 'issuer', 'program': 'program'}
+
+
+class Instance(Record):
+    _fields = ('slug', 'email', 'expires', 'issuedOn', 'claimCode',
+            'assertionUrl')
+    _nested = {'badge': 'badge'}
+
+
+class Application(Record):
+    _fields = ('slug', 'learner', 'created', 'assignedTo',
+            'assignedExpiration', 'processed', 'webhook')
+    _nested = {'badge': 'badge', 'evidence': 'evidence'}
+
+
+class Evidence(Record):
+    _fields = ('slug', 'url', 'mediaType', 'reflection')
+
+
+class Comment(Record):
+    _fields = ('id', 'author', 'comment', 'createdOn')
+
+
+class ClaimCode(Record):
+    _fields = ('code', 'claimed', 'email', 'multiUse')
+
+
+# The record type for each kind in the API's paths
+record_types = {
+        'system': System,
+        'issuer': Issuer,
+        'program': Program,
+        'badge': Badge,
+        'instance': Instance,
+        'application': Application,
+        'evidence': Evidence,
+        'comment': Comment,
+        'code': ClaimCode,
+        }
+
+
+def to_record(kind, data):
+    "Makes a record of the type for ``kind`` from one object's dict."
+    return record_types[kind](data)
+
+
+def to_records(kind, items):
+    "Makes records of the type for ``kind`` from a list of dicts."
+    record_type = record_types[kind]
+    return [record_type(item) for item in items]
+
+
+def from_list(kind, resp_obj):
+    """
+    Makes records from a ``list`` response, such as ``{"badges": [...]}``.
+    If the collection is not under the plural of ``kind``, the response's
+    only list is used.
+    """
+    from .api import _api_plural
+    items = resp_obj.get(_api_plural(kind))
+    if items is None:
+        lists = [value for value in resp_obj.values() if isinstance(value, list)]
+        items = lists[0] if len(lists) == 1 else []
+    return to_records(kind, items)
+
+
+def from_get(kind, resp_obj):
+    """
+    Makes a record from a ``get`` response, such as ``{"badge": {...}}``.
+    If the object is not under ``kind``, the response's only object is used.
+    """
+    data = resp_obj.get(kind)
+    if data is None:
+        dicts = [value for value in resp_obj.values() if isinstance(value, dict)]
+        data = dicts[0] if len(dicts) == 1 else resp_obj
+    return to_record(kind, data)
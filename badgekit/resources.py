@@ -0,0 +1,160 @@
+"""
+Handles bound to a location in the BadgeKit API.
+
+Code that works inside the same system, issuer or program over and over
+can bind that location once and reuse it:
+
+>>> badge = bk.system('mysystem').issuer('myissuer').badge('stupendous-badge')
+>>> badge.get()
+{ ... }
+>>> badge.list('instance')
+{ ... }
+>>> badge.create('instance', {'email': 'learner@example.org'})
+{ ... }
+
+Each :class:`Resource` works out its URL path and location once, when it
+is built, so a call through it skips merging the client's defaults and
+rebuilding the path.  Handles are immutable, their location and query
+parameters being read-only mappings, and cheap to build; they may be kept
+around and shared between threads.
+"""
+
+from .api import _api_plural, _make_path, _make_query, _path_order, \
+        _possible_query_params
+
+
+__all__ = [
+        'Resource',
+        ]
+
+
+_rank = dict((kind, rank) for rank, kind in enumerate(_path_order))
+
+try:
+    from types import MappingProxyType
+except ImportError:
+    # Python 2: a copy, at least, so the caller's dict cannot change it.
+    MappingProxyType = dict
+
+
+def _frozen(mapping):
+    return MappingProxyType(dict(mapping))
+
+
+def _check_params(params):
+    for name in params:
+        if name not in _possible_query_params:
+            raise TypeError(
+                    "%r is not a query parameter; bind locations with "
+                    "the resource's kind methods instead" % name)
+
+
+class Resource(object):
+    """
+    A location in the API, such as a system or a badge, bound to a
+    :class:`badgekit.BadgeKitAPI`.
+
+    Build these with the client's kind methods (:meth:`system`,
+    :meth:`issuer`, etc.), which are also available on resources to go one
+    level deeper, or with :meth:`badgekit.BadgeKitAPI.resource`.
+
+    :attr location: the location, as a read-only mapping of the keyword
+        arguments that :meth:`badgekit.BadgeKitAPI.get` would accept.
+    :attr path: the URL path of the location, relative to the server.
+    :attr params: query parameters sent with every call, such as
+        ``archived``, as a read-only mapping.
+    """
+    __slots__ = ('api', 'location', 'path', 'kind', 'params')
+
+    def __init__(self, api, location, params=None):
+        self.api = api
+        self.location = _frozen(location)
+        self.path = _make_path(**location) if location else ''
+        self.kind = self._innermost()
+        self.params = _frozen(params or {})
+
+    def _innermost(self):
+        kind = None
+        for field in self.location:
+            if kind is None or _rank[field] > _rank[kind]:
+                kind = field
+        return kind
+
+    def child(self, kind, slug):
+        """
+        Returns the resource for the ``kind`` object ``slug`` inside this
+        one.
+        """
+        if kind not in _rank:
+            raise ValueError("Unknown kind %r" % kind)
+        location = dict(self.location)
+        location[kind] = slug
+        if self.kind is not None and _rank[kind] <= _rank[self.kind]:
+            # Out of order, or replacing a level: lay the path out again.
+            return Resource(self.api, location, self.params)
+
+        res = Resource.__new__(Resource)
+        res.api = self.api
+        res.location = _frozen(location)
+        res.path = self._join(_api_plural(kind), slug)
+        res.kind = kind
+        res.params = self.params
+        return res
+
+    def _join(self, *parts):
+        if self.path:
+            return '/'.join((self.path,) + parts)
+        return '/'.join(parts)
+
+    def _query(self, params):
+        if not params and not self.params:
+            return ''
+        _check_params(params)
+        return _make_query(dict(self.params, **params))
+
+    def list(self, kind, **params):
+        """
+        Lists the ``kind`` objects inside this one, as
+        :meth:`badgekit.BadgeKitAPI.list` does.  Only query parameters, such
+        as ``archived``, may be passed as keywords.
+        """
+        path = self._join(_api_plural(kind)) + self._query(params)
+        return self.api._list_path(path, kind)
+
+    def get(self, **params):
+        "Retrieves this object, as :meth:`badgekit.BadgeKitAPI.get` does."
+        return self.api._get_path(self.path + self._query(params), self.kind)
+
+    def create(self, kind, data):
+        """
+        Creates a ``kind`` object inside this one, as
+        :meth:`badgekit.BadgeKitAPI.create` does, with the resource's query
+        parameters.
+        """
+        return self.api._create_path(
+                self._join(_api_plural(kind)) + self._query({}), data)
+
+    def __eq__(self, other):
+        return (isinstance(other, Resource) and self.api is other.api
+                and self.path == other.path and self.params == other.params)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def __repr__(self):
+        return '<Resource %s>' % (self.path or '/')
+
+
+def _kind_method(kind):
+    def bind(self, slug):
+        return self.child(kind, slug)
+    bind.__name__ = kind
+    bind.__doc__ = "Returns the resource for the %s ``slug`` inside this one." % kind
+    return bind
+
+
+for _kind in _path_order:
+    setattr(Resource, _kind, _kind_method(_kind))
@@ -0,0 +1,91 @@
+"""
+Coalescing of concurrent identical reads.
+
+When several threads ask for the same URL at the same moment, a
+:class:`SingleFlight` lets the first one make the request while the others
+wait for its result, so the server sees one request instead of dozens.
+Pass ``coalesce=True`` to :class:`badgekit.BadgeKitAPI` to do this for
+``get``, ``list`` and ``get_public_url``.
+"""
+
+import copy
+import threading
+
+
+__all__ = [
+        'SingleFlight',
+        ]
+
+
+class _Call(object):
+    __slots__ = ('event', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight(object):
+    """
+    Runs at most one call per key at a time, sharing its outcome with any
+    callers that ask for the same key while it is running.
+
+    :param copy: if true (the default), when a result is shared, every
+        caller gets its own deep copy, so no caller can change what another
+        sees.
+
+    A call's exception is raised to every caller that shared it.
+    """
+    def __init__(self, copy=True):
+        self.copy = copy
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, func):
+        """
+        Returns ``func()``, or the result of a call already running for
+        ``key``.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+                self.calls += 1
+            else:
+                call.waiters += 1
+                leader = False
+                self.shared += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return self._copy(call.result)
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                shared = call.waiters > 0
+            call.event.set()
+
+        if shared:
+            return self._copy(call.result)
+        return call.result
+
+    def _copy(self, value):
+        return copy.deepcopy(value) if self.copy else value
+
+    def stats(self):
+        "Returns the number of calls made, and of callers that shared one."
+        with self._lock:
+            return {'calls': self.calls, 'shared': self.shared}
@@ -0,0 +1,265 @@
+"""
+Export and import of badge systems as compressed JSON Lines.
+
+:func:`export_snapshot` writes every object found by a crawl (see
+:meth:`badgekit.BadgeKitAPI.crawl`) to a gzip file, one JSON object per
+line, tagged with its kind and location:
+
+.. code-block:: json
+
+    {"kind": "badge", "location": {"system": "s", "badge": "b"}, "data": {...}}
+
+:func:`import_snapshot` recreates the objects in a snapshot with
+:meth:`~badgekit.BadgeKitAPI.create`:
+
+>>> from badgekit.snapshot import export_snapshot, import_snapshot
+>>> export_snapshot(production, 'mysystem.jsonl.gz', system='mysystem',
+...         kinds=['issuer', 'program', 'badge', 'instance'])
+>>> import_snapshot(staging, 'mysystem.jsonl.gz',
+...         checkpoint='mysystem.checkpoint')
+
+Both stream the file, so memory use does not grow with the size of the
+system.  An import makes one pass over the file per level of nesting,
+creating the systems, then the issuers, and so on, so that every object's
+parent exists before it is created; objects on the same level are created
+in parallel.  With a ``checkpoint`` file, an import that fails part way
+can be run again and carries on where it stopped.  Objects that already
+exist (:class:`badgekit.ResourceConflict`) count as imported.
+"""
+
+import gzip
+import json
+import os
+import time
+
+from .api import BadgeKitException, RequestException, ResourceConflict
+from .bulk import _bounded_map
+
+
+__all__ = [
+        'export_snapshot',
+        'import_snapshot',
+        'read_snapshot',
+        ]
+
+
+_replace = getattr(os, 'replace', os.rename)
+
+
+def export_snapshot(api, filename, kinds=None, max_workers=8, **kwargs):
+    """
+    Writes the objects inside a location to a gzip-compressed JSON Lines
+    file, and returns counts of what was written.
+
+    :param api: the :class:`badgekit.BadgeKitAPI` to read from.
+    :param filename: the file to write.
+    :param kinds: the kinds of object to export, as for
+        :meth:`badgekit.BadgeKitAPI.crawl`.
+    :param max_workers: the most listings fetched at once.
+
+    The remaining keyword arguments give the location to export, as for
+    :meth:`badgekit.BadgeKitAPI.crawl`.  Each object follows its parent in
+    the file.  Listings that fail are counted under ``errors`` in the
+    result, and their objects are left out.
+    """
+    crawl = api.crawl(kinds=kinds, max_depth=None, max_workers=max_workers,
+            **kwargs)
+    counts = {}
+    with gzip.open(filename, 'wb') as f:
+        for node in crawl:
+            data = node.data
+            if not isinstance(data, dict):
+                data = data.to_dict()
+            line = json.dumps({
+                'kind': node.kind,
+                'location': node.location,
+                'data': data,
+                }, sort_keys=True)
+            f.write(line.encode('utf-8') + b'\n')
+            counts[node.kind] = counts.get(node.kind, 0) + 1
+    return {
+            'objects': sum(counts.values()),
+            'kinds': counts,
+            'errors': crawl.stats['errors'],
+            'elapsed': crawl.stats['elapsed'],
+            }
+
+
+def read_snapshot(filename):
+    """
+    Yields the entries of a snapshot, each a dict with ``kind``,
+    ``location`` and ``data``.
+    """
+    with gzip.open(filename, 'rb') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line.decode('utf-8'))
+
+
+def _creatable(data):
+    '''
+    The fields of an object that can be sent to ``create``: the server
+    assigns ids, and nested objects are given by location instead.
+    '''
+    return dict((key, value) for key, value in data.items()
+            if key != 'id' and not isinstance(value, dict))
+
+
+class _Checkpoint(object):
+    '''
+    How far an import has got: every object on levels below ``level``, and
+    every object on ``level`` before line ``line`` of the snapshot, exists.
+    '''
+    def __init__(self, filename, snapshot):
+        self.filename = filename
+        self.snapshot = os.path.basename(snapshot)
+        self.level = 1
+        self.line = 0
+        self.saved = 0.0
+        if filename is not None and os.path.exists(filename):
+            with open(filename) as f:
+                state = json.load(f)
+            if state.get('snapshot') != self.snapshot:
+                raise ValueError("Checkpoint %s is for %s, not %s" % (
+                    filename, state.get('snapshot'), self.snapshot))
+            self.level = state['level']
+            self.line = state['line']
+
+    def advance(self, level, line, force=False):
+        self.level, self.line = level, line
+        if self.filename is None:
+            return
+        now = time.time()
+        if not force and now - self.saved < 0.5:
+            return
+        self.saved = now
+        temp = self.filename + '.tmp'
+        with open(temp, 'w') as f:
+            json.dump({'snapshot': self.snapshot, 'level': level, 'line': line},
+                    f)
+            f.flush()
+            os.fsync(f.fileno())
+        _replace(temp, self.filename)
+
+
+def import_snapshot(api, filename, checkpoint=None, max_in_flight=10,
+        keep_going=False, transform=None, **kwargs):
+    """
+    Creates the objects in a snapshot, and returns counts of the outcomes.
+
+    :param api: the :class:`badgekit.BadgeKitAPI` to create through.
+    :param filename: the snapshot file, from :func:`export_snapshot`.
+    :param checkpoint: a file in which to keep track of progress.  If it
+        exists, the import starts where the run that wrote it stopped.
+    :param max_in_flight: the most ``create`` calls running at once.
+    :param keep_going: if true, objects that cannot be created are counted
+        as ``failed`` and the import goes on.  Otherwise, the first error
+        stops the import, and is raised once the calls in flight are done.
+    :param transform: a function called with each entry's kind, location
+        and data, returning the data to create the object with, or None to
+        skip it.  By default, ids and nested objects are left out.
+
+    The remaining keyword arguments replace parts of every location, e.g.
+    ``system='staging'`` to import a system's contents under another
+    system.
+    """
+    state = _Checkpoint(checkpoint, filename)
+    stats = {
+            'created': 0,
+            'existing': 0,
+            'skipped': 0,
+            'failed': 0,
+            'errors': {},
+            'levels': 0,
+            'elapsed': 0.0,
+            }
+    start = time.time()
+    level = state.level
+    try:
+        while True:
+            deeper = _import_level(api, filename, level, state, stats,
+                    max_in_flight, keep_going, transform, kwargs)
+            level += 1
+            state.advance(level, 0, force=True)
+            if not deeper:
+                break
+    finally:
+        stats['elapsed'] = time.time() - start
+    return stats
+
+
+def _import_level(api, filename, level, state, stats, max_in_flight,
+        keep_going, transform, overrides):
+    '''
+    Creates the objects of one level, returning True if there are deeper
+    ones.
+    '''
+    deeper = [False]
+
+    def entries():
+        for number, entry in enumerate(read_snapshot(filename)):
+            depth = len(entry['location'])
+            if depth > level:
+                deeper[0] = True
+            elif depth == level and number >= state.line:
+                yield number, entry
+
+    def create(entry):
+        kind = entry['kind']
+        location = dict(entry['location'])
+        for field, value in overrides.items():
+            if field in location:
+                location[field] = value
+        data = entry['data']
+        if transform is not None:
+            data = transform(kind, location, data)
+            if data is None:
+                return 'skipped', None
+        else:
+            data = _creatable(data)
+        del location[kind]
+        try:
+            api.create(kind, data, **location)
+        except ResourceConflict:
+            return 'existing', None
+        except (BadgeKitException, RequestException) as e:
+            return 'failed', e
+        return 'created', None
+
+    items = entries()
+    failed = []
+    stats['levels'] += 1
+
+    def submissions():
+        # Nothing more is sent once an entry has failed, unless keep_going.
+        while not failed:
+            try:
+                yield next(items)
+            except StopIteration:
+                return
+
+    try:
+        # Results finished out of order still hold a slot, so the
+        # checkpoint is never more than max_in_flight lines behind.
+        for index, (number, outcome, exc) in _bounded_map(
+                lambda numbered: (numbered[0],) + create(numbered[1]),
+                submissions(), max_in_flight):
+            stats[outcome] += 1
+            if exc is not None:
+                name = type(exc).__name__
+                stats['errors'][name] = stats['errors'].get(name, 0) + 1
+                if not keep_going:
+                    failed.append(exc)
+                    continue
+            if not failed:
+                state.advance(level, number + 1)
+    finally:
+        state.advance(level, state.line, force=True)
+
+    if failed:
+        raise failed[0]
+    # Read what is left, to learn whether any deeper objects follow.
+    for item in items:
+        pass
+    return deeper[0]
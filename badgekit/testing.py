@@ -0,0 +1,371 @@
+"""
+A small in-process stand-in for the BadgeKit API server.
+
+:class:`StandInServer` speaks enough of the BadgeKit API's URL scheme to
+exercise this client against a real socket: objects can be created with
+``POST`` (as a form, or as ``multipart/form-data`` with files), listed
+(optionally a ``page`` at a time) and fetched with ``GET``, and ``GET /``
+reports the server's name and version.  Successful ``GET`` responses
+carry an ``ETag``, and ``If-None-Match`` is honoured.  It is meant for
+benchmarks and tests, not as a faithful copy of the real server.
+
+>>> with StandInServer() as server:
+...     bk = BadgeKitAPI(server.url, 'secret')
+...     bk.create('system', {'slug': 'sys', 'name': 'System'})
+"""
+
+import email.parser
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urljoin, urlsplit, parse_qsl
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urljoin, urlsplit, parse_qsl
+
+from .api import _api_plural, _path_order
+
+
+__all__ = [
+        'StandInServer',
+        ]
+
+
+_singular = dict((_api_plural(kind), kind) for kind in _path_order)
+
+
+def _parse_path(path):
+    '''
+    Splits a path such as '/systems/s/badges' into its location,
+    e.g. ``[('system', 's')]``, and the kind of a trailing collection
+    (``'badge'``), or None if the path names a single object.
+    '''
+    parts = [part for part in path.split('/') if part]
+    location = []
+    while len(parts) >= 2:
+        plural, slug = parts.pop(0), parts.pop(0)
+        if plural not in _singular:
+            raise KeyError(plural)
+        location.append((_singular[plural], slug))
+    kind = None
+    if parts:
+        if parts[0] not in _singular:
+            raise KeyError(parts[0])
+        kind = _singular[parts[0]]
+    return location, kind
+
+
+class _Store(object):
+    '''
+    In-memory objects, keyed by their location tuple.
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.objects = {}
+        self.children = {}
+
+    def create(self, location, kind, data):
+        slug = data.get('slug')
+        with self.lock:
+            key = tuple(location) + ((kind, slug),)
+            if key in self.objects:
+                return None
+            obj = dict(data)
+            obj.setdefault('id', len(self.objects) + 1)
+            self.objects[key] = obj
+            self.children.setdefault((tuple(location), kind), []).append(key)
+            return obj
+
+    def get(self, location):
+        with self.lock:
+            return self.objects.get(tuple(location))
+
+    def list(self, location, kind):
+        with self.lock:
+            keys = self.children.get((tuple(location), kind), [])
+            return [self.objects[key] for key in keys]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, obj):
+        body = json.dumps(obj).encode('utf-8')
+        etag = None
+        if self.command == 'GET' and status == 200:
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+        self.send_response(status)
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_found(self):
+        self._reply(404, {
+            'code': 'ResourceNotFound',
+            'message': 'Could not find %s' % self.path,
+            })
+
+    def _authorized(self, body=b''):
+        '''
+        Checks the request's JWT, if the server has a secret, replying with
+        an error and returning False if it does not check out.
+        '''
+        secret = self.server.secret
+        if secret is None:
+            return True
+        import jwt
+        header = self.headers.get('Authorization') or ''
+        token = header[header.find('"') + 1:].rstrip('"')
+        try:
+            claim = jwt.decode(token, secret, algorithms=['HS256'])
+            valid = (claim.get('path') == self.path
+                    and claim.get('method') == self.command)
+            if self.command in ('POST', 'PUT'):
+                valid = valid and (claim.get('body') or {}).get('hash') == \
+                        hashlib.sha256(body).hexdigest()
+        except jwt.InvalidTokenError:
+            valid = False
+        if not valid:
+            self._reply(403, {
+                'code': 'Unauthorized',
+                'message': 'Invalid or missing JWT',
+                })
+        return valid
+
+    def _count(self):
+        server = self.server
+        with server.lock:
+            key = (self.command, urlsplit(self.path).path)
+            server.hits[key] = server.hits.get(key, 0) + 1
+        if server.latency:
+            time.sleep(server.latency + random.random() * server.jitter)
+
+    def do_GET(self):
+        self._count()
+        url = urlsplit(self.path)
+        if url.path == '/':
+            return self._reply(200, {
+                'app': 'BadgeKit API',
+                'version': self.server.version,
+                })
+        public = self.server.public.get(url.path)
+        if public is not None:
+            return self._reply(200, public)
+        if not self._authorized():
+            return
+        try:
+            location, kind = _parse_path(url.path)
+        except KeyError:
+            return self._not_found()
+
+        store = self.server.store
+        if kind is None:
+            obj = store.get(location)
+            if obj is None:
+                return self._not_found()
+            return self._reply(200, {location[-1][0]: obj})
+        if location and store.get(location) is None:
+            return self._not_found()
+        items = store.list(location, kind)
+        query = dict(parse_qsl(url.query))
+        if 'page' not in query:
+            return self._reply(200, {_api_plural(kind): items})
+
+        page = int(query['page'])
+        count = int(query.get('count', 100))
+        return self._reply(200, {
+            _api_plural(kind): items[(page - 1) * count:page * count],
+            'pageData': {'page': page, 'count': count, 'total': len(items)},
+            })
+
+    def do_POST(self):
+        self._count()
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        if not self._authorized(body):
+            return
+        content_type = self.headers.get('Content-Type') or ''
+        if content_type.startswith('multipart/form-data'):
+            data = _parse_multipart(content_type, body)
+        else:
+            data = _parse_form(body.decode('utf-8'))
+        try:
+            location, kind = _parse_path(urlsplit(self.path).path)
+        except KeyError:
+            return self._not_found()
+        if kind is None or (location and self.server.store.get(location) is None):
+            return self._not_found()
+        if not data.get('slug'):
+            return self._reply(400, {
+                'code': 'ValidationError',
+                'message': 'Could not validate required fields',
+                'details': [{'field': 'slug', 'value': ''}],
+                })
+
+        obj = self.server.store.create(location, kind, data)
+        if obj is None:
+            return self._reply(409, {
+                'code': 'ResourceConflict',
+                'message': '%s with that `slug` already exists' % kind,
+                'details': data,
+                })
+        return self._reply(201, {'status': 'created', kind: obj})
+
+
+def _parse_form(body):
+    "Decodes a form, as :func:`_nest` does its fields."
+    return _nest(parse_qsl(body))
+
+
+def _nest(fields):
+    '''
+    Reads ``(name, value)`` pairs with bracketed names such as
+    ``criteria[0][note]`` into lists and dicts, as the real server's form
+    parser does.
+    '''
+    data = {}
+    for name, value in fields:
+        keys = re.findall(r'\[([^\]]*)\]', name)
+        container, key = data, name.split('[', 1)[0]
+        for inner in keys:
+            container = container.setdefault(key, {})
+            key = inner
+        container[key] = value
+    return _arrays(data)
+
+
+def _arrays(value):
+    # Turns dicts whose keys are all indices back into lists.
+    if not isinstance(value, dict):
+        return value
+    value = dict((key, _arrays(item)) for key, item in value.items())
+    if value and all(key.isdigit() for key in value):
+        return [value[key] for key in sorted(value, key=int)]
+    return value
+
+
+def _parse_multipart(content_type, body):
+    '''
+    Decodes a ``multipart/form-data`` body, as :func:`_nest` does its
+    fields.  Files are kept as a summary: their name, type, size and
+    SHA-256 hash.
+    '''
+    raw = (b'Content-Type: ' + content_type.encode('ascii') + b'\r\n\r\n' +
+            body)
+    try:
+        message = email.parser.BytesParser().parsebytes(raw)
+    except AttributeError:
+        # Python 2's parser takes bytes as they are.
+        message = email.parser.Parser().parsestr(raw)
+    fields = []
+    for part in message.get_payload():
+        name = part.get_param('name', header='content-disposition')
+        content = part.get_payload(decode=True)
+        filename = part.get_filename()
+        if filename is None:
+            fields.append((name, content.decode('utf-8')))
+        else:
+            fields.append((name, {
+                    'filename': filename,
+                    'contentType': part.get_content_type(),
+                    'size': len(content),
+                    'sha256': hashlib.sha256(content).hexdigest(),
+                    }))
+    return _nest(fields)
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class StandInServer(object):
+    """
+    Runs a stand-in BadgeKit API server on a background thread.
+
+    :param host: the interface to listen on.
+    :param port: the port to listen on; 0 picks a free port.
+    :param version: the version reported by ``GET /``.
+    :param secret: if given, requests other than ``GET /`` must carry a
+        JWT signed with this secret, whose path, method and body hash match
+        the request, as the real server demands.
+    :param latency: seconds to wait before answering each request.
+    :param jitter: up to this many more seconds, chosen at random, to wait
+        before answering each request.
+
+    The server listens as soon as it is constructed; :attr:`url` is its
+    base URL.  Use it as a context manager, or call :meth:`close`.
+    :attr:`hits` counts the requests received, keyed by method and path.
+    """
+    def __init__(self, host='127.0.0.1', port=0, version='0.5.0',
+            secret=None, latency=0.0, jitter=0.0):
+        self.httpd = _ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.store = _Store()
+        self.httpd.version = version
+        self.httpd.secret = secret
+        self.httpd.latency = latency
+        self.httpd.jitter = jitter
+        self.httpd.lock = threading.Lock()
+        self.httpd.hits = {}
+        self.httpd.public = {}
+        self.url = 'http://%s:%d/' % self.httpd.server_address[:2]
+        self.thread = threading.Thread(target=self.httpd.serve_forever,
+                kwargs={'poll_interval': 0.05})
+        self.thread.daemon = True
+        self.thread.start()
+
+    @property
+    def hits(self):
+        return self.httpd.hits
+
+    def populate(self, kind, items, **location):
+        """
+        Adds ``kind`` objects, each a dict with at least a ``slug``, at
+        ``location`` (given as for :meth:`badgekit.BadgeKitAPI.create`),
+        without going through HTTP.  Useful for setting up large data sets.
+        """
+        path = [(field, location[field]) for field in _path_order
+                if location.get(field) is not None]
+        for item in items:
+            self.httpd.store.create(path, kind, item)
+
+    def publish(self, path, document):
+        """
+        Serves ``document`` as JSON at ``path``, such as
+        ``'/public/assertions/1'``, without asking for a JWT, as the real
+        server serves assertions and badge classes.  Returns its URL.
+        """
+        self.httpd.public[path] = document
+        return urljoin(self.url, path)
+
+    def close(self):
+        "Stops the server and closes its listening socket."
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
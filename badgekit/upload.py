@@ -0,0 +1,268 @@
+"""
+Streaming file uploads, such as badge images and evidence.
+
+Give :meth:`badgekit.BadgeKitAPI.create` a file opened in binary mode, or
+an :class:`Upload` naming a path, among its data, and the object is sent as
+``multipart/form-data`` streamed from the file, rather than read into
+memory first:
+
+>>> from badgekit.upload import Upload
+>>> bk.create('badge', {'slug': 'super', 'name': 'Super',
+...         'image': Upload('super.png')}, system='mysystem')
+>>> with open('essay.pdf', 'rb') as f:
+...     bk.create('evidence', {'file': f, 'reflection': 'My essay'},
+...             system='mysystem', application='a1b2c3')
+
+Files on disk are memory-mapped, and sent a chunk at a time; so memory use
+stays flat however large the files, and however many are uploaded at once.
+The JWT that signs the request carries a hash of the body, so the body is
+made twice: once to hash it, chunk by chunk, and once to send it.  A file
+that cannot be read twice, such as a pipe, is first copied to a temporary
+file, which is kept in memory only while it is small.
+"""
+
+import hashlib
+import mimetypes
+import mmap
+import os
+import tempfile
+import uuid
+
+from .api import _form_fields
+
+
+__all__ = [
+        'MultipartBody',
+        'Upload',
+        ]
+
+
+chunk_size = 64 * 1024
+
+
+try:
+    text_type = unicode
+except NameError:
+    text_type = str
+
+try:
+    from pathlib import PurePath
+except ImportError:
+    PurePath = None
+
+
+class Upload(object):
+    """
+    A file to upload.
+
+    :param source: a path, or a file opened in binary mode.  A file is read
+        from its current position.
+    :param filename: the file name to give the server; by default, the base
+        name of the path.
+    :param content_type: the file's type; by default, guessed from
+        ``filename``.
+    """
+    def __init__(self, source, filename=None, content_type=None):
+        self.source = source
+        if filename is None:
+            name = getattr(source, 'name', source)
+            if isinstance(name, bytes):
+                name = name.decode('utf-8')
+            if isinstance(name, text_type) or _is_path(name):
+                filename = os.path.basename(text_type(name))
+            else:
+                filename = 'upload'
+        self.filename = filename
+        if content_type is None:
+            content_type = (mimetypes.guess_type(filename)[0] or
+                    'application/octet-stream')
+        self.content_type = content_type
+
+    def __repr__(self):
+        return '<Upload %s (%s)>' % (self.filename, self.content_type)
+
+
+def _is_path(value):
+    return PurePath is not None and isinstance(value, PurePath)
+
+
+def _is_upload(value):
+    "True if ``value`` is to be sent as a file rather than as text."
+    return (isinstance(value, Upload) or hasattr(value, 'read') or
+            _is_path(value))
+
+
+def _has_uploads(data):
+    "True if a dict of data fields has a file among its values."
+    if not isinstance(data, dict):
+        return False
+    for value in data.values():
+        if isinstance(value, (list, tuple)):
+            if any(_is_upload(v) for v in value):
+                return True
+        elif _is_upload(value):
+            return True
+    return False
+
+
+class _Part(object):
+    # One file's bytes: a memory map, a seekable file, or a spooled copy.
+    def __init__(self, upload):
+        self.upload = upload
+        self._owned = None
+        self._map = None
+        source = upload.source
+        if not hasattr(source, 'read'):
+            if not isinstance(source, (bytes, text_type)):
+                source = text_type(source)
+            source = self._owned = open(source, 'rb')
+        self.file = source
+
+        try:
+            self.start = source.tell()
+            source.seek(0, os.SEEK_END)
+            self.size = source.tell() - self.start
+            source.seek(self.start)
+        except (AttributeError, IOError, OSError, ValueError):
+            # Not seekable: copy it once, so it can be read twice.
+            copy = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                copy.write(chunk)
+            self.file = self._owned = copy
+            self.size = copy.tell()
+            self.start = 0
+            return
+
+        try:
+            fileno = source.fileno()
+        except (AttributeError, IOError, OSError, ValueError):
+            return
+        if self.size > 0:
+            try:
+                self._map = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+            except (mmap.error, OSError, ValueError):
+                self._map = None
+
+    def chunks(self):
+        end = self.start + self.size
+        if self._map is not None:
+            for position in range(self.start, end, chunk_size):
+                yield self._map[position:min(position + chunk_size, end)]
+            return
+        self.file.seek(self.start)
+        remaining = self.size
+        while remaining > 0:
+            chunk = self.file.read(min(chunk_size, remaining))
+            if not chunk:
+                raise IOError("%s got shorter while it was being uploaded"
+                        % self.upload.filename)
+            remaining -= len(chunk)
+            yield chunk
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._owned is not None:
+            self._owned.close()
+            self._owned = None
+
+
+def _quote(value):
+    # As browsers do: a quote or line break in a name would end the header.
+    return (value.replace('"', '%22').replace('\r', '%0D')
+            .replace('\n', '%0A'))
+
+
+def _encode(value):
+    if isinstance(value, bytes):
+        return value
+    return text_type(value).encode('utf-8')
+
+
+class MultipartBody(object):
+    """
+    A ``multipart/form-data`` request body, made as it is read.
+
+    :param data: a dict of fields.  Values may be text, files, as
+        :class:`Upload` objects, binary files or paths, or lists and dicts
+        of these, which are sent in bracketed form (``criteria[0][note]``).
+
+    :mod:`requests` sends it chunk by chunk, with a ``Content-Length``
+    worked out from the files' sizes.  Each iteration starts from the
+    beginning again.  :meth:`close` it once sent, to close the files it
+    opened.
+    """
+    def __init__(self, data):
+        self.boundary = uuid.uuid4().hex
+        self._parts = []
+        self._sha256 = None
+        try:
+            for name, value in _form_fields(data):
+                self._add(_encode(name), value)
+        except Exception:
+            self.close()
+            raise
+        self._closing = ('--%s--\r\n' % self.boundary).encode('ascii')
+
+    def _add(self, name, value):
+        head = [b'--', self.boundary.encode('ascii'), b'\r\n',
+                b'Content-Disposition: form-data; name="',
+                _quote(name.decode('utf-8')).encode('utf-8'), b'"']
+        if _is_upload(value):
+            if not isinstance(value, Upload):
+                value = Upload(value)
+            head.extend([b'; filename="',
+                _quote(value.filename).encode('utf-8'), b'"\r\n',
+                b'Content-Type: ', value.content_type.encode('ascii'),
+                b'\r\n\r\n'])
+            self._parts.append((b''.join(head), _Part(value)))
+        else:
+            head.extend([b'\r\n\r\n', _encode(value)])
+            self._parts.append((b''.join(head), None))
+
+    @property
+    def content_type(self):
+        "The ``Content-Type`` header, with the boundary."
+        return 'multipart/form-data; boundary=%s' % self.boundary
+
+    def __len__(self):
+        total = len(self._closing)
+        for head, part in self._parts:
+            total += len(head) + 2
+            if part is not None:
+                total += part.size
+        return total
+
+    def __iter__(self):
+        for head, part in self._parts:
+            yield head
+            if part is not None:
+                for chunk in part.chunks():
+                    yield chunk
+            yield b'\r\n'
+        yield self._closing
+
+    def sha256(self):
+        "The hex SHA-256 hash of the body, for the JWT's body claim."
+        if self._sha256 is None:
+            digest = hashlib.sha256()
+            for chunk in self:
+                digest.update(chunk)
+            self._sha256 = digest.hexdigest()
+        return self._sha256
+
+    def close(self):
+        "Closes the files, and memory maps, the body opened."
+        for head, part in self._parts:
+            if part is not None:
+                part.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
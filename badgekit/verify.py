@@ -0,0 +1,271 @@
+"""
+Batch verification of hosted badge assertions.
+
+An Open Badges assertion points to its badge class, which points to its
+issuer, and a batch of assertions for the same few badges points to the
+same few documents again and again.  A :class:`Verifier` fetches the
+assertions of a batch in parallel with
+:meth:`badgekit.BadgeKitAPI.get_public_url`, but fetches each linked badge
+class and issuer only once for the whole batch, however many assertions
+share it and however many threads want it at the same moment:
+
+>>> from badgekit.verify import Verifier
+>>> verifier = Verifier(bk)
+>>> for result in verifier.verify(assertion_urls):
+...     if not result.valid:
+...         print(result.url, result.errors)
+>>> verifier.stats
+{'assertions': 5000, 'valid': 4990, 'fetches': 5012, 'shared': 9988, ...}
+
+To also check that each assertion was issued to the right person, pass
+``(url, email)`` pairs instead of URLs.
+"""
+
+import hashlib
+import threading
+import time
+
+from .api import BadgeKitException, RequestException
+from .bulk import _bounded_map
+from .singleflight import SingleFlight
+
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
+
+__all__ = [
+        'Verification',
+        'Verifier',
+        ]
+
+
+class Verification(object):
+    """
+    The outcome of verifying one assertion.
+
+    :attr url: the assertion's URL.
+    :attr errors: a list of reasons the assertion is not valid; empty if
+        it is.
+    :attr assertion: the assertion document, if it could be fetched.
+    :attr badge: the badge class document, if it could be fetched.
+    :attr issuer: the issuer document, if it could be fetched.
+    """
+    __slots__ = ('url', 'errors', 'assertion', 'badge', 'issuer')
+
+    def __init__(self, url):
+        self.url = url
+        self.errors = []
+        self.assertion = None
+        self.badge = None
+        self.issuer = None
+
+    @property
+    def valid(self):
+        "True if no problem was found with the assertion."
+        return not self.errors
+
+    def __repr__(self):
+        if self.valid:
+            return '<Verification %s: valid>' % self.url
+        return '<Verification %s: %s>' % (self.url, '; '.join(self.errors))
+
+
+def _timestamp(value):
+    '''
+    Returns a date from an assertion, as a Unix timestamp or an ISO 8601
+    date or datetime, as seconds since the epoch; or None if it cannot be
+    read.  A string of digits is a timestamp only if it is longer than a
+    year.
+    '''
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if not hasattr(value, 'strip'):
+        return None
+    value = value.strip()
+    if value.isdigit() and len(value) > 4:
+        return int(value)
+    from .mirror import _epoch, _parse_iso
+    parsed = _parse_iso(value)
+    if parsed is None:
+        return None
+    return (parsed - _epoch).total_seconds()
+
+
+def _hashed_identity(email, salt, algorithm):
+    digest = hashlib.new(algorithm)
+    digest.update((email + (salt or '')).encode('utf-8'))
+    return '%s$%s' % (algorithm, digest.hexdigest())
+
+
+class Verifier(object):
+    """
+    Verifies batches of hosted assertions.
+
+    :param api: the :class:`badgekit.BadgeKitAPI` to fetch with.
+    :param max_workers: the most assertions verified at once.
+
+    Badge class and issuer documents are kept for the life of the verifier,
+    so a verifier may be reused for several batches from the same issuers,
+    or discarded to start afresh.  A failed fetch is shared by the
+    assertions waiting on it at the time, but is not kept: the next
+    assertion linking to the document tries again.
+    :attr:`stats` holds the counts of the last batch.
+    """
+    def __init__(self, api, max_workers=16):
+        self.api = api
+        self.max_workers = max_workers
+        self._documents = {}
+        self._flight = SingleFlight(copy=False)
+        self._lock = threading.Lock()
+        self.stats = {}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def _document(self, url):
+        '''
+        Returns a linked document, fetching it only if no other thread has
+        fetched it or is fetching it.  Raises the error its fetch raised.
+        '''
+        document = self._documents.get(url)
+        if document is not None:
+            self._count('shared')
+            return document
+
+        fetched_here = []
+
+        def fetch():
+            fetched_here.append(True)
+            self._count('fetches')
+            try:
+                fetched = (self.api.get_public_url(url), None)
+            except (BadgeKitException, RequestException) as e:
+                return (None, e)
+            # Kept before the fetch is over, so no thread can miss both
+            # the cache and the fetch in flight.
+            self._documents[url] = fetched[0]
+            return fetched
+        document, error = self._flight.do(url, fetch)
+        if not fetched_here:
+            self._count('shared')
+        if error is not None:
+            raise error
+        return document
+
+    def verify_one(self, url, email=None):
+        """
+        Verifies one assertion, returning a :class:`Verification`.  If
+        ``email`` is given, the assertion must have been issued to it.
+        """
+        result = Verification(url)
+        self._count('fetches')
+        try:
+            assertion = result.assertion = self.api.get_public_url(url)
+        except (BadgeKitException, RequestException) as e:
+            result.errors.append('assertion could not be fetched: %s' % e)
+            return result
+
+        for field in ('uid', 'recipient', 'badge', 'verify', 'issuedOn'):
+            if assertion.get(field) is None:
+                result.errors.append('assertion has no %s' % field)
+        if result.errors:
+            return result
+
+        verify = assertion['verify']
+        if not isinstance(verify, dict) or verify.get('type') != 'hosted':
+            result.errors.append('assertion is not hosted')
+        elif verify.get('url') != url:
+            result.errors.append('assertion is hosted at %s' % verify.get('url'))
+        if assertion.get('revoked'):
+            result.errors.append('assertion has been revoked')
+        expires = assertion.get('expires')
+        if expires is not None:
+            expiry = _timestamp(expires)
+            if expiry is None:
+                result.errors.append('assertion has an unreadable expiry date')
+            elif expiry < time.time():
+                result.errors.append('assertion has expired')
+        if email is not None:
+            self._check_recipient(result, assertion['recipient'], email)
+
+        if not isinstance(assertion['badge'], string_types):
+            result.errors.append('assertion does not link to its badge class')
+            return result
+        try:
+            badge = result.badge = self._document(assertion['badge'])
+        except (BadgeKitException, RequestException) as e:
+            result.errors.append('badge class could not be fetched: %s' % e)
+            return result
+        for field in ('name', 'criteria', 'issuer'):
+            if not badge.get(field):
+                result.errors.append('badge class has no %s' % field)
+        if not badge.get('issuer'):
+            return result
+        if not isinstance(badge['issuer'], string_types):
+            result.errors.append('badge class does not link to its issuer')
+            return result
+
+        try:
+            issuer = result.issuer = self._document(badge['issuer'])
+        except (BadgeKitException, RequestException) as e:
+            result.errors.append('issuer could not be fetched: %s' % e)
+            return result
+        for field in ('name', 'url'):
+            if not issuer.get(field):
+                result.errors.append('issuer has no %s' % field)
+        return result
+
+    def _check_recipient(self, result, recipient, email):
+        if not isinstance(recipient, dict):
+            result.errors.append('assertion has an unreadable recipient')
+            return
+        identity = recipient.get('identity') or ''
+        if recipient.get('hashed'):
+            algorithm = identity.split('$', 1)[0]
+            if algorithm not in ('sha256', 'md5', 'sha1', 'sha512'):
+                result.errors.append('recipient is hashed with unknown %r'
+                        % algorithm)
+                return
+            matches = identity == _hashed_identity(email,
+                    recipient.get('salt'), algorithm)
+        else:
+            matches = identity.lower() == email.lower()
+        if not matches:
+            result.errors.append('assertion was not issued to %s' % email)
+
+    def verify(self, items):
+        """
+        Verifies a batch of assertions, yielding a :class:`Verification`
+        for each, in the order given.
+
+        :param items: assertion URLs, or ``(url, email)`` pairs.
+
+        Once iteration is over, :attr:`stats` holds the number of
+        ``assertions`` verified, how many were ``valid`` and ``invalid``,
+        the number of ``fetches`` made, the number of badge class and issuer
+        lookups that were ``shared`` with an earlier or concurrent fetch
+        instead, and the ``elapsed`` seconds.
+        """
+        start = time.time()
+        self.stats = {'assertions': 0, 'valid': 0, 'invalid': 0,
+                'fetches': 0, 'shared': 0, 'elapsed': 0.0}
+
+        def verify_item(item):
+            if isinstance(item, (tuple, list)):
+                return self.verify_one(*item)
+            return self.verify_one(item)
+
+        try:
+            for index, result in _bounded_map(verify_item, items,
+                    self.max_workers):
+                self.stats['assertions'] += 1
+                self.stats['valid' if result.valid else 'invalid'] += 1
+                yield result
+        finally:
+            self.stats['elapsed'] = time.time() - start
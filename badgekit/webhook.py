@@ -0,0 +1,329 @@
+"""
+Verification of the signed calls BadgeKit API makes to a webhook.
+
+The server signs each webhook call with a JWT like the ones
+:class:`badgekit.BadgeKitAPI` sends it: HS256, with the name of the secret
+as ``key``, an expiry as ``exp``, and the request's ``path``, ``method``
+and, for ``POST`` and ``PUT``, a ``body`` hash.  A :class:`WebhookVerifier`
+checks all of them:
+
+>>> from badgekit.webhook import WebhookVerifier, WebhookError
+>>> verifier = WebhookVerifier({'master': 'secr3t', 'partner': 'other'})
+>>> claims = verifier.verify(request.headers['Authorization'],
+...         request.method, request.full_path, request.body)
+
+:meth:`~WebhookVerifier.verify` returns the token's claims, or raises
+:class:`WebhookError` saying what is wrong.
+:meth:`~WebhookVerifier.verify_many` checks a batch, and
+:class:`WebhookMiddleware` guards a WSGI application; for ASGI, see
+:mod:`badgekit.asgi`.
+
+Verification is done here rather than with :mod:`jwt`, so that it costs
+little more than the hashing itself.  The HMAC for each secret is keyed
+once, when the verifier is made, and copied for every token; only HS256 is
+accepted, so a token cannot choose a weaker algorithm; and headers seen
+before are not decoded again.  Run ``benchmarks/webhook_bench.py`` to see
+how many tokens a core can check per second.
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import io
+import json
+import time
+try:
+    from urllib import quote
+except ImportError:
+    from urllib.parse import quote
+
+from .api import BadgeKitException
+
+
+__all__ = [
+        'WebhookCheck',
+        'WebhookError',
+        'WebhookMiddleware',
+        'WebhookVerifier',
+        'token_from_header',
+        ]
+
+
+class WebhookError(BadgeKitException):
+    "Raised when a webhook call's JWT does not check out."
+
+
+class WebhookCheck(object):
+    """
+    The outcome of checking one call, from
+    :meth:`WebhookVerifier.verify_many`.
+
+    :attr claims: the token's claims, if it checked out.
+    :attr error: the :class:`WebhookError` saying what is wrong, if not.
+    """
+    __slots__ = ('claims', 'error')
+
+    def __init__(self, claims=None, error=None):
+        self.claims = claims
+        self.error = error
+
+    @property
+    def valid(self):
+        "True if the call checked out."
+        return self.error is None
+
+    def __repr__(self):
+        if self.valid:
+            return '<WebhookCheck: valid>'
+        return '<WebhookCheck: %s>' % self.error
+
+
+def _b64decode(segment):
+    if isinstance(segment, bytes):
+        segment = segment.decode('ascii')
+    return base64.urlsafe_b64decode(
+            str(segment + '=' * (-len(segment) % 4)))
+
+
+def token_from_header(authorization):
+    """
+    Returns the token in an ``Authorization`` header, as written by
+    :mod:`requests_jwt` (``JWT token="..."``) or as a bearer token.
+    """
+    if not authorization:
+        raise WebhookError("No Authorization header")
+    if authorization.startswith('JWT token="'):
+        return authorization[11:].rstrip('"')
+    if authorization.startswith('Bearer '):
+        return authorization[7:].strip()
+    raise WebhookError("The Authorization header holds no JWT")
+
+
+class WebhookVerifier(object):
+    """
+    Checks the JWTs that sign webhook calls.
+
+    :param secrets: a dict mapping each key name to its secret.  A single
+        secret may be given instead, for the key name ``'master'``.
+    :param leeway: seconds by which a token may be past its expiry, to allow
+        for clocks that disagree.
+    :param require_exp: if false, tokens without an expiry are accepted.
+
+    A verifier is safe to share between threads.
+    """
+    def __init__(self, secrets, leeway=0, require_exp=True):
+        if not isinstance(secrets, dict):
+            secrets = {'master': secrets}
+        self._macs = {}
+        for key, secret in secrets.items():
+            if not isinstance(secret, bytes):
+                secret = secret.encode('utf-8')
+            self._macs[key] = hmac.new(secret, digestmod=hashlib.sha256)
+        self.leeway = leeway
+        self.require_exp = require_exp
+        self._headers = {}
+
+    def _check_header(self, segment):
+        known = self._headers.get(segment)
+        if known is None:
+            try:
+                header = json.loads(_b64decode(segment).decode('utf-8'))
+                known = (isinstance(header, dict) and
+                        header.get('alg') == 'HS256')
+            except (ValueError, TypeError, binascii.Error):
+                known = False
+            if len(self._headers) < 64:
+                self._headers[segment] = known
+        if not known:
+            raise WebhookError("The token is not an HS256 JWT")
+
+    def claims(self, token):
+        """
+        Returns the claims of a token whose signature checks out, without
+        checking them against a request.
+        """
+        if not isinstance(token, bytes):
+            token = token.encode('ascii', 'replace')
+        try:
+            signing_input, signature = token.rsplit(b'.', 1)
+            header, payload = signing_input.split(b'.')
+        except ValueError:
+            raise WebhookError("The token is not a JWT")
+        self._check_header(header)
+        try:
+            claims = json.loads(_b64decode(payload).decode('utf-8'))
+            signature = _b64decode(signature)
+        except (ValueError, TypeError, binascii.Error):
+            raise WebhookError("The token cannot be decoded")
+        if not isinstance(claims, dict):
+            raise WebhookError("The token's claims are not an object")
+
+        # The key claim is only trusted once the signature it chose checks
+        # out, as with a JWS 'kid' header.
+        base = self._macs.get(claims.get('key', 'master'))
+        if base is None:
+            raise WebhookError("Unknown key %r" % claims.get('key'))
+        mac = base.copy()
+        mac.update(signing_input)
+        if not hmac.compare_digest(mac.digest(), signature):
+            raise WebhookError("The token's signature does not match")
+        return claims
+
+    def verify(self, authorization, method, path, body=b'', now=None):
+        """
+        Checks a webhook call, and returns its token's claims.
+
+        :param authorization: the ``Authorization`` header, or the token.
+        :param method: the HTTP method, such as ``'POST'``.
+        :param path: the path the call was made to, with its query string.
+        :param body: the body of the call, as bytes.
+        :param now: the time to check the expiry against; the current time
+            by default.
+        """
+        if authorization and authorization.count('.') == 2 and \
+                ' ' not in authorization:
+            token = authorization
+        else:
+            token = token_from_header(authorization)
+        claims = self.claims(token)
+
+        exp = claims.get('exp')
+        if exp is None:
+            if self.require_exp:
+                raise WebhookError("The token has no expiry")
+        else:
+            if now is None:
+                now = time.time()
+            try:
+                expired = float(exp) + self.leeway < now
+            except (TypeError, ValueError):
+                raise WebhookError("The token's expiry is not a number")
+            if expired:
+                raise WebhookError("The token has expired")
+
+        if claims.get('method') != method:
+            raise WebhookError("The token was signed for %r, not %r"
+                    % (claims.get('method'), method))
+        if claims.get('path') != path:
+            raise WebhookError("The token was signed for %r, not %r"
+                    % (claims.get('path'), path))
+
+        signed_body = claims.get('body')
+        if signed_body is None:
+            if method in ('POST', 'PUT'):
+                raise WebhookError("The token does not sign the body")
+        else:
+            if not isinstance(body, bytes):
+                body = body.encode('utf-8')
+            if (not isinstance(signed_body, dict) or
+                    signed_body.get('alg', 'sha256') != 'sha256' or
+                    signed_body.get('hash') !=
+                    hashlib.sha256(body).hexdigest()):
+                raise WebhookError("The body does not match the token")
+        return claims
+
+    def verify_many(self, calls, now=None):
+        """
+        Checks many webhook calls, each a tuple of the arguments to
+        :meth:`verify`, and returns a list of :class:`WebhookCheck`, in the
+        same order.
+
+        Expiries are all checked against the one time, ``now``.  Checking
+        is bound by the CPU, so to use several cores, split the calls
+        between processes.
+        """
+        if now is None:
+            now = time.time()
+        verify = self.verify
+        results = []
+        for call in calls:
+            try:
+                results.append(WebhookCheck(verify(*call, now=now)))
+            except WebhookError as e:
+                results.append(WebhookCheck(error=e))
+        return results
+
+
+# What requests leaves unquoted in a path.  The token signs the path as
+# sent, still quoted, but servers pass it on decoded; quoting it again with
+# these gives back what was signed.
+_path_safe = "/!$&'()*+,:;=@[]~"
+
+
+def _requote(path):
+    "Quotes a decoded path, given as bytes, as :mod:`requests` sends it."
+    return quote(path, _path_safe)
+
+
+def _request_path(environ):
+    "The path, with any query string, of a WSGI request, as it was sent."
+    raw = environ.get('RAW_URI') or environ.get('REQUEST_URI')
+    if raw:
+        return raw
+    path = environ.get('SCRIPT_NAME', '') + environ.get('PATH_INFO', '')
+    if not isinstance(path, bytes):
+        # As PEP 3333 has it, the bytes received, decoded as latin-1.
+        path = path.encode('latin-1')
+    path = _requote(path)
+    query = environ.get('QUERY_STRING')
+    if query:
+        path += '?' + query
+    return path
+
+
+class WebhookMiddleware(object):
+    """
+    WSGI middleware that checks webhook calls before they reach the
+    application.
+
+    :param app: the WSGI application.
+    :param verifier: a :class:`WebhookVerifier`.
+    :param prefix: if given, only calls to paths starting with it are
+        checked; others go straight to the application.
+
+    Calls that do not check out are answered with ``403`` and a JSON error,
+    as the BadgeKit API answers unauthorized calls.  Calls that do reach
+    the application with their claims in ``environ['badgekit.webhook']``,
+    and their body, which had to be read to be checked, in a fresh
+    ``wsgi.input``.
+    """
+    def __init__(self, app, verifier, prefix=None):
+        self.app = app
+        self.verifier = verifier
+        self.prefix = prefix
+
+    def __call__(self, environ, start_response):
+        path = _request_path(environ)
+        if self.prefix is not None and not path.startswith(self.prefix):
+            return self.app(environ, start_response)
+
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if length > 0:
+            body = environ['wsgi.input'].read(length)
+        elif environ.get('wsgi.input_terminated'):
+            # A chunked request: the server ends the input at its end.
+            body = environ['wsgi.input'].read()
+            environ['CONTENT_LENGTH'] = str(len(body))
+        else:
+            body = b''
+        try:
+            claims = self.verifier.verify(environ.get('HTTP_AUTHORIZATION'),
+                    environ.get('REQUEST_METHOD'), path, body)
+        except WebhookError as e:
+            reply = json.dumps({
+                'code': 'Unauthorized',
+                'message': str(e),
+                }).encode('utf-8')
+            start_response('403 Forbidden', [
+                ('Content-Type', 'application/json'),
+                ('Content-Length', str(len(reply))),
+                ])
+            return [reply]
+
+        environ['badgekit.webhook'] = claims
+        environ['wsgi.input'] = io.BytesIO(body)
+        return self.app(environ, start_response)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""
+Time to walk a system's issuers, programs and badges, one listing after
+another, against :meth:`badgekit.BadgeKitAPI.crawl`, on a stand-in server
+that takes a few milliseconds per request.
+
+    python benchmarks/crawl_bench.py [issuers] [latency_ms]
+"""
+import sys
+import time
+
+from badgekit import BadgeKitAPI
+from badgekit.testing import StandInServer
+
+
+def sequential(bk):
+    found = 0
+    for issuer in bk.list('issuer', system='sys')['issuers']:
+        found += 1
+        programs = bk.list('program', system='sys',
+                issuer=issuer['slug'])['programs']
+        for program in programs:
+            found += 1
+            found += len(bk.list('badge', system='sys', issuer=issuer['slug'],
+                program=program['slug'])['badges'])
+    return found
+
+
+def main(issuers=20, latency_ms=5):
+    with StandInServer(latency=latency_ms / 1000.0) as server:
+        server.populate('system', [{'slug': 'sys'}])
+        server.populate('issuer', [{'slug': 'iss%d' % i}
+            for i in range(issuers)], system='sys')
+        for i in range(issuers):
+            server.populate('program', [{'slug': 'prog%d' % j}
+                for j in range(5)], system='sys', issuer='iss%d' % i)
+            for j in range(5):
+                server.populate('badge', [{'slug': 'b%d' % k}
+                    for k in range(10)], system='sys', issuer='iss%d' % i,
+                    program='prog%d' % j)
+
+        with BadgeKitAPI(server.url, 'secret', pool_maxsize=16) as bk:
+            for label, func in [
+                    ('sequential', lambda: sequential(bk)),
+                    ('crawl, 16 workers',
+                        lambda: len(list(bk.crawl(system='sys',
+                            max_workers=16)))),
+                    ]:
+                start = time.time()
+                found = func()
+                print('%-20s %6d objects in %6.3fs' % (label, found,
+                    time.time() - start))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
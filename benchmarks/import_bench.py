@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""
+Cold-start cost of the client: the time a fresh interpreter takes to
+``import badgekit``, and then to build a :class:`badgekit.BadgeKitAPI`,
+beyond starting up at all.  Each figure is the median of several runs,
+each in a new process.
+
+    python benchmarks/import_bench.py [runs]
+"""
+import subprocess
+import sys
+import time
+
+
+programs = [
+        ('start python', 'pass'),
+        ('import badgekit', 'import badgekit'),
+        ('build a client', "import badgekit; "
+            "badgekit.BadgeKitAPI('http://api.example.com/', 'secret')"),
+        ]
+
+
+def median_time(code, runs):
+    times = []
+    for i in range(runs):
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', code])
+        times.append(time.time() - start)
+    times.sort()
+    return times[len(times) // 2]
+
+
+def main(runs=15):
+    # Once first, so compiled bytecode is in place.
+    for label, code in programs:
+        subprocess.check_call([sys.executable, '-c', code])
+
+    baseline = None
+    for label, code in programs:
+        t = median_time(code, runs)
+        if baseline is None:
+            baseline = t
+            print('%-16s %8.1f ms' % (label, t * 1000))
+        else:
+            # Medians of separate runs: a step cheaper than the noise
+            # between runs can come out below the baseline.
+            more = (t - baseline) * 1000
+            if more <= 0:
+                print('%-16s %8.1f ms more (within noise)' % (label, 0.0))
+            else:
+                print('%-16s %8.1f ms more' % (label, more))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
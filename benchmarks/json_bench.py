@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+Decoding time for realistic BadgeKit API list responses, comparing the old
+``resp.text`` + :func:`json.loads` path with decoding straight from bytes
+with each available backend.
+
+    python benchmarks/json_bench.py [items]
+"""
+import json
+import sys
+import timeit
+
+import requests
+
+
+def badge(i):
+    return {
+            'id': i,
+            'slug': 'badge-%d' % i,
+            'name': 'Stupendous Badge %d' % i,
+            'strapline': 'For being stupendous, repeatedly',
+            'earnerDescription': 'Awarded to learners who ' * 8,
+            'consumerDescription': 'This learner has shown ' * 8,
+            'issuerUrl': 'http://issuer.example.org/',
+            'rubricUrl': None,
+            'timeValue': 10,
+            'timeUnits': 'hours',
+            'limit': None,
+            'unique': True,
+            'created': '2014-05-27T15:08:24.000Z',
+            'imageUrl': 'http://api.example.org/images/%d' % i,
+            'type': 'Skill',
+            'archived': False,
+            'criteriaUrl': 'http://issuer.example.org/criteria/%d' % i,
+            'criteria': [{'id': j, 'description': 'Did thing %d' % j,
+                'required': True, 'note': ''} for j in range(3)],
+            'categories': [],
+            'tags': ['science', 'community'],
+            }
+
+
+def instance(i):
+    return {
+            'slug': 'f00dcafe%08d' % i,
+            'email': 'learner%d@example.org' % i,
+            'expires': None,
+            'issuedOn': '2014-06-02T10:00:00.000Z',
+            'claimCode': None,
+            'assertionUrl': 'http://api.example.org/public/assertions/%d' % i,
+            'badge': badge(i % 20),
+            }
+
+
+def response(body):
+    resp = requests.models.Response()
+    resp._content = body
+    resp.encoding = None
+    resp.headers['Content-Type'] = 'application/json'
+    return resp
+
+
+def backends():
+    yield 'json', json.loads
+    for name in ('ujson', 'orjson'):
+        try:
+            yield name, __import__(name).loads
+        except ImportError:
+            pass
+
+
+def main(items=2000):
+    for label, payload in [
+            ('badges', {'badges': [badge(i) for i in range(items)]}),
+            ('instances', {'instances': [instance(i) for i in range(items)]}),
+            ]:
+        body = json.dumps(payload).encode('utf-8')
+        print('%s: %d items, %d bytes' % (label, items, len(body)))
+
+        def old():
+            return json.loads(response(body).text)
+        runs = 10
+        print('  %-18s %8.2f ms' % ('text + json',
+            timeit.timeit(old, number=runs) * 1000 / runs))
+        for name, loads in backends():
+            t = timeit.timeit(lambda: loads(response(body).content), number=runs)
+            print('  %-18s %8.2f ms' % ('bytes + ' + name, t * 1000 / runs))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"""
+Cost per call of working out a request path: merging defaults and calling
+``_make_path``, as ``BadgeKitAPI.list`` does, against reusing a bound
+:class:`badgekit.resources.Resource`.
+
+    python benchmarks/path_bench.py [calls]
+"""
+import sys
+import timeit
+
+from badgekit import BadgeKitAPI
+from badgekit.api import _api_plural, _make_path
+
+
+def main(calls=200000):
+    bk = BadgeKitAPI('http://api.example.com/', 'secret',
+            defaults={'system': 'mysystem'})
+    location = dict(issuer='myissuer', program='myprogram', badge='mybadge')
+    badge = bk.system('mysystem').issuer('myissuer').program(
+            'myprogram').badge('mybadge')
+
+    def per_call():
+        path_args = dict(bk.defaults, **location)
+        return _make_path(_api_plural('instance'), **path_args)
+
+    def bound():
+        return badge._join(_api_plural('instance')) + badge._query({})
+
+    def build_handle():
+        return bk.system('mysystem').issuer('myissuer').program(
+                'myprogram').badge('mybadge')
+
+    assert per_call() == bound()
+    for label, func in [
+            ('dict + _make_path', per_call),
+            ('bound resource', bound),
+            ('build handle chain', build_handle),
+            ]:
+        t = timeit.timeit(func, number=calls)
+        print('%-20s %8.3f us/call' % (label, t * 1e6 / calls))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+"""
+Calls per second against a local stand-in server, with and without
+connection pooling.
+
+The "unpooled" run calls :func:`requests.get` directly, the way older
+versions of :class:`badgekit.BadgeKitAPI` did, so every call opens a new
+connection.  The "pooled" run goes through the client's session.
+
+    python benchmarks/pool_bench.py [calls]
+"""
+import sys
+import time
+
+import requests
+
+from badgekit import BadgeKitAPI
+from badgekit.testing import StandInServer
+
+
+def bench(label, func, calls):
+    func()
+    start = time.time()
+    for _ in range(calls):
+        func()
+    elapsed = time.time() - start
+    print('%-10s %8.1f calls/s' % (label, calls / elapsed))
+
+
+def main(calls=500):
+    with StandInServer() as server:
+        with BadgeKitAPI(server.url, 'secret') as bk:
+            bk.create('system', {'slug': 'sys', 'name': 'System'})
+            url = server.url + 'systems/sys'
+
+            bench('unpooled',
+                    lambda: requests.get(url, auth=bk.auth).json(),
+                    calls)
+            bench('pooled', lambda: bk.get(system='sys'), calls)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+"""
+Memory held by decoded instances as dicts and as :mod:`badgekit.records`.
+
+Each instance is decoded from its own JSON text, as it would be when
+coming from the server, and the decoded objects are kept alive while
+:mod:`tracemalloc` measures them.
+
+    python benchmarks/records_bench.py [instances]
+"""
+import gc
+import json
+import sys
+import tracemalloc
+
+from badgekit import records
+
+
+def instance_json(i):
+    return json.dumps({
+            'slug': 'f00dcafe%08d' % i,
+            'email': 'learner%d@example.org' % i,
+            'expires': None,
+            'issuedOn': '2014-06-02T10:00:00.000Z',
+            'claimCode': None,
+            'assertionUrl': 'http://api.example.org/public/assertions/%d' % i,
+            'badge': {'slug': 'badge-%d' % (i % 20), 'name': 'Badge'},
+            })
+
+
+def measure(label, build, texts):
+    gc.collect()
+    tracemalloc.start()
+    kept = build(texts)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('%-8s %8.1f MB held, %8.1f MB peak, %6.0f bytes/instance' % (
+        label, current / 1e6, peak / 1e6, float(current) / len(kept)))
+    return kept
+
+
+def main(count=100000):
+    texts = [instance_json(i) for i in range(count)]
+    measure('dicts', lambda texts: [json.loads(t) for t in texts], texts)
+    measure('records',
+            lambda texts: [records.Instance(json.loads(t)) for t in texts],
+            texts)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
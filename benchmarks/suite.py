@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+"""
+Benchmark suite for the BadgeKit API client.
+
+Starts a local :class:`badgekit.testing.StandInServer` (checking JWTs, with
+optional added latency), fills it with realistic badges and instances, and
+measures throughput and latency percentiles of ``list``, ``get`` and
+``create``, and of the client-side work they do: building paths with
+``_make_path``, signing JWTs and decoding JSON with ``_json_loads``.
+
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --compare results.json
+
+Results are saved as JSON, so runs on different versions can be compared
+with ``--compare``.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import requests
+
+from badgekit import BadgeKitAPI
+from badgekit.api import _api_plural, _make_path
+from badgekit.testing import StandInServer
+from badgekit.version import __version__
+
+# The shared fixtures live next to this script, wherever it is run from.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from json_bench import badge, instance
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100.0))
+    return ordered[index]
+
+
+def measure(func, seconds, min_calls=10):
+    """
+    Calls ``func`` repeatedly for about ``seconds``, and returns the rate
+    and latency percentiles of the calls.
+    """
+    func()
+    latencies = []
+    deadline = time.time() + seconds
+    start = time.time()
+    while time.time() < deadline or len(latencies) < min_calls:
+        call_start = time.time()
+        func()
+        latencies.append(time.time() - call_start)
+    elapsed = time.time() - start
+
+    latencies.sort()
+    return {
+            'calls': len(latencies),
+            'ops_per_second': len(latencies) / elapsed,
+            'mean_ms': 1000 * sum(latencies) / len(latencies),
+            'p50_ms': 1000 * percentile(latencies, 50),
+            'p90_ms': 1000 * percentile(latencies, 90),
+            'p99_ms': 1000 * percentile(latencies, 99),
+            }
+
+
+def run(args):
+    results = {}
+
+    def record(name, result):
+        results[name] = result
+        print('%-14s %10.1f ops/s  p50 %8.3f ms  p90 %8.3f ms  p99 %8.3f ms'
+                % (name, result['ops_per_second'], result['p50_ms'],
+                    result['p90_ms'], result['p99_ms']))
+
+    location = dict(system='sys', issuer='iss', program='prog',
+            badge='badge-0')
+    record('make_path', measure(
+        lambda: _make_path(_api_plural('instance'), **location), args.seconds))
+
+    bk = BadgeKitAPI('http://api.example.org/', 'secret')
+    prepared = requests.Request('POST', 'http://api.example.org/systems/sys/badges',
+            data={'slug': 'b', 'name': 'B'}).prepare()
+    record('jwt_sign', measure(lambda: bk.auth(prepared), args.seconds))
+
+    listing = json.dumps({'instances': [instance(i)
+        for i in range(args.items)]}).encode('utf-8')
+    record('json_loads', measure(lambda: bk._json_loads(listing), args.seconds))
+
+    with StandInServer(secret='secret', latency=args.latency) as server:
+        server.populate('system', [{'slug': 'sys'}])
+        server.populate('badge', [badge(i) for i in range(args.items)],
+                system='sys')
+        server.populate('instance', [instance(i) for i in range(args.items)],
+                system='sys', badge='badge-0')
+
+        with BadgeKitAPI(server.url, 'secret') as bk:
+            record('get', measure(
+                lambda: bk.get(system='sys', badge='badge-0'), args.seconds))
+            record('list', measure(
+                lambda: bk.list('instance', system='sys', badge='badge-0'),
+                args.seconds))
+
+            counter = iter(range(10 ** 9))
+            record('create', measure(
+                lambda: bk.create('instance',
+                    {'slug': 'new-%d' % next(counter),
+                        'email': 'learner@example.org'},
+                    system='sys', badge='badge-1'),
+                args.seconds))
+
+    return {
+            'meta': {
+                'badgekit_version': __version__,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'params': vars(args),
+                },
+            'results': results,
+            }
+
+
+def compare(current, baseline):
+    print('\n%-14s %12s %12s %8s' % ('', 'baseline', 'current', 'ratio'))
+    for name, result in sorted(current['results'].items()):
+        old = baseline['results'].get(name)
+        if old is None:
+            continue
+        print('%-14s %12.1f %12.1f %7.2fx' % (name, old['ops_per_second'],
+            result['ops_per_second'],
+            result['ops_per_second'] / old['ops_per_second']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--seconds', type=float, default=1.0,
+            help='time to spend on each benchmark')
+    parser.add_argument('--items', type=int, default=500,
+            help='objects in the listings that are fetched and decoded')
+    parser.add_argument('--latency', type=float, default=0.0,
+            help='seconds the stand-in server waits before answering')
+    parser.add_argument('--output', help='save the results to this JSON file')
+    parser.add_argument('--compare', help='compare with results saved earlier')
+    args = parser.parse_args(argv)
+
+    output, baseline = args.output, args.compare
+    del args.output, args.compare
+    current = run(args)
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+    if baseline:
+        with open(baseline) as f:
+            compare(current, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
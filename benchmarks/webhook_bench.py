@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Webhook JWT verifications per second on one core, comparing
+:class:`badgekit.webhook.WebhookVerifier` with checking each token by hand
+with :func:`jwt.decode` and :mod:`hashlib`, as the stand-in server does.
+With a number of processes, also runs that many verifiers side by side.
+
+    PYTHONPATH=. python benchmarks/webhook_bench.py [tokens] [processes]
+"""
+import hashlib
+import json
+import multiprocessing
+import sys
+import time
+
+import jwt
+import requests
+
+from badgekit.api import _make_auth
+from badgekit.webhook import WebhookVerifier
+
+
+secrets = dict(('key-%d' % i, 'secret-%d' % i) for i in range(10))
+
+
+def calls(tokens):
+    result = []
+    for i in range(tokens):
+        key = 'key-%d' % (i % 10)
+        body = json.dumps({'action': 'award', 'email': 'user%d@example.org' % i,
+            'badge': 'stupendous-badge'})
+        request = requests.Request('POST', 'http://hooks.example.org/award',
+                data=body).prepare()
+        _make_auth(secrets[key], key)(request)
+        result.append((request.headers['Authorization'], 'POST',
+            '/award', body.encode('utf-8')))
+    return result
+
+
+def by_hand(authorization, method, path, body):
+    token = authorization[authorization.find('"') + 1:].rstrip('"')
+    key = jwt.decode(token, verify=False)['key']
+    claim = jwt.decode(token, secrets[key], algorithms=['HS256'])
+    return (claim['path'] == path and claim['method'] == method and
+            claim['body']['hash'] == hashlib.sha256(body).hexdigest())
+
+
+def rate(check, batch):
+    start = time.time()
+    check(batch)
+    return len(batch) / (time.time() - start)
+
+
+def verifier_rate(batch):
+    verifier = WebhookVerifier(secrets)
+    return rate(lambda b: verifier.verify_many(b), batch)
+
+
+def main(tokens=20000, processes=0):
+    batch = calls(tokens)
+    print('%d tokens, %d keys' % (tokens, len(secrets)))
+    print('  %-22s %10.0f /s' % ('jwt.decode by hand',
+        rate(lambda b: [by_hand(*call) for call in b], batch)))
+    verifier = WebhookVerifier(secrets)
+    print('  %-22s %10.0f /s' % ('verify',
+        rate(lambda b: [verifier.verify(*call) for call in b], batch)))
+    print('  %-22s %10.0f /s' % ('verify_many', verifier_rate(batch)))
+    if processes:
+        chunk = len(batch) // processes
+        pool = multiprocessing.Pool(processes)
+        rates = pool.map(verifier_rate,
+                [batch[i * chunk:(i + 1) * chunk] for i in range(processes)])
+        pool.close()
+        print('  %-22s %10.0f /s, %.0f /s per process' % (
+            'verify_many x %d' % processes, sum(rates),
+            sum(rates) / processes))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -24,7 +24,17 @@ setup(
         'requests',
         'requests-jwt>=0.3',
         'setuptools',
+        'futures; python_version < "3"',
         ],
+    extras_require={
+        'async': ['aiohttp'],
+        'fast-json': ['orjson'],
+        },
+    entry_points={
+        'console_scripts': [
+            'badgekit-loadgen = badgekit.loadgen:main',
+            ],
+        },
     tests_require=[
         'httpretty',
         ],
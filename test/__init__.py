@@ -6,6 +6,62 @@ import unittest
 all_modules = []
 from . import api_test
 all_modules.append(api_test)
+from . import bulk_test
+all_modules.append(bulk_test)
+from . import cache_test
+all_modules.append(cache_test)
+from . import jsonstream_test
+all_modules.append(jsonstream_test)
+from . import records_test
+all_modules.append(records_test)
+from . import resources_test
+all_modules.append(resources_test)
+from . import hedge_test
+all_modules.append(hedge_test)
+from . import singleflight_test
+all_modules.append(singleflight_test)
+from . import metrics_test
+all_modules.append(metrics_test)
+from . import testing_test
+all_modules.append(testing_test)
+from . import loadgen_test
+all_modules.append(loadgen_test)
+from . import mirror_test
+all_modules.append(mirror_test)
+from . import crawl_test
+all_modules.append(crawl_test)
+from . import snapshot_test
+all_modules.append(snapshot_test)
+from . import verify_test
+all_modules.append(verify_test)
+from . import import_test
+all_modules.append(import_test)
+from . import handshake_test
+all_modules.append(handshake_test)
+from . import balance_test
+all_modules.append(balance_test)
+from . import limiter_test
+all_modules.append(limiter_test)
+from . import outbox_test
+all_modules.append(outbox_test)
+from . import webhook_test
+all_modules.append(webhook_test)
+from . import upload_test
+all_modules.append(upload_test)
+try:
+    from . import aio_test
+except (ImportError, SyntaxError):
+    # asyncio support needs Python 3 and aiohttp
+    pass
+else:
+    all_modules.append(aio_test)
+try:
+    from . import asgi_test
+except SyntaxError:
+    # ASGI support needs Python 3
+    pass
+else:
+    all_modules.append(asgi_test)
 
 
 def suite():
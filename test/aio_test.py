@@ -0,0 +1,127 @@
+from __future__ import unicode_literals
+import asyncio
+import unittest
+import jwt
+
+import badgekit
+from badgekit.aio import AsyncBadgeKitAPI, _forwarded_headers
+from badgekit.testing import StandInServer
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class AsyncBKAPITest(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer(version='0.2.9')
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_create_list_get(self):
+        async def go():
+            async with AsyncBadgeKitAPI(self.server.url, 'asdf') as a:
+                await a.create('system', dict(slug='sys', name='Sys'))
+                await a.create('badge', dict(slug='b', name='B'), system='sys')
+                return (await a.list('badge', system='sys'),
+                        await a.get(system='sys', badge='b'))
+
+        badges, badge = run(go())
+        self.assertEqual([b['slug'] for b in badges['badges']], ['b'])
+        self.assertEqual(badge['badge']['name'], 'B')
+
+    def test_errors(self):
+        async def go():
+            async with AsyncBadgeKitAPI(self.server.url, 'asdf',
+                    defaults={'system': 'sys'}) as a:
+                await a.create('system', dict(slug='sys'), system=None)
+                with self.assertRaises(badgekit.ResourceConflict):
+                    await a.create('system', dict(slug='sys'), system=None)
+                with self.assertRaises(badgekit.ResourceNotFound):
+                    await a.get(badge='nope')
+
+        run(go())
+
+    def test_server_version(self):
+        async def go():
+            async with AsyncBadgeKitAPI(self.server.url, 'asdf') as a:
+                self.assertTrue(await a.ping())
+                self.assertEqual(await a.server_version(), '0.2.9')
+                await a.require_server_version('0.2.2')
+                with self.assertRaises(ValueError):
+                    await a.require_server_version('0.3.0')
+
+        run(go())
+
+    def test_bounded_concurrency(self):
+        self.server.httpd.latency = 0.01
+        in_flight = {'now': 0, 'peak': 0}
+
+        class Counted(object):
+            def __init__(self, context):
+                self.context = context
+
+            async def __aenter__(self):
+                in_flight['now'] += 1
+                in_flight['peak'] = max(in_flight['peak'], in_flight['now'])
+                return await self.context.__aenter__()
+
+            async def __aexit__(self, *exc_info):
+                in_flight['now'] -= 1
+                return await self.context.__aexit__(*exc_info)
+
+        async def go():
+            async with AsyncBadgeKitAPI(self.server.url, 'asdf',
+                    max_concurrency=5) as a:
+                session = a._get_session()
+                request = session.request
+                session.request = lambda *args, **kwargs: Counted(
+                        request(*args, **kwargs))
+                await a.create('system', dict(slug='sys'))
+                results = await asyncio.gather(
+                        *[a.get(system='sys') for _ in range(50)])
+                self.assertEqual(len(results), 50)
+
+        run(go())
+        self.assertEqual(in_flight['peak'], 5)
+
+    def test_signed_when_sent(self):
+        signed = []
+
+        async def go():
+            async with AsyncBadgeKitAPI(self.server.url, 'asdf',
+                    max_concurrency=1) as a:
+                sign = a._sign
+
+                def record(*args, **kwargs):
+                    signed.append(a._semaphore.locked())
+                    return sign(*args, **kwargs)
+                a._sign = record
+                await asyncio.gather(*[a.ping() for _ in range(3)])
+
+        run(go())
+        self.assertEqual(signed, [True, True, True])
+
+    def test_claims(self):
+        a = AsyncBadgeKitAPI('http://example.com/', 's3cr3t', key='k')
+        request = a._sign('POST', 'http://example.com/systems',
+                dict(slug='sys'))
+        auth_hdr = request.headers['Authorization']
+        claim = jwt.decode(auth_hdr[auth_hdr.find('"'):].strip('"'), 's3cr3t')
+        self.assertEqual(claim['key'], 'k')
+        self.assertEqual(claim['path'], '/systems')
+        self.assertEqual(claim['method'], 'POST')
+        self.assertEqual(claim['body']['alg'], 'sha256')
+
+    def test_forwarded_headers(self):
+        a = AsyncBadgeKitAPI('http://example.com/', 's3cr3t')
+        headers = _forwarded_headers(a._sign('POST',
+            'http://example.com/systems', dict(slug='sys')))
+        self.assertEqual(sorted(headers), ['Authorization', 'Content-Type'])
+        self.assertEqual(headers['Content-Type'],
+                'application/x-www-form-urlencoded')
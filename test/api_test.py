@@ -3,6 +3,7 @@ import httpretty
 import requests
 import re
 import unittest
+import sys
 import badgekit
 from badgekit import api
 import jwt
@@ -213,3 +214,163 @@ class DefaultsTest(unittest.TestCase):
 
         req = httpretty.last_request()
         self.assertEqual(req.path, '/systems')
+
+
+class SessionTest(unittest.TestCase):
+    @httpretty.activate
+    def test_session_reused(self):
+        session = RecordingSession()
+        a = badgekit.BadgeKitAPI('http://example.com/', 'asdf', session=session)
+
+        httpretty.register_uri(httpretty.GET,
+                re.compile('example.com/.*'),
+                body='{"app":"BadgeKit API","version":"0.2.9"}')
+
+        a.ping()
+        a.list('badge', system='badgekit')
+        a.get(system='badgekit')
+        a.get_public_url('http://example.com/public/assertions/1')
+        self.assertEqual(session.methods, ['GET'] * 4)
+
+    def test_pool_size(self):
+        a = badgekit.BadgeKitAPI('http://example.com/', 'asdf', pool_maxsize=4)
+        adapter = a.session.get_adapter('http://example.com/')
+        self.assertEqual(adapter._pool_maxsize, 4)
+
+    def test_context_manager_closes_own_session(self):
+        with badgekit.BadgeKitAPI('http://example.com/', 'asdf') as a:
+            a.session = RecordingSession()
+        self.assertTrue(a.session.closed)
+
+    def test_supplied_session_left_open(self):
+        session = RecordingSession()
+        with badgekit.BadgeKitAPI('http://example.com/', 'asdf',
+                session=session):
+            pass
+        self.assertFalse(session.closed)
+
+
+class RecordingSession(requests.Session):
+    def __init__(self):
+        super(RecordingSession, self).__init__()
+        self.methods = []
+        self.closed = False
+
+    def request(self, method, url, **kwargs):
+        self.methods.append(method)
+        return super(RecordingSession, self).request(method, url, **kwargs)
+
+    def close(self):
+        self.closed = True
+        super(RecordingSession, self).close()
+
+
+class PaginationTest(unittest.TestCase):
+    def test_query(self):
+        self.assertEqual(
+                api._make_path('badges', system='jkl', page=2, count=10),
+                'systems/jkl/badges?page=2&count=10')
+
+    def test_iter_all(self):
+        from badgekit.testing import StandInServer
+        with StandInServer() as server:
+            with badgekit.BadgeKitAPI(server.url, 'asdf') as a:
+                a.create('system', dict(slug='sys'))
+                for i in range(25):
+                    a.create('badge', dict(slug='b%d' % i), system='sys')
+
+                for prefetch in (True, False):
+                    pages = list(a.iter_pages('badge', count=10,
+                        prefetch=prefetch, system='sys'))
+                    self.assertEqual([p['pageData']['page'] for p in pages],
+                            [1, 2, 3])
+
+                    slugs = [b['slug'] for b in a.iter_all('badge', count=10,
+                        prefetch=prefetch, system='sys')]
+                    self.assertEqual(slugs, ['b%d' % i for i in range(25)])
+
+    @httpretty.activate
+    def test_without_total(self):
+        a = badgekit.BadgeKitAPI('http://example.com', 'asdf')
+        httpretty.register_uri(httpretty.GET,
+                re.compile('example.com/.*'),
+                responses=[
+                    httpretty.Response(body='{"badges": [1, 2]}'),
+                    httpretty.Response(body='{"badges": [3]}'),
+                    ])
+
+        self.assertEqual(list(a.iter_all('badge', count=2, system='s')),
+                [1, 2, 3])
+        self.assertEqual(httpretty.last_request().querystring,
+                {'page': ['2'], 'count': ['2']})
+
+
+    @httpretty.activate
+    def test_paging_ignored(self):
+        a = badgekit.BadgeKitAPI('http://example.com', 'asdf')
+        for body in ['{"badges": [1, 2, 3]}', '{"badges": [1, 2]}',
+                '{"badges": [1, 2], "pageData": {"page": 1, "count": 2}}']:
+            httpretty.reset()
+            httpretty.register_uri(httpretty.GET,
+                    re.compile('example.com/.*'), body=body)
+            for prefetch in (True, False):
+                self.assertEqual(len(list(a.iter_pages('badge', count=2,
+                    prefetch=prefetch, system='s'))), 1)
+
+    @httpretty.activate
+    def test_page_in_defaults(self):
+        a = badgekit.BadgeKitAPI('http://example.com', 'asdf',
+                defaults={'system': 's', 'page': 2})
+        httpretty.register_uri(httpretty.GET,
+                re.compile('example.com/.*'), body='{"badges": [3]}')
+        self.assertEqual(list(a.iter_all('badge', count=2)), [3])
+        self.assertEqual(httpretty.last_request().querystring,
+                {'page': ['2'], 'count': ['2']})
+
+
+class JsonDecoderTest(unittest.TestCase):
+    @httpretty.activate
+    def test_custom_decoder(self):
+        seen = []
+
+        def loads(content):
+            seen.append(content)
+            return json.loads(content.decode('utf-8'))
+
+        a = badgekit.BadgeKitAPI('http://example.com', 'asdf', json_loads=loads)
+        httpretty.register_uri(httpretty.GET,
+                re.compile('example.com/.*'),
+                body='{"badges": ["caf\\u00e9"]}')
+
+        self.assertEqual(a.list('badge', system='s'), {'badges': ['caf\xe9']})
+        self.assertTrue(isinstance(seen[0], bytes))
+
+    def test_default_decoder(self):
+        loads = api.default_json_loads()
+        self.assertEqual(loads(b'{"a": [1, "\\u00e9"]}'), {'a': [1, '\xe9']})
+        with self.assertRaises(ValueError):
+            loads(b'{invalid json')
+
+    def test_stdlib_decoder(self):
+        # As on a plain install, without orjson or ujson.
+        hidden = dict((name, sys.modules.get(name)) for name in
+                ('orjson', 'ujson'))
+        try:
+            for name in hidden:
+                sys.modules[name] = None
+            loads = api.default_json_loads()
+        finally:
+            for name, module in hidden.items():
+                if module is None:
+                    del sys.modules[name]
+                else:
+                    sys.modules[name] = module
+        self.assertIs(loads, api._stdlib_json_loads)
+        self.assertEqual(loads(b'{"a": [1, "caf\xc3\xa9"]}'),
+                {'a': [1, 'caf\xe9']})
+        with self.assertRaises(ValueError):
+            loads(b'\xff{')
+
+        a = badgekit.BadgeKitAPI('http://example.com', 'asdf', json_loads=loads)
+        self.assertEqual(a._json_loads(b'{"ok": true}'), {'ok': True})
+        self.assertRaises(badgekit.APIError, a._json_loads, b'{invalid json')
@@ -0,0 +1,77 @@
+from __future__ import unicode_literals
+import asyncio
+import json
+import unittest
+from urllib.parse import unquote_to_bytes
+
+from badgekit.asgi import WebhookMiddleware
+from badgekit.webhook import WebhookVerifier
+from .webhook_test import sign
+
+
+async def echo(scope, receive, send):
+    message = await receive()
+    claims = scope.get('badgekit.webhook') or {}
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body',
+        'body': message['body'] + b' ' + claims.get('key', 'none').encode()})
+
+
+class ASGIWebhookMiddlewareTest(unittest.TestCase):
+    def call(self, app, request, path=None, raw=False):
+        body = request.body.encode('utf-8')
+        target = path or request.path_url
+        path, _, query = target.partition('?')
+        scope = {
+                'type': 'http',
+                'method': request.method,
+                'path': unquote_to_bytes(path).decode('utf-8'),
+                'query_string': query.encode('latin-1'),
+                'headers': [(b'authorization',
+                    request.headers['Authorization'].encode('latin-1'))],
+                }
+        if raw:
+            scope['raw_path'] = path.encode('latin-1')
+        chunks = [body[:1], body[1:]]
+        sent = []
+
+        async def receive():
+            chunk = chunks.pop(0)
+            return {'type': 'http.request', 'body': chunk,
+                    'more_body': bool(chunks)}
+
+        async def send(message):
+            sent.append(message)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(app(scope, receive, send))
+        finally:
+            loop.close()
+        return sent[0]['status'], sent[1]['body']
+
+    def test_asgi(self):
+        app = WebhookMiddleware(echo, WebhookVerifier('s3cret'))
+        request = sign('POST', 'http://example.com/hooks/award', 'a=1')
+        self.assertEqual(self.call(app, request), (200, b'a=1 master'))
+
+        status, body = self.call(app, request, path='/hooks/claim')
+        self.assertEqual(status, 403)
+        self.assertEqual(json.loads(body.decode('utf-8'))['code'],
+                'Unauthorized')
+
+    def test_encoded_path(self):
+        app = WebhookMiddleware(echo, WebhookVerifier('s3cret'))
+        request = sign('POST', 'http://example.com/hooks/my badge?to=a%20b',
+                'a=1')
+        self.assertEqual(self.call(app, request), (200, b'a=1 master'))
+        self.assertEqual(self.call(app, request, raw=True),
+                (200, b'a=1 master'))
+
+        request = sign('POST', 'http://example.com/hooks/a%2Fb', 'a=1')
+        self.assertEqual(self.call(app, request, raw=True),
+                (200, b'a=1 master'))
+
+
+if __name__ == '__main__':
+    unittest.main()
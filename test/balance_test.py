@@ -0,0 +1,166 @@
+from __future__ import unicode_literals
+import socket
+import threading
+import time
+import unittest
+
+import requests
+
+import badgekit
+from badgekit.balance import ReplicaSet
+from badgekit.testing import StandInServer
+
+
+def free_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class ReplicaSetTest(unittest.TestCase):
+    def start(self, **kwargs):
+        server = StandInServer(secret='s3cret', **kwargs)
+        self.addCleanup(server.close)
+        server.populate('system', [{'slug': 'sys'}])
+        return server
+
+    def client(self, baseurl):
+        api = badgekit.BadgeKitAPI(baseurl, 's3cret')
+        self.addCleanup(api.close)
+        return api
+
+    def gets(self, server):
+        return server.hits.get(('GET', '/systems/sys'), 0)
+
+    def test_spread(self):
+        servers = [self.start() for i in range(3)]
+        api = self.client([server.url for server in servers])
+        self.assertEqual(api.baseurl, servers[0].url)
+        for i in range(60):
+            self.assertEqual(api.get(system='sys')['system']['slug'], 'sys')
+        for server in servers:
+            self.assertGreater(self.gets(server), 5)
+
+    def test_latency_weighted(self):
+        slow, fast = self.start(latency=0.05), self.start()
+        replicas = ReplicaSet([slow.url, fast.url], strategy='latency')
+        api = self.client(replicas)
+        for i in range(60):
+            api.get(system='sys')
+        self.assertGreater(self.gets(fast), 3 * self.gets(slow))
+        stats = replicas.stats()
+        self.assertGreater(stats[0]['latency'], stats[1]['latency'])
+
+    def test_failover_and_recovery(self):
+        port = free_port()
+        live = self.start()
+        replicas = ReplicaSet(['http://127.0.0.1:%d/' % port, live.url],
+                max_failures=2, check_interval=0.05)
+        self.addCleanup(replicas.close)
+        api = self.client(replicas)
+
+        for i in range(10):
+            api.get(system='sys')
+        down = replicas.stats()[0]
+        self.assertFalse(down['healthy'])
+        self.assertEqual(down['failures'], 2)
+        self.assertEqual(self.gets(live), 10)
+
+        revived = self.start(port=port)
+        deadline = time.time() + 5
+        while not replicas.stats()[0]['healthy']:
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.05)
+        for i in range(20):
+            api.get(system='sys')
+        self.assertGreater(self.gets(revived), 0)
+
+    def test_down_as_checker_stops(self):
+        # A replica that goes down just as the health checker decides to
+        # stop, while its thread is still alive, must get a checker too.
+        stopped, linger = threading.Event(), threading.Event()
+        self.addCleanup(linger.set)
+
+        class Lingering(ReplicaSet):
+            def _check_until_healthy(self):
+                ReplicaSet._check_until_healthy(self)
+                if not stopped.is_set():
+                    stopped.set()
+                    linger.wait(5)
+
+        port = free_port()
+        replicas = Lingering(['http://127.0.0.1:%d/' % port,
+            self.start().url], max_failures=1, check_interval=0.05)
+        self.addCleanup(replicas.close)
+        api = self.client(replicas)
+        for i in range(4):
+            api.get(system='sys')
+        self.assertFalse(replicas.stats()[0]['healthy'])
+        self.start(port=port)
+        self.assertTrue(stopped.wait(5))
+        self.assertTrue(replicas.stats()[0]['healthy'])
+
+        with replicas._lock:
+            replicas.replicas[0].healthy = False
+            replicas._start_checker()
+        deadline = time.time() + 5
+        while not replicas.stats()[0]['healthy']:
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.05)
+
+    def test_streamed_until_closed(self):
+        server = self.start()
+        server.populate('badge', [{'slug': 'b%d' % i} for i in range(3)],
+                system='sys')
+        replicas = ReplicaSet([server.url, server.url])
+        api = self.client(replicas)
+        badges = api.iter_list('badge', system='sys')
+        next(badges)
+        self.assertEqual(sum(r['outstanding'] for r in replicas.stats()), 1)
+        badges.close()
+        self.assertEqual(sum(r['outstanding'] for r in replicas.stats()), 0)
+
+    def test_checked_at_base_url(self):
+        class Session(object):
+            urls = []
+
+            def get(self, url, timeout):
+                self.urls.append(url)
+                raise requests.ConnectionError(url)
+        replicas = ReplicaSet(['http://a.example.com/api/',
+            'http://b.example.com/v1/'])
+        self.addCleanup(replicas.close)
+        self.assertEqual(replicas.check(Session()), [])
+        self.assertEqual(Session.urls,
+                ['http://a.example.com/api/', 'http://b.example.com/v1/'])
+
+    def test_create_not_retried(self):
+        port = free_port()
+        replicas = ReplicaSet(['http://127.0.0.1:%d/' % port,
+            'http://127.0.0.1:%d/' % free_port()])
+        api = self.client(replicas)
+        self.assertRaises(requests.ConnectionError, api.create, 'system',
+                {'slug': 'new'})
+        self.assertEqual(sum(r['requests'] for r in replicas.stats()), 1)
+
+    def test_rebase(self):
+        replicas = ReplicaSet(['http://a.example.com/api/',
+            'https://b.example.com:8443/v1/'])
+        other = replicas.replicas[1]
+        self.assertEqual(replicas._rebase(
+            'http://a.example.com/api/systems/s', other),
+            'https://b.example.com:8443/v1/systems/s')
+        self.assertEqual(replicas._rebase('http://a.example.com/', other),
+                'https://b.example.com:8443/')
+        self.assertTrue(replicas.owns('http://a.example.com/api/systems'))
+        self.assertFalse(replicas.owns('http://c.example.com/public/1'))
+
+    def test_bad_strategy(self):
+        self.assertRaises(ValueError, ReplicaSet, ['http://a/'], 'fastest')
+        self.assertRaises(ValueError, ReplicaSet, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
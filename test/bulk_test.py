@@ -0,0 +1,59 @@
+from __future__ import unicode_literals
+import unittest
+
+import badgekit
+from badgekit.testing import StandInServer
+
+
+class CreateManyTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer()
+        self.api = badgekit.BadgeKitAPI(self.server.url, 'asdf',
+                defaults={'system': 'sys'})
+        self.api.create('system', dict(slug='sys'), system=None)
+
+    def tearDown(self):
+        self.api.close()
+        self.server.close()
+
+    def test_outcomes(self):
+        items = (dict(slug=slug) for slug in ['a', 'b', 'a', '', 'c'])
+        results = self.api.create_many('badge', items, max_in_flight=1)
+        outcomes = list(results)
+
+        self.assertEqual([o.index for o in outcomes], [0, 1, 2, 3, 4])
+        self.assertTrue(outcomes[0].ok)
+        self.assertEqual(outcomes[0].result['badge']['slug'], 'a')
+        self.assertTrue(isinstance(outcomes[2].error, badgekit.ResourceConflict))
+        self.assertTrue(isinstance(outcomes[3].error, badgekit.ValidationError))
+
+        self.assertEqual(results.stats['submitted'], 5)
+        self.assertEqual(results.stats['succeeded'], 3)
+        self.assertEqual(results.stats['failed'], 2)
+        self.assertEqual(results.stats['errors'],
+                {'ResourceConflict': 1, 'ValidationError': 1})
+
+    def test_ordered(self):
+        items = [dict(slug='badge-%d' % i) for i in range(40)]
+        results = self.api.create_many('badge', items, max_in_flight=8,
+                ordered=True)
+        self.assertEqual([o.index for o in results], list(range(40)))
+        self.assertEqual(len(self.api.list('badge')['badges']), 40)
+
+    def test_lazy_input(self):
+        pulled = []
+
+        def items():
+            for i in range(20):
+                pulled.append(i)
+                yield dict(slug='badge-%d' % i)
+
+        results = iter(self.api.create_many('badge', items(), max_in_flight=3))
+        next(results)
+        self.assertTrue(len(pulled) <= 4)
+        self.assertEqual(len(list(results)), 19)
+
+    def test_transport_error(self):
+        api = badgekit.BadgeKitAPI('http://127.0.0.1:1/', 'asdf')
+        outcomes = list(api.create_many('system', [dict(slug='s')]))
+        self.assertTrue(isinstance(outcomes[0].error, badgekit.RequestException))
@@ -0,0 +1,114 @@
+from __future__ import unicode_literals
+import httpretty
+import json
+import re
+import time
+import unittest
+
+import badgekit
+from badgekit.cache import ResponseCache
+
+
+BADGES = json.dumps({'badges': [{'slug': 'b'}]})
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def make_api(self, **cache_args):
+        self.cache = ResponseCache(**cache_args)
+        return badgekit.BadgeKitAPI('http://example.com/', 'asdf',
+                cache=self.cache)
+
+    @httpretty.activate
+    def test_hit(self):
+        a = self.make_api()
+        httpretty.register_uri(httpretty.GET,
+                re.compile('example.com/.*'), body=BADGES)
+
+        first = a.list('badge', system='sys')
+        first['badges'].append('mutated')
+        second = a.list('badge', system='sys')
+
+        self.assertEqual(second, json.loads(BADGES))
+        self.assertEqual(len(httpretty.latest_requests()), 1)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    @httpretty.activate
+    def test_query_params_in_key(self):
+        a = self.make_api()
+        httpretty.register_uri(httpretty.GET,
+                re.compile('example.com/.*'), body=BADGES)
+
+        a.list('badge', system='sys')
+        a.list('badge', system='sys', archived=True)
+        self.assertEqual(len(httpretty.latest_requests()), 2)
+
+    @httpretty.activate
+    def test_per_kind_ttl(self):
+        a = self.make_api(ttls={'badge': 0})
+        httpretty.register_uri(httpretty.GET,
+                re.compile('example.com/.*'), body=BADGES)
+
+        a.get(system='sys')
+        a.get(system='sys')
+        a.get(system='sys', badge='b')
+        a.get(system='sys', badge='b')
+        self.assertEqual(len(httpretty.latest_requests()), 3)
+
+    @httpretty.activate
+    def test_revalidation(self):
+        a = self.make_api(ttl=0.01)
+        httpretty.register_uri(httpretty.GET,
+                re.compile('example.com/.*'),
+                responses=[
+                    httpretty.Response(body=BADGES, etag='"v1"'),
+                    httpretty.Response(body='', status=304),
+                    ])
+
+        a.list('badge', system='sys')
+        time.sleep(0.02)
+        self.assertEqual(a.list('badge', system='sys'), json.loads(BADGES))
+
+        req = httpretty.last_request()
+        self.assertEqual(req.headers['If-None-Match'], '"v1"')
+        self.assertEqual(self.cache.stats()['revalidations'], 1)
+
+    @httpretty.activate
+    def test_expired_without_validators(self):
+        a = self.make_api(ttl=0.01)
+        httpretty.register_uri(httpretty.GET,
+                re.compile('example.com/.*'), body=BADGES)
+
+        a.list('badge', system='sys')
+        time.sleep(0.02)
+        a.list('badge', system='sys')
+
+        self.assertEqual(len(httpretty.latest_requests()), 2)
+        self.assertFalse('If-None-Match' in httpretty.last_request().headers)
+
+    @httpretty.activate
+    def test_create_invalidates(self):
+        a = self.make_api()
+        httpretty.register_uri(httpretty.GET,
+                re.compile('example.com/.*'), body=BADGES)
+        httpretty.register_uri(httpretty.POST,
+                re.compile('example.com/.*'), body='{}', status=201)
+
+        a.list('badge', system='sys')
+        a.list('badge', system='sys', archived=False)
+        a.get(system='sys')
+        a.create('badge', dict(slug='c'), system='sys')
+
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.stats()['invalidations'], 2)
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(maxsize=2)
+        cache.store('a', 'badge', 1)
+        cache.store('b', 'badge', 2)
+        cache.lookup('a')
+        cache.store('c', 'badge', 3)
+
+        self.assertEqual(cache.lookup('a'), (1, None))
+        self.assertEqual(cache.lookup('b'), (None, None))
+        self.assertEqual(cache.stats()['evictions'], 1)
@@ -0,0 +1,90 @@
+from __future__ import unicode_literals
+import unittest
+
+import badgekit
+from badgekit.testing import StandInServer
+
+
+class CrawlTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer(secret='s3cret')
+        self.addCleanup(self.server.close)
+        populate = self.server.populate
+        populate('system', [{'slug': 'sys'}])
+        populate('issuer', [{'slug': 'iss%d' % i} for i in range(3)],
+                system='sys')
+        for i in range(3):
+            issuer = 'iss%d' % i
+            populate('program', [{'slug': 'prog%d' % j} for j in range(2)],
+                    system='sys', issuer=issuer)
+            for j in range(2):
+                populate('badge', [{'slug': 'b%d' % k} for k in range(2)],
+                        system='sys', issuer=issuer, program='prog%d' % j)
+        populate('instance', [{'slug': 'inst', 'email': 'a@example.org'}],
+                system='sys', issuer='iss0', program='prog0', badge='b0')
+
+        self.api = badgekit.BadgeKitAPI(self.server.url, 's3cret')
+        self.addCleanup(self.api.close)
+
+    def kinds(self, nodes):
+        counts = {}
+        for node in nodes:
+            counts[node.kind] = counts.get(node.kind, 0) + 1
+        return counts
+
+    def test_full_crawl(self):
+        crawl = self.api.crawl(system='sys', max_workers=4)
+        nodes = list(crawl)
+        self.assertEqual(self.kinds(nodes),
+                {'issuer': 3, 'program': 6, 'badge': 12})
+        badge = [node for node in nodes if node.kind == 'badge'][0]
+        self.assertEqual(sorted(badge.location),
+                ['badge', 'issuer', 'program', 'system'])
+        self.assertEqual(badge.depth, 3)
+        self.assertEqual(crawl.stats['listings'], 1 + 3 + 6)
+        self.assertEqual(crawl.stats['objects'], 21)
+
+        # Results come as listings complete, not strictly level by level,
+        # but no object comes before the parent it was listed under.
+        seen = set()
+        for node in nodes:
+            parent = dict(node.location)
+            del parent[node.kind]
+            if node.depth > 1:
+                self.assertIn(tuple(sorted(parent.items())), seen)
+            seen.add(tuple(sorted(node.location.items())))
+        self.assertEqual(nodes[0].depth, 1)
+
+    def test_from_root(self):
+        nodes = list(self.api.crawl(max_depth=2))
+        self.assertEqual(self.kinds(nodes), {'system': 1, 'issuer': 3})
+
+    def test_limits(self):
+        nodes = list(self.api.crawl(system='sys', max_depth=1))
+        self.assertEqual(self.kinds(nodes), {'issuer': 3})
+        nodes = list(self.api.crawl(system='sys', kinds=['issuer', 'program']))
+        self.assertEqual(self.kinds(nodes), {'issuer': 3, 'program': 6})
+
+    def test_deeper_kinds(self):
+        nodes = list(self.api.crawl(system='sys', issuer='iss0',
+            program='prog0', kinds=['badge', 'instance', 'application']))
+        self.assertEqual(self.kinds(nodes), {'badge': 2, 'instance': 1})
+        instance = [node for node in nodes if node.kind == 'instance'][0]
+        self.assertEqual(instance.data['email'], 'a@example.org')
+
+    def test_failures(self):
+        crawl = self.api.crawl(system='missing')
+        self.assertEqual(list(crawl), [])
+        self.assertEqual(crawl.stats['errors'], {'ResourceNotFound': 1})
+        self.assertEqual(crawl.failures[0][0], 'systems/missing/issuers')
+
+    def test_records(self):
+        api = badgekit.BadgeKitAPI(self.server.url, 's3cret', records=True)
+        self.addCleanup(api.close)
+        nodes = list(api.crawl(system='sys', max_depth=1))
+        self.assertEqual(sorted(node.data.slug for node in nodes),
+                ['iss0', 'iss1', 'iss2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
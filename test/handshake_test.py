@@ -0,0 +1,139 @@
+from __future__ import unicode_literals
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import badgekit
+from badgekit.handshake import Handshake, shared_handshake
+from badgekit.testing import StandInServer
+
+
+class HandshakeTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer(version='0.3.1')
+        self.addCleanup(self.server.close)
+
+    def client(self, handshake):
+        api = badgekit.BadgeKitAPI(self.server.url, 's3cret',
+                handshake=handshake)
+        self.addCleanup(api.close)
+        return api
+
+    def root_hits(self):
+        return self.server.hits.get(('GET', '/'), 0)
+
+    def test_shared_between_clients(self):
+        handshake = Handshake(features={'paging': '0.3.0', 'future': '1.0'})
+        first, second = self.client(handshake), self.client(handshake)
+        self.assertEqual(first.server_version(), '0.3.1')
+        second.require_server_version('0.3.0')
+        self.assertRaises(ValueError, second.require_server_version, '0.4')
+        info = first.server_info()
+        self.assertEqual(info.app, 'BadgeKit API')
+        self.assertEqual(info.features, {'paging': True, 'future': False})
+        self.assertTrue(info.at_least('0.3'))
+        self.assertEqual(self.root_hits(), 1)
+        self.assertEqual(handshake.stats['hits'], 3)
+
+    def test_concurrent_callers_share_a_request(self):
+        self.server.httpd.latency = 0.1
+        api = self.client(Handshake())
+        threads = [threading.Thread(target=api.server_version)
+                for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.root_hits(), 1)
+
+    def test_stale_answer_refreshed_in_background(self):
+        handshake = Handshake(ttl=0.5, max_stale=10)
+        api = self.client(handshake)
+        api.server_version()
+        time.sleep(0.6)
+        self.server.httpd.latency = 0.2
+        self.server.httpd.version = '0.4.0'
+
+        start = time.time()
+        self.assertEqual(api.server_version(), '0.3.1')
+        self.assertLess(time.time() - start, 0.1)
+        self.assertEqual(handshake.stats['stale_hits'], 1)
+
+        deadline = time.time() + 5
+        while api.server_info().version != '0.4.0':
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.05)
+        self.assertEqual(handshake.stats['background_refreshes'], 1)
+
+    def test_too_stale_answer_waits(self):
+        handshake = Handshake(ttl=0, max_stale=0)
+        api = self.client(handshake)
+        api.server_version()
+        self.server.httpd.version = '0.4.0'
+        self.assertEqual(api.server_version(), '0.4.0')
+        self.assertEqual(self.root_hits(), 2)
+
+    def test_shared_through_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'handshake.json')
+
+        self.client(Handshake(path=path)).server_version()
+        other = Handshake(path=path)
+        self.assertEqual(self.client(other).server_version(), '0.3.1')
+        self.assertEqual(other.stats['disk_hits'], 1)
+        self.assertEqual(other.stats['fetches'], 0)
+        self.assertEqual(self.root_hits(), 1)
+
+        with open(path, 'w') as f:
+            f.write('not json')
+        self.assertEqual(self.client(Handshake(path=path)).server_version(),
+                '0.3.1')
+
+    def test_fresher_answer_in_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'handshake.json')
+
+        handshake = Handshake(ttl=60, max_stale=0, path=path)
+        api = self.client(handshake)
+        api.server_version()
+        # Our own answer has grown stale; a sibling's in the file has not.
+        handshake._entries[self.server.url.rstrip('/')].fetched -= 120
+        self.server.httpd.version = '0.4.0'
+        self.assertEqual(api.server_version(), '0.3.1')
+        self.assertEqual(handshake.stats['disk_hits'], 1)
+        self.assertEqual(self.root_hits(), 1)
+
+    def test_concurrent_saves(self):
+        from badgekit.handshake import ServerInfo
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'handshake.json')
+
+        urls = ['http://api%d.example.com' % i for i in range(8)]
+        threads = [threading.Thread(target=Handshake(path=path)._save,
+            args=(ServerInfo(url, 'BadgeKit API', '0.3.1', {}, time.time()),))
+            for url in urls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(Handshake(path=path)._read_file()), urls)
+
+    def test_handshake_true(self):
+        api = self.client(True)
+        self.assertIs(api.handshake, shared_handshake())
+
+    def test_without_handshake(self):
+        api = self.client(None)
+        api.server_version()
+        self.assertEqual(api.server_info().version, '0.3.1')
+        self.assertEqual(self.root_hits(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
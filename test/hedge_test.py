@@ -0,0 +1,116 @@
+from __future__ import unicode_literals
+import httpretty
+import re
+import threading
+import time
+import unittest
+
+import badgekit
+from badgekit.hedge import HedgePolicy
+
+
+class SlowFirst(object):
+    "Calls that are slow the first time only."
+    def __init__(self, slow=0.5):
+        self.slow = slow
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+        if call == 1:
+            time.sleep(self.slow)
+        return call
+
+
+class HedgePolicyTest(unittest.TestCase):
+    def test_fast_not_hedged(self):
+        policy = HedgePolicy(delay=1, max_extra=1)
+        self.assertEqual(policy.call(lambda: 'x'), 'x')
+        self.assertEqual(policy.stats()['hedges'], 0)
+
+    def test_hedge_wins(self):
+        policy = HedgePolicy(delay=0.01, max_extra=1)
+        func = SlowFirst()
+        start = time.time()
+        self.assertEqual(policy.call(func), 2)
+        self.assertTrue(time.time() - start < 0.4)
+        self.assertEqual(policy.stats()['hedges'], 1)
+        self.assertEqual(policy.stats()['hedge_wins'], 1)
+
+    def test_queued_calls_not_hedged(self):
+        # With one worker, calls wait their turn; the wait must not count.
+        policy = HedgePolicy(delay=0.05, max_extra=1, max_workers=1)
+        threads = [threading.Thread(target=policy.call,
+            args=(lambda: time.sleep(0.03),)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(policy.stats()['requests'], 4)
+        self.assertEqual(policy.stats()['hedges'], 0)
+
+    def test_pool_saturated(self):
+        policy = HedgePolicy(delay=0.01, max_extra=1, max_workers=1,
+                queue_timeout=0.05)
+        self.addCleanup(policy.close)
+        release = threading.Event()
+        self.addCleanup(release.set)
+        blocker = threading.Thread(target=policy.call, args=(release.wait,))
+        blocker.start()
+        time.sleep(0.02)
+        self.assertEqual(policy.call(lambda: 'inline'), 'inline')
+        release.set()
+        blocker.join()
+
+    def test_close(self):
+        policy = HedgePolicy(delay=1)
+        self.assertEqual(policy.call(lambda: 'x'), 'x')
+        executor = policy._executor
+        policy.close()
+        self.assertIsNone(policy._executor)
+        self.assertRaises(RuntimeError, executor.submit, lambda: None)
+        self.assertEqual(policy.call(lambda: 'y'), 'y')
+        policy.close()
+
+        policy.call(lambda: 'z')
+        api = badgekit.BadgeKitAPI('http://example.com/', 'asdf',
+                hedge=policy)
+        api.close()
+        self.assertIsNone(policy._executor)
+
+    def test_budget(self):
+        policy = HedgePolicy(delay=0.01, max_extra=0)
+        self.assertEqual(policy.call(SlowFirst(0.05)), 1)
+        self.assertEqual(policy.stats()['hedges'], 0)
+
+    def test_both_fail(self):
+        def fail():
+            time.sleep(0.02)
+            raise ValueError('nope')
+        policy = HedgePolicy(delay=0.01, max_extra=1)
+        with self.assertRaises(ValueError):
+            policy.call(fail)
+
+    def test_adaptive_delay(self):
+        policy = HedgePolicy(percentile=50, initial_delay=1, min_delay=0)
+        for latency in range(100):
+            policy._record(latency / 1000.0)
+        self.assertAlmostEqual(policy.delay, 0.05, places=3)
+
+
+class HedgedClientTest(unittest.TestCase):
+    @httpretty.activate
+    def test_only_gets_hedged(self):
+        policy = HedgePolicy(delay=5, max_extra=1)
+        a = badgekit.BadgeKitAPI('http://example.com/', 'asdf', hedge=policy)
+        httpretty.register_uri(httpretty.GET,
+                re.compile('example.com/.*'), body='{"badges": []}')
+        httpretty.register_uri(httpretty.POST,
+                re.compile('example.com/.*'), body='{}', status=201)
+
+        self.assertEqual(a.list('badge', system='s'), {'badges': []})
+        a.create('badge', dict(slug='b'), system='s')
+        self.assertEqual(policy.stats()['requests'], 1)
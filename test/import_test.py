@@ -0,0 +1,81 @@
+from __future__ import unicode_literals
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+import badgekit
+from badgekit import api
+
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(code):
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    env['PYTHONPATH'] = root
+    return subprocess.check_output([sys.executable, '-c', code], env=env,
+            cwd=root).decode('utf-8').strip()
+
+
+class ImportTest(unittest.TestCase):
+    @unittest.skipIf(sys.version_info < (3, 7), 'needs module __getattr__')
+    def test_no_heavy_imports(self):
+        loaded = run('import sys, badgekit; print(" ".join(sorted(name '
+                'for name in ("requests", "requests_jwt", "jwt", "json", '
+                '"distutils") if name in sys.modules)))')
+        self.assertEqual(loaded, '')
+
+    def test_stand_in_without_jwt(self):
+        # Only a stand-in with a secret checks tokens.
+        self.assertEqual(run('import sys, badgekit.testing; '
+            'print("jwt" in sys.modules)'), 'False')
+
+    @unittest.skipIf(sys.version_info < (3, 7), 'needs module __getattr__')
+    def test_import_footprint(self):
+        # What a fresh ``import badgekit`` loads: two modules of its own,
+        # and nothing from outside the standard library.  (It took about
+        # 0.25s while requests and distutils were imported up front.)
+        loaded = json.loads(run('import json, sys; before = set(sys.modules); '
+                'import badgekit; print(json.dumps(dict((name, '
+                'getattr(sys.modules[name], "__file__", None) or "") '
+                'for name in set(sys.modules) - before)))'))
+        self.assertEqual(sorted(name for name in loaded
+            if name.split('.')[0] == 'badgekit'), ['badgekit', 'badgekit.api'])
+        self.assertEqual([name for name, path in loaded.items()
+            if 'site-packages' in path or 'dist-packages' in path], [])
+
+    def test_request_exception(self):
+        import requests
+        self.assertIs(badgekit.RequestException,
+                requests.exceptions.RequestException)
+        self.assertIs(api.RequestException,
+                requests.exceptions.RequestException)
+        self.assertRaises(AttributeError, getattr, badgekit, 'no_such_thing')
+
+    def test_star_import(self):
+        import requests
+        for module in ('badgekit', 'badgekit.api'):
+            names = {}
+            exec('from %s import *' % module, names)
+            self.assertIs(names['RequestException'],
+                    requests.exceptions.RequestException)
+            self.assertIn('BadgeKitAPI', names)
+
+
+class VersionTest(unittest.TestCase):
+    def test_parse(self):
+        parse = api._parse_version
+        self.assertEqual(parse('1.2'), parse('1.2.0'))
+        self.assertLess(parse('0.2.9'), parse('0.2.10'))
+        self.assertLess(parse('1.0a1'), parse('1.0b1'))
+        self.assertLess(parse('1.0b2'), parse('1.0'))
+        self.assertLess(parse('1.0'), parse('1.0.1'))
+        for bad in ('1', '1.2.3.4', '1.0-beta', 'v1.0', ''):
+            self.assertRaises(ValueError, parse, bad)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+from __future__ import unicode_literals
+import json
+import unittest
+
+import badgekit
+from badgekit import jsonstream
+from badgekit.jsonstream import iter_json_array
+from badgekit.testing import StandInServer
+
+
+def chunked(text, size):
+    data = text.encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class IterJsonArrayTest(unittest.TestCase):
+    doc = json.dumps({
+        'pageData': {'count': 3, 'nested': [1, {'a': '}]'}]},
+        'instances': [
+            {'email': 'café@example.org', 'n': 12345},
+            12345,
+            [],
+            'x, y]',
+            ],
+        'after': True,
+        }, indent=1)
+
+    def test_every_split(self):
+        expected = json.loads(self.doc)['instances']
+        for size in range(1, 20):
+            self.assertEqual(
+                    list(iter_json_array(chunked(self.doc, size), 'instances')),
+                    expected)
+
+    def test_large_element(self):
+        # Decoding is retried as the buffer doubles, not for every chunk.
+        doc = json.dumps({'instances': [{'evidence': 'x' * 100000}]})
+        decoder = jsonstream._decoder
+        calls = []
+
+        class Counting(object):
+            def raw_decode(self, s, idx=0):
+                calls.append(idx)
+                return decoder.raw_decode(s, idx)
+        jsonstream._decoder = Counting()
+        try:
+            elements = list(iter_json_array(chunked(doc, 100), 'instances'))
+        finally:
+            jsonstream._decoder = decoder
+        self.assertEqual(len(elements[0]['evidence']), 100000)
+        self.assertLess(len(calls), 30)
+
+    def test_missing_key(self):
+        self.assertEqual(
+                list(iter_json_array(chunked(self.doc, 7), 'badges')), [])
+        self.assertEqual(list(iter_json_array([b'{}'], 'badges')), [])
+        self.assertEqual(list(iter_json_array([b'{"badges": []}'], 'badges')), [])
+
+    def test_invalid(self):
+        for doc in ['', '[1, 2]', '{"badges": [1, 2', '{"badges": [1 2]}',
+                '{"badges": [{"a": }]}']:
+            with self.assertRaises(badgekit.APIError):
+                list(iter_json_array(chunked(doc, 3), 'badges'))
+
+
+class IterListTest(unittest.TestCase):
+    def test_iter_list(self):
+        with StandInServer() as server:
+            with badgekit.BadgeKitAPI(server.url, 'asdf') as a:
+                a.create('system', dict(slug='sys'))
+                for i in range(50):
+                    a.create('badge', dict(slug='b%d' % i), system='sys')
+
+                slugs = [b['slug'] for b in
+                        a.iter_list('badge', system='sys', chunk_size=10)]
+                self.assertEqual(slugs, ['b%d' % i for i in range(50)])
+
+                with self.assertRaises(badgekit.ResourceNotFound):
+                    list(a.iter_list('badge', system='nope'))
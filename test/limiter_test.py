@@ -0,0 +1,161 @@
+from __future__ import unicode_literals
+import threading
+import time
+import unittest
+
+import requests
+
+import badgekit
+from badgekit.limiter import AdaptiveLimiter
+from badgekit.testing import StandInServer
+
+
+class FakeResponse(object):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class AdaptiveLimiterTest(unittest.TestCase):
+    def test_bounds(self):
+        self.assertRaises(ValueError, AdaptiveLimiter, initial=0)
+        self.assertRaises(ValueError, AdaptiveLimiter, initial=8, max_limit=4)
+
+    def test_increase(self):
+        limiter = AdaptiveLimiter(initial=2, max_limit=5, tolerance=None)
+        for i in range(100):
+            limiter.call(lambda: FakeResponse(200))
+        self.assertEqual(limiter.limit, 5)
+        self.assertEqual(limiter.successes, 100)
+        self.assertGreater(limiter.throughput, 0)
+
+    def test_completions_trimmed(self):
+        limiter = AdaptiveLimiter(tolerance=None, throughput_window=0.05)
+        for i in range(20):
+            limiter.call(lambda: FakeResponse(200))
+        time.sleep(0.1)
+        limiter.call(lambda: FakeResponse(200))
+        self.assertEqual(len(limiter._completions), 1)
+
+    def test_decrease_on_overload(self):
+        limiter = AdaptiveLimiter(initial=16, tolerance=None)
+        limiter.call(lambda: FakeResponse(503))
+        self.assertEqual(limiter.limit, 8)
+        limiter.call(lambda: FakeResponse(429))
+        self.assertEqual(limiter.limit, 4)
+
+        def refused():
+            raise requests.exceptions.ConnectionError('refused')
+        self.assertRaises(requests.exceptions.ConnectionError,
+                limiter.call, refused)
+        self.assertEqual(limiter.limit, 2)
+        self.assertEqual(limiter.overloads, 3)
+
+        # Client errors are not the server's trouble.
+        limiter.call(lambda: FakeResponse(404))
+        self.assertRaises(ValueError, limiter.call, lambda: int('x'))
+        self.assertEqual(limiter.limit, 2)
+        self.assertEqual(limiter.stats()['in_flight'], 0)
+
+    def test_one_cut_per_burst(self):
+        limiter = AdaptiveLimiter(initial=16, tolerance=None)
+        started = [limiter.acquire() for i in range(4)]
+        for start in started:
+            limiter.release(start, status=500)
+        self.assertEqual(limiter.limit, 8)
+        self.assertEqual(limiter.cuts, 1)
+        self.assertEqual(limiter.overloads, 4)
+
+    def test_slow_response(self):
+        limiter = AdaptiveLimiter(initial=8, max_limit=8, tolerance=3.0)
+        for i in range(10):
+            limiter.release(time.time() - 0.01, status=200)
+        limiter.release(time.time() - 0.02, status=200)
+        self.assertEqual(limiter.limit, 8)
+        limiter._in_flight = 1
+        limiter.release(time.time() - 0.5, status=200)
+        self.assertEqual(limiter.limit, 4)
+
+    def test_slow_judged_per_route(self):
+        limiter = AdaptiveLimiter(initial=8, max_limit=8, tolerance=3.0)
+        for i in range(10):
+            limiter.release(time.time() - 0.001, status=200, route='ping')
+            limiter.release(time.time() - 0.05, status=200, route='create')
+        limiter.release(time.time() - 0.1, status=200, route='create')
+        self.assertEqual(limiter.limit, 8)
+        limiter.release(time.time() - 0.1, status=200, route='ping')
+        self.assertEqual(limiter.limit, 4)
+
+    def test_in_flight_bounded(self):
+        limiter = AdaptiveLimiter(initial=3, max_limit=3, tolerance=None)
+        lock = threading.Lock()
+        state = {'now': 0, 'most': 0}
+
+        def send():
+            with lock:
+                state['now'] += 1
+                state['most'] = max(state['most'], state['now'])
+            time.sleep(0.005)
+            with lock:
+                state['now'] -= 1
+            return FakeResponse(200)
+
+        threads = [threading.Thread(target=lambda: [limiter.call(send)
+                for i in range(10)]) for j in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(state['most'], 3)
+
+    def test_settles_near_capacity(self):
+        # A server that answers quickly up to 4 requests at once, slowly
+        # beyond that, and with 503 beyond 8.
+        limiter = AdaptiveLimiter(initial=1, max_limit=32)
+        lock = threading.Lock()
+        state = {'now': 0}
+
+        def send():
+            with lock:
+                state['now'] += 1
+                load = state['now']
+            try:
+                if load > 8:
+                    return FakeResponse(503)
+                time.sleep(0.002 if load <= 4 else 0.02)
+                return FakeResponse(200)
+            finally:
+                with lock:
+                    state['now'] -= 1
+
+        threads = [threading.Thread(target=lambda: [limiter.call(send)
+                for i in range(40)]) for j in range(32)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertGreaterEqual(limiter.limit, 1)
+        self.assertLessEqual(limiter.limit, 10)
+        self.assertGreater(limiter.cuts, 0)
+
+
+class LimitedClientTest(unittest.TestCase):
+    def test_create_many(self):
+        server = StandInServer(secret='s3cret', latency=0.002)
+        self.addCleanup(server.close)
+        server.populate('system', [{'slug': 'sys'}])
+        limiter = AdaptiveLimiter(initial=2, max_limit=8)
+        api = badgekit.BadgeKitAPI(server.url, 's3cret', limiter=limiter)
+        self.addCleanup(api.close)
+
+        results = api.create_many('badge',
+                ({'slug': 'badge-%d' % i} for i in range(40)), system='sys')
+        self.assertEqual(results.max_in_flight, 8)
+        self.assertTrue(all(result.ok for result in results))
+        stats = limiter.stats()
+        self.assertEqual(stats['successes'] + stats['overloads'], 40)
+        self.assertEqual(stats['in_flight'], 0)
+        self.assertGreaterEqual(stats['limit'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
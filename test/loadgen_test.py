@@ -0,0 +1,85 @@
+from __future__ import unicode_literals
+import json
+import os
+import tempfile
+import unittest
+
+import badgekit
+from badgekit.loadgen import LoadGenerator, format_report, main, parse_mix
+from badgekit.testing import StandInServer
+
+
+class ParseMixTest(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_mix('list=1,get=4,create'),
+                [('list', 1.0), ('get', 4.0), ('create', 1.0)])
+
+    def test_bad_mix(self):
+        self.assertRaises(ValueError, parse_mix, 'delete=1')
+        self.assertRaises(ValueError, parse_mix, 'get=-1')
+        self.assertRaises(ValueError, parse_mix, 'get=0')
+
+
+class LoadGeneratorTest(unittest.TestCase):
+    location = {'system': 'sys', 'badge': 'b'}
+
+    def start(self, **kwargs):
+        server = StandInServer(secret='s3cret', **kwargs)
+        self.addCleanup(server.close)
+        server.populate('system', [{'slug': 'sys'}])
+        server.populate('badge', [{'slug': 'b'}], system='sys')
+        api = badgekit.BadgeKitAPI(server.url, 's3cret')
+        self.addCleanup(api.close)
+        return server, api
+
+    def test_mix_and_warmup(self):
+        server, api = self.start()
+        generator = LoadGenerator(api, parse_mix('get=1,create=1'),
+                self.location, rate=200, concurrency=4, duration=0.5,
+                warmup=0.25, seed=1)
+        report = generator.run()
+        self.assertEqual(report['errors'], 0)
+        self.assertEqual(set(report['operations']), set(['get', 'create']))
+        # Only requests due after the warm-up are counted.
+        self.assertEqual(report['requests'], 100)
+        sent = sum(server.hits.values())
+        self.assertEqual(sent, 150)
+        self.assertIn('p99', format_report(report))
+
+    def test_latency_counts_from_due_time(self):
+        # One worker cannot keep up with requests due every 5ms that take
+        # 20ms, so each waits longer than the last to be sent.
+        server, api = self.start(latency=0.02)
+        generator = LoadGenerator(api, parse_mix('get'), self.location,
+                rate=200, concurrency=1, duration=0.3, warmup=0)
+        report = generator.run()
+        get = report['operations']['get']
+        self.assertLess(get['service_time']['p50'], 0.1)
+        self.assertGreater(get['latency']['max'],
+                5 * get['service_time']['max'])
+
+    def test_errors_counted(self):
+        server, api = self.start()
+        generator = LoadGenerator(api, parse_mix('get'),
+                {'system': 'sys', 'badge': 'missing'}, concurrency=2,
+                duration=0.1, warmup=0)
+        report = generator.run()
+        self.assertEqual(report['errors'], report['requests'])
+        self.assertIn('ResourceNotFound',
+                report['operations']['get']['errors'])
+
+
+class MainTest(unittest.TestCase):
+    def test_stand_in(self):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        status = main(['--stand-in', '--rate', '100', '--duration', '0.2',
+            '--warmup', '0', '--json', path])
+        self.assertEqual(status, 0)
+        with open(path) as f:
+            self.assertEqual(json.load(f)['errors'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
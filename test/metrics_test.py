@@ -0,0 +1,106 @@
+from __future__ import unicode_literals
+import httpretty
+import re
+import time
+import unittest
+
+import requests
+
+import badgekit
+from badgekit.metrics import Metrics, _TimedAuth, _sign_time, route_template
+
+
+class RouteTemplateTest(unittest.TestCase):
+    def test_routes(self):
+        self.assertEqual(route_template('/'), '/')
+        self.assertEqual(route_template('systems/s'), 'systems/:system')
+        self.assertEqual(
+                route_template('/systems/s/badges/b/instances?archived=true'),
+                'systems/:system/badges/:badge/instances')
+        self.assertEqual(route_template('/public/assertions/x'), '*')
+
+
+class MetricsTest(unittest.TestCase):
+    def test_histogram(self):
+        metrics = Metrics(buckets=(0.1, 1))
+        for latency in (0.05, 0.1, 0.5, 2):
+            metrics.observe_request('GET', '/', latency, status=200)
+        series = metrics.snapshot()['GET /']
+        self.assertEqual(series['latency']['buckets'],
+                {'0.1': 2, '1': 3, '+Inf': 4})
+        self.assertEqual(series['statuses'], {200: 4})
+
+    @httpretty.activate
+    def test_client(self):
+        metrics = Metrics()
+        a = badgekit.BadgeKitAPI('http://example.com/', 'asdf', metrics=metrics)
+        httpretty.register_uri(httpretty.GET,
+                'http://example.com/systems/s/badges',
+                body='{"badges": []}')
+        httpretty.register_uri(httpretty.GET,
+                'http://example.com/systems/s/badges/nope',
+                body='{"code": "ResourceNotFound", "message": "no"}',
+                status=404)
+        httpretty.register_uri(httpretty.POST,
+                'http://example.com/systems/s/badges',
+                body='{"status": "created"}', status=201)
+
+        a.list('badge', system='s')
+        a.list('badge', system='s')
+        with self.assertRaises(badgekit.ResourceNotFound):
+            a.get(system='s', badge='nope')
+        a.create('badge', dict(slug='b'), system='s')
+
+        snapshot = metrics.snapshot()
+        listing = snapshot['GET systems/:system/badges']
+        self.assertEqual(listing['count'], 2)
+        self.assertEqual(listing['statuses'], {200: 2})
+        self.assertEqual(listing['bytes_received'], 2 * len('{"badges": []}'))
+        for phase in ('sign', 'network', 'decode'):
+            self.assertEqual(listing['phases'][phase]['count'], 2)
+            self.assertTrue(listing['phases'][phase]['sum'] > 0)
+
+        getting = snapshot['GET systems/:system/badges/:badge']
+        self.assertEqual(getting['errors'], {'ResourceNotFound': 1})
+        creating = snapshot['POST systems/:system/badges']
+        self.assertEqual(creating['bytes_sent'], len('slug=b'))
+
+        text = metrics.prometheus()
+        self.assertTrue('# TYPE badgekit_request_duration_seconds histogram' in text)
+        self.assertTrue('badgekit_request_duration_seconds_count{method="GET",'
+                'route="systems/:system/badges"} 2' in text)
+        self.assertTrue('badgekit_errors_total{method="GET",route='
+                '"systems/:system/badges/:badge",exception="ResourceNotFound"} 1'
+                in text)
+
+    @httpretty.activate
+    def test_invalid_json(self):
+        metrics = Metrics()
+        a = badgekit.BadgeKitAPI('http://example.com/', 'asdf', metrics=metrics)
+        httpretty.register_uri(httpretty.GET,
+                'http://example.com/systems/s', body='{"system": ')
+        with self.assertRaises(badgekit.APIError):
+            a.get(system='s')
+        self.assertEqual(metrics.snapshot()['GET systems/:system']['errors'],
+                {'APIError': 1})
+
+    def test_sign_time_per_request(self):
+        # A hedged request's two copies are signed, and timed, apart.
+        delays = [0.05, 0]
+
+        def sign(request):
+            time.sleep(delays.pop(0))
+            return request
+        auth = _TimedAuth(sign)
+        slow, fast = auth(requests.Request('GET', 'http://a/').prepare()), \
+                auth(requests.Request('GET', 'http://a/').prepare())
+        self.assertGreaterEqual(_sign_time(slow), 0.04)
+        self.assertLess(_sign_time(fast), 0.04)
+        self.assertEqual(_sign_time(None), 0.0)
+
+    def test_transport_error(self):
+        metrics = Metrics()
+        a = badgekit.BadgeKitAPI('http://127.0.0.1:1/', 'asdf', metrics=metrics)
+        self.assertFalse(a.ping())
+        self.assertEqual(metrics.snapshot()['GET /']['errors'],
+                {'ConnectionError': 1})
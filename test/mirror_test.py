@@ -0,0 +1,110 @@
+from __future__ import unicode_literals
+import datetime
+import unittest
+
+import badgekit
+from badgekit.mirror import Mirror, _iso
+from badgekit.testing import StandInServer
+
+
+class MirrorTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer(secret='s3cret')
+        self.addCleanup(self.server.close)
+        populate = self.server.populate
+        populate('system', [{'slug': 'sys'}])
+        populate('issuer', [{'slug': 'iss1'}, {'slug': 'iss2'}], system='sys')
+        populate('program', [{'slug': 'prog'}], system='sys', issuer='iss1')
+        populate('badge', [
+            {'slug': 'b1', 'issuer': {'slug': 'iss1'}},
+            {'slug': 'b2', 'issuer': {'slug': 'iss2'}},
+            ], system='sys')
+        populate('instance', [
+            # 2014-06-01T23:00:00 in UTC
+            {'slug': 'i1', 'email': 'a@example.org',
+                'issuedOn': '2014-06-02T01:00:00+02:00'},
+            {'slug': 'i2', 'email': 'b@example.org',
+                'issuedOn': '2014-06-05T10:00:00'},
+            ], system='sys', badge='b1')
+        populate('instance', [
+            {'slug': 'i3', 'email': 'a@example.org', 'issuedOn': 1402000000},
+            ], system='sys', badge='b2')
+
+        self.api = badgekit.BadgeKitAPI(self.server.url, 's3cret')
+        self.addCleanup(self.api.close)
+        self.mirror = Mirror(self.api, 'sys')
+        self.addCleanup(self.mirror.close)
+
+    def test_queries(self):
+        stats = self.mirror.refresh()
+        # issuers, two program lists, badges, two instance lists
+        self.assertEqual(stats['requests'], 6)
+        self.assertEqual(stats['changed'], 6)
+        self.assertEqual(self.mirror.counts(), {'issuers': 2, 'programs': 1,
+            'badges': 2, 'instances': 3})
+
+        self.assertEqual(self.mirror.holders('b1',
+            ['a@example.org', 'c@example.org']), set(['a@example.org']))
+        self.assertEqual([b['slug'] for b in self.mirror.badges(issuer='iss2')],
+                ['b2'])
+        self.assertEqual([p['slug'] for p in self.mirror.programs('iss1')],
+                ['prog'])
+        since = [i['slug'] for i in self.mirror.instances(since='2014-06-02')]
+        self.assertEqual(since, ['i2', 'i3'])
+        self.assertEqual([i['slug'] for i in self.mirror.instances(
+            issuer='iss1', since=datetime.date(2014, 6, 2))], ['i2'])
+        self.assertEqual([i['slug'] for i in self.mirror.instances(
+            email='a@example.org', until='2014-06-02')], ['i1'])
+
+    def test_incremental_refresh(self):
+        self.mirror.refresh()
+        stats = self.mirror.refresh()
+        self.assertEqual(stats['changed'], 0)
+        self.assertEqual(stats['unchanged'], 6)
+
+        self.api.create('instance', {'slug': 'i4', 'email': 'c@example.org'},
+                system='sys', badge='b2')
+        stats = self.mirror.refresh()
+        self.assertEqual(stats['changed'], 1)
+        self.assertEqual(self.mirror.holders('b2', ['c@example.org']),
+                set(['c@example.org']))
+
+    def test_many_emails(self):
+        self.mirror.refresh()
+        emails = ['x%d@example.org' % i for i in range(2000)]
+        emails.append('b@example.org')
+        self.assertEqual(self.mirror.holders('b1', emails),
+                set(['b@example.org']))
+
+    def test_iso(self):
+        self.assertEqual(_iso(0), '1970-01-01T00:00:00')
+        self.assertEqual(_iso(1402000000000), _iso(1402000000))
+        self.assertEqual(_iso(datetime.datetime(2014, 6, 1, 12)),
+                '2014-06-01T12:00:00')
+        self.assertEqual(_iso('2014-06-02'), '2014-06-02T00:00:00')
+        self.assertEqual(_iso('2014-06-02T10:00:00.000Z'),
+                '2014-06-02T10:00:00')
+        self.assertEqual(_iso('2014-06-02T01:30:00+02:00'),
+                '2014-06-01T23:30:00')
+        self.assertEqual(_iso('2014-06-01T23:30:00-0130'),
+                '2014-06-02T01:00:00')
+        self.assertEqual(_iso('2014-06-02T10:00:00.25Z'),
+                '2014-06-02T10:00:00.250000')
+        self.assertEqual(_iso('soon'), 'soon')
+        self.assertEqual(_iso('2014-02-30T00:00:00Z'), '2014-02-30T00:00:00Z')
+        self.assertEqual(_iso(datetime.datetime(2014, 6, 2, 10, 0, 0, 250000)),
+                _iso('2014-06-02T10:00:00.25Z'))
+        self.assertEqual(_iso(1402000000.25), '2014-06-05T20:26:40.250000')
+
+    def test_impossible_date(self):
+        self.server.populate('instance', [
+            {'slug': 'i4', 'email': 'c@example.org',
+                'issuedOn': '2014-02-30T00:00:00Z'},
+            ], system='sys', badge='b2')
+        self.mirror.refresh()
+        self.assertIn('c@example.org', self.mirror.holders('b2',
+            ['c@example.org']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+from __future__ import unicode_literals
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import requests
+
+import badgekit
+from badgekit.outbox import Outbox, OutboxLocked
+from badgekit.testing import StandInServer
+
+
+class FlakyAPI(object):
+    "Refuses the first ``failures`` calls, then records the rest."
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.created = []
+        self.lock = threading.Lock()
+
+    def create(self, kind, data, **kwargs):
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                raise requests.exceptions.ConnectionError('refused')
+            self.created.append((kind, data, kwargs))
+        return {kind: data}
+
+
+def read_lines(path):
+    with open(path, 'rb') as f:
+        return [json.loads(line.decode('utf-8')) for line in f]
+
+
+class OutboxTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, 'awards.spool')
+
+    def test_send(self):
+        server = StandInServer(secret='s3cret')
+        self.addCleanup(server.close)
+        server.populate('system', [{'slug': 'sys'}])
+        server.populate('badge', [{'slug': 'taken'}], system='sys')
+        api = badgekit.BadgeKitAPI(server.url, 's3cret')
+        self.addCleanup(api.close)
+
+        with api.outbox(self.path, max_in_flight=4) as outbox:
+            for i in range(20):
+                outbox.create('badge', {'slug': 'badge-%d' % i}, system='sys')
+            outbox.create('badge', {'slug': 'taken'}, system='sys')
+            outbox.create('badge', {'name': 'No slug'}, system='sys')
+            self.assertTrue(outbox.flush(timeout=10))
+            self.assertEqual(outbox.pending, 0)
+
+        self.assertEqual(outbox.stats['queued'], 22)
+        self.assertEqual(outbox.stats['created'], 20)
+        self.assertEqual(outbox.stats['existing'], 1)
+        self.assertEqual(outbox.stats['failed'], 1)
+        self.assertEqual(len(api.list('badge', system='sys')['badges']), 21)
+
+        failures = outbox.failures()
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(failures[0]['data'], {'name': 'No slug'})
+        self.assertEqual(failures[0]['error_type'], 'ValidationError')
+
+    def test_retry(self):
+        api = FlakyAPI(failures=3)
+        outbox = Outbox(api, self.path, retry_delay=0.01)
+        outbox.create('instance', {'email': 'a@example.com'}, badge='b')
+        self.assertTrue(outbox.flush(timeout=10))
+        outbox.close()
+        self.assertEqual(api.created,
+                [('instance', {'email': 'a@example.com'}, {'badge': 'b'})])
+        self.assertEqual(outbox.stats['retries'], 3)
+
+    def test_max_attempts(self):
+        api = FlakyAPI(failures=5)
+        outbox = Outbox(api, self.path, retry_delay=0.01, max_attempts=2)
+        outbox.create('instance', {'email': 'a@example.com'}, badge='b')
+        self.assertTrue(outbox.flush(timeout=10))
+        outbox.close()
+        self.assertEqual(api.created, [])
+        self.assertEqual(outbox.failures()[0]['attempts'], 2)
+        self.assertEqual(outbox.failures()[0]['error_type'], 'ConnectionError')
+
+    def test_wrong_secret(self):
+        server = StandInServer(secret='s3cret')
+        self.addCleanup(server.close)
+        server.populate('system', [{'slug': 'sys'}])
+        api = badgekit.BadgeKitAPI(server.url, 'wrong')
+        self.addCleanup(api.close)
+
+        with api.outbox(self.path, retry_delay=0.01) as outbox:
+            outbox.create('badge', {'slug': 'b'}, system='sys')
+            self.assertTrue(outbox.flush(timeout=10))
+        self.assertEqual(outbox.stats['retries'], 0)
+        failure = outbox.failures()[0]
+        self.assertEqual(failure['error_type'], 'APIError')
+        self.assertIn('Unauthorized', failure['error'])
+
+    def test_restart(self):
+        outbox = Outbox(FlakyAPI(), self.path, start=False)
+        ids = [outbox.create('instance', {'email': 'user%d@example.com' % i},
+            badge='b') for i in range(3)]
+        self.assertFalse(outbox.flush(timeout=0.01))
+        outbox.close()
+        lines = read_lines(self.path)
+        self.assertEqual([line['id'] for line in lines], ids)
+
+        # Acknowledge the first, then crash part way through a write.
+        with open(self.path, 'ab') as f:
+            f.write(b'{"op": "ack", "id": "%s", "outcome": "created"}\n'
+                    % ids[0].encode('ascii'))
+            f.write(b'{"op": "create", "id": "torn", "ki')
+
+        api = FlakyAPI()
+        outbox = Outbox(api, self.path, start=False)
+        self.assertEqual(outbox.pending, 2)
+        self.assertEqual([line['id'] for line in read_lines(self.path)],
+                ids[1:])
+        outbox.start()
+        self.assertTrue(outbox.flush(timeout=10))
+        outbox.close()
+        self.assertEqual(sorted(data['email'] for kind, data, kw in api.created),
+                ['user1@example.com', 'user2@example.com'])
+
+        outbox = Outbox(FlakyAPI(), self.path, start=False)
+        self.assertEqual(outbox.pending, 0)
+        outbox.close()
+
+    def test_compaction(self):
+        api = FlakyAPI()
+        outbox = Outbox(api, self.path, batch_size=5, compact_every=10)
+        for i in range(25):
+            outbox.create('instance', {'email': 'user%d@example.com' % i})
+        self.assertTrue(outbox.flush(timeout=10))
+        outbox.close()
+        self.assertEqual(len(api.created), 25)
+        self.assertGreaterEqual(outbox.stats['compactions'], 2)
+        lines = read_lines(self.path)
+        acks = set(line['id'] for line in lines if line['op'] == 'ack')
+        self.assertLess(len(acks), 10)
+        self.assertEqual(set(line['id'] for line in lines
+            if line['op'] == 'create'), acks)
+
+    @unittest.skipIf(os.name != 'posix', 'locking needs fcntl')
+    def test_locked(self):
+        outbox = Outbox(FlakyAPI(), self.path, start=False)
+        self.addCleanup(outbox.close)
+        self.assertRaises(OutboxLocked, Outbox, FlakyAPI(), self.path)
+
+    def test_not_blocked_by_disk(self):
+        outbox = Outbox(FlakyAPI(), self.path, start=False)
+        self.addCleanup(outbox.close)
+        outbox.create('instance', {'email': 'a@example.com'})
+        writing, done = threading.Event(), threading.Event()
+        self.addCleanup(done.set)
+        write = outbox._write
+
+        def slow_write(f, data):
+            writing.set()
+            done.wait(5)
+            write(f, data)
+        outbox._write = slow_write
+        outbox.start()
+        self.assertTrue(writing.wait(5))
+        # The acknowledgement is being synced; the outbox still answers.
+        self.assertEqual(outbox.pending, 1)
+        self.assertFalse(outbox.flush(timeout=0.01))
+        done.set()
+        self.assertTrue(outbox.flush(timeout=5))
+
+    def test_disk_error(self):
+        outbox = Outbox(FlakyAPI(), self.path, start=False)
+        call_id = outbox.create('instance', {'email': 'a@example.com'})
+
+        def full(f, data):
+            raise OSError(28, 'No space left on device')
+        outbox._write = full
+        outbox.start()
+        self.assertRaises(OSError, outbox.flush, 5)
+        self.assertEqual(outbox.error.errno, 28)
+        # Even once there is room, nothing would send it.
+        del outbox._write
+        self.assertRaises(OSError, outbox.create, 'instance', {})
+        self.assertRaises(OSError, outbox.close)
+
+        outbox = Outbox(FlakyAPI(), self.path, start=False)
+        self.assertEqual(outbox.pending, 1)
+        self.assertEqual(read_lines(self.path)[0]['id'], call_id)
+        outbox.close()
+
+    def test_closed(self):
+        outbox = Outbox(FlakyAPI(), self.path)
+        outbox.close()
+        self.assertRaises(ValueError, outbox.create, 'instance', {})
+
+
+if __name__ == '__main__':
+    unittest.main()
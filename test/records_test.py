@@ -0,0 +1,77 @@
+from __future__ import unicode_literals
+import unittest
+
+import badgekit
+from badgekit import records
+from badgekit.testing import StandInServer
+
+
+INSTANCE = {
+        'slug': 'abc',
+        'email': 'learner@example.org',
+        'issuedOn': '2014-06-02T10:00:00.000Z',
+        'badge': {'slug': 'b', 'name': 'B', 'system': {'slug': 's'}},
+        'unexpected': 42,
+        }
+
+
+class RecordTest(unittest.TestCase):
+    def test_fields(self):
+        instance = records.Instance(INSTANCE)
+        self.assertEqual(instance.email, 'learner@example.org')
+        self.assertEqual(instance.expires, None)
+        self.assertEqual(instance.unexpected, 42)
+        self.assertFalse(hasattr(instance, '__dict__'))
+        with self.assertRaises(AttributeError):
+            instance.nonexistent
+
+    def test_lazy_nested(self):
+        instance = records.Instance(INSTANCE)
+        self.assertTrue(isinstance(instance._badge, dict))
+        self.assertTrue(isinstance(instance.badge, records.Badge))
+        self.assertTrue(instance.badge is instance.badge)
+        self.assertEqual(instance.badge.system.slug, 's')
+
+    def test_nested_list(self):
+        application = records.Application({
+            'slug': 'app', 'evidence': [{'url': 'http://example.org/'}]})
+        self.assertEqual(application.evidence[0].url, 'http://example.org/')
+
+    def test_to_dict(self):
+        instance = records.Instance(INSTANCE)
+        instance.badge
+        result = instance.to_dict()
+        self.assertEqual(result['unexpected'], 42)
+        self.assertEqual(result['badge']['system']['slug'], 's')
+        self.assertEqual(records.Instance(result), instance)
+
+    def test_every_kind(self):
+        for kind in badgekit.api._path_order:
+            self.assertEqual(records.to_record(kind, {'slug': 'x'}).slug, 'x')
+
+    def test_from_responses(self):
+        codes = records.from_list('code', {'claimCodes': [{'code': 'x'}]})
+        self.assertEqual(codes[0].code, 'x')
+        code = records.from_get('code', {'claimCode': {'code': 'x'}})
+        self.assertEqual(code.code, 'x')
+
+
+class RecordModeTest(unittest.TestCase):
+    def test_list_and_get(self):
+        with StandInServer() as server:
+            with badgekit.BadgeKitAPI(server.url, 'asdf', records=True) as a:
+                a.create('system', dict(slug='sys', name='Sys'))
+                a.create('badge', dict(slug='b', name='B'), system='sys')
+
+                system = a.get(system='sys')
+                self.assertTrue(isinstance(system, records.System))
+                self.assertEqual(system.name, 'Sys')
+
+                badges = a.list('badge', system='sys')
+                self.assertEqual([b.name for b in badges], ['B'])
+                self.assertEqual(
+                        [b.slug for b in a.iter_list('badge', system='sys')],
+                        ['b'])
+                self.assertEqual(
+                        [b.slug for b in a.iter_all('badge', system='sys')],
+                        ['b'])
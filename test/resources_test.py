@@ -0,0 +1,75 @@
+from __future__ import unicode_literals
+import httpretty
+import re
+import sys
+import unittest
+
+import badgekit
+
+
+class ResourceTest(unittest.TestCase):
+    def setUp(self):
+        self.api = badgekit.BadgeKitAPI('http://example.com/', 'asdf')
+
+    def test_paths(self):
+        badge = self.api.system('s').issuer('i').program('p').badge('b')
+        self.assertEqual(badge.path, 'systems/s/issuers/i/programs/p/badges/b')
+        self.assertEqual(badge.location,
+                dict(system='s', issuer='i', program='p', badge='b'))
+        self.assertEqual(badge, self.api.resource(
+            program='p', badge='b', system='s', issuer='i'))
+
+    @unittest.skipIf(sys.version_info < (3, 3), 'needs MappingProxyType')
+    def test_read_only(self):
+        location = {'system': 's'}
+        res = self.api.resource(**location).badge('b')
+        with self.assertRaises(TypeError):
+            res.location['badge'] = 'other'
+        with self.assertRaises(TypeError):
+            res.params['archived'] = True
+        self.assertEqual(res.child('badge', 'c').location,
+                dict(system='s', badge='c'))
+
+    def test_out_of_order(self):
+        res = self.api.badge('b').system('s')
+        self.assertEqual(res.path, 'systems/s/badges/b')
+        self.assertEqual(self.api.system('s').system('t').path, 'systems/t')
+
+    def test_defaults(self):
+        api = badgekit.BadgeKitAPI('http://example.com/', 'asdf',
+                defaults={'system': 'd', 'archived': True})
+        res = api.issuer('i')
+        self.assertEqual(res.path, 'systems/d/issuers/i')
+        self.assertEqual(res.params, {'archived': True})
+        self.assertEqual(api.system('s').path, 'systems/s')
+
+    @httpretty.activate
+    def test_create_with_params(self):
+        httpretty.register_uri(httpretty.POST,
+                re.compile('example.com/.*'), body='{}', status=201)
+        api = badgekit.BadgeKitAPI('http://example.com/', 'asdf',
+                defaults={'archived': True})
+        api.system('s').create('badge', dict(slug='b'))
+        self.assertEqual(httpretty.last_request().path,
+                '/systems/s/badges?archived=true')
+
+    @httpretty.activate
+    def test_calls(self):
+        httpretty.register_uri(httpretty.GET,
+                re.compile('example.com/.*'), body='{}')
+        httpretty.register_uri(httpretty.POST,
+                re.compile('example.com/.*'), body='{}', status=201)
+        badge = self.api.system('s').badge('b')
+
+        badge.get()
+        self.assertEqual(httpretty.last_request().path, '/systems/s/badges/b')
+        badge.list('instance', archived=False)
+        self.assertEqual(httpretty.last_request().path,
+                '/systems/s/badges/b/instances?archived=false')
+        badge.create('instance', dict(email='learner@example.org'))
+        self.assertEqual(httpretty.last_request().path,
+                '/systems/s/badges/b/instances')
+
+    def test_location_keyword_refused(self):
+        with self.assertRaises(TypeError):
+            self.api.system('s').list('badge', issuer='i')
@@ -0,0 +1,123 @@
+from __future__ import unicode_literals
+import threading
+import time
+import unittest
+
+import requests
+
+import badgekit
+from badgekit.singleflight import SingleFlight
+from badgekit.testing import StandInServer
+
+
+def in_threads(count, func):
+    results = [None] * count
+    errors = [None] * count
+
+    def run(i):
+        try:
+            results[i] = func()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_shared_result(self):
+        flight = SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'badges': [1]}
+
+        results, errors = in_threads(10, lambda: flight.do('k', slow))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'badges': [1]}] * 10)
+        self.assertEqual(len(set(id(r) for r in results)), 10)
+        self.assertEqual(flight.stats(), {'calls': 1, 'shared': 9})
+
+    def test_shared_error(self):
+        flight = SingleFlight()
+
+        def fail():
+            time.sleep(0.2)
+            raise ValueError('nope')
+
+        results, errors = in_threads(5, lambda: flight.do('k', fail))
+        self.assertTrue(all(isinstance(e, ValueError) for e in errors))
+        self.assertEqual(flight.stats()['calls'], 1)
+
+    def test_sequential_calls_not_shared(self):
+        flight = SingleFlight()
+        self.assertEqual(flight.do('k', lambda: 1), 1)
+        self.assertEqual(flight.do('k', lambda: 2), 2)
+
+
+class SlowSession(requests.Session):
+    def __init__(self):
+        super(SlowSession, self).__init__()
+        self.count = 0
+
+    def request(self, *args, **kwargs):
+        self.count += 1
+        time.sleep(0.2)
+        return super(SlowSession, self).request(*args, **kwargs)
+
+
+class CoalescedClientTest(unittest.TestCase):
+    def test_get_and_errors(self):
+        with StandInServer() as server:
+            session = SlowSession()
+            a = badgekit.BadgeKitAPI(server.url, 'asdf', session=session,
+                    coalesce=True)
+            a.create('system', dict(slug='sys'))
+            session.count = 0
+
+            results, errors = in_threads(8, lambda: a.get(system='sys'))
+            self.assertEqual(session.count, 1)
+            self.assertEqual(results[0]['system']['slug'], 'sys')
+
+            results, errors = in_threads(8, lambda: a.get(system='nope'))
+            self.assertEqual(session.count, 2)
+            self.assertTrue(all(isinstance(e, badgekit.ResourceNotFound)
+                for e in errors))
+
+    def test_credentials_not_shared(self):
+        with StandInServer(secret='s3cret') as server:
+            server.populate('system', [{'slug': 'sys'}])
+            flight = SingleFlight()
+            session = SlowSession()
+            good = badgekit.BadgeKitAPI(server.url, 's3cret',
+                    session=session, coalesce=flight)
+            bad = badgekit.BadgeKitAPI(server.url, 'wrong',
+                    session=session, coalesce=flight)
+            url = server.url + 'systems/sys'
+
+            calls = [lambda: good.get(system='sys'),
+                    lambda: bad.get(system='sys'),
+                    lambda: good.get_public_url(url)]
+            outcomes = {}
+
+            def call(i):
+                try:
+                    outcomes[i] = calls[i]()['system']['slug']
+                except badgekit.BadgeKitException as e:
+                    outcomes[i] = type(e)
+            threads = [threading.Thread(target=call, args=(i,))
+                    for i in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(session.count, 3)
+            self.assertEqual(outcomes[0], 'sys')
+            self.assertNotEqual(outcomes[1], 'sys')
+            self.assertNotEqual(outcomes[2], 'sys')
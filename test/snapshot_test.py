@@ -0,0 +1,126 @@
+from __future__ import unicode_literals
+import os
+import shutil
+import tempfile
+import unittest
+
+import badgekit
+from badgekit.snapshot import export_snapshot, import_snapshot, read_snapshot
+from badgekit.testing import StandInServer
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.filename = os.path.join(self.dir, 'sys.jsonl.gz')
+
+        self.source = StandInServer(secret='s3cret')
+        self.addCleanup(self.source.close)
+        populate = self.source.populate
+        populate('system', [{'slug': 'sys'}])
+        populate('issuer', [{'slug': 'iss%d' % i, 'name': 'Issuer %d' % i}
+            for i in range(3)], system='sys')
+        for i in range(3):
+            populate('program', [{'slug': 'prog%d' % j} for j in range(4)],
+                    system='sys', issuer='iss%d' % i)
+        populate('badge', [{'slug': 'b%d' % k, 'issuer': {'slug': 'iss0'}}
+            for k in range(5)], system='sys', issuer='iss0', program='prog0')
+
+        self.target = StandInServer(secret='s3cret')
+        self.addCleanup(self.target.close)
+        self.target.populate('system', [{'slug': 'sys'}])
+
+        self.src_api = badgekit.BadgeKitAPI(self.source.url, 's3cret')
+        self.addCleanup(self.src_api.close)
+        self.dst_api = badgekit.BadgeKitAPI(self.target.url, 's3cret')
+        self.addCleanup(self.dst_api.close)
+
+    def export(self):
+        return export_snapshot(self.src_api, self.filename, system='sys')
+
+    def test_export(self):
+        stats = self.export()
+        self.assertEqual(stats['kinds'], {'issuer': 3, 'program': 12, 'badge': 5})
+        entries = list(read_snapshot(self.filename))
+        self.assertEqual(len(entries), 20)
+        seen = set()
+        for entry in entries:
+            parent = dict(entry['location'])
+            del parent[entry['kind']]
+            if len(parent) > 1:
+                self.assertIn(tuple(sorted(parent.items())), seen)
+            seen.add(tuple(sorted(entry['location'].items())))
+
+    def test_import(self):
+        self.export()
+        stats = import_snapshot(self.dst_api, self.filename, max_in_flight=4)
+        self.assertEqual(stats['created'], 20)
+        self.assertEqual(stats['levels'], 4)
+        badge = self.dst_api.get(system='sys', issuer='iss0', program='prog0',
+                badge='b3')['badge']
+        self.assertNotIn('issuer', badge)
+        self.assertEqual(self.dst_api.get(system='sys', issuer='iss2')
+                ['issuer']['name'], 'Issuer 2')
+
+    def test_resume(self):
+        self.export()
+        checkpoint = os.path.join(self.dir, 'checkpoint')
+
+        def break_prog2(kind, location, data):
+            data = dict(data)
+            del data['id']
+            if data['slug'] == 'prog2' and location['issuer'] == 'iss1':
+                data['slug'] = ''
+            return data
+
+        with self.assertRaises(badgekit.ValidationError):
+            import_snapshot(self.dst_api, self.filename, checkpoint=checkpoint,
+                    max_in_flight=2, transform=break_prog2)
+        self.assertTrue(os.path.exists(checkpoint))
+        first = sum(count for (method, path), count in self.target.hits.items()
+                if method == 'POST')
+
+        stats = import_snapshot(self.dst_api, self.filename,
+                checkpoint=checkpoint, max_in_flight=2)
+        self.assertEqual(stats['failed'], 0)
+        # Only objects in flight when the first run stopped are sent again.
+        self.assertLessEqual(stats['existing'], 2)
+        # One POST of the first run failed.
+        self.assertEqual(first - 1 + stats['created'], 20)
+        self.assertEqual(len(self.dst_api.list('badge', system='sys',
+            issuer='iss0', program='prog0')['badges']), 5)
+
+        # Once finished, running again does nothing.
+        stats = import_snapshot(self.dst_api, self.filename,
+                checkpoint=checkpoint)
+        self.assertEqual(stats['created'] + stats['existing'], 0)
+
+    def test_nested_fields(self):
+        criteria = [
+                {'description': 'Did one thing', 'required': 'true'},
+                {'description': 'Did another', 'note': 'Optional'},
+                ]
+        self.source.populate('badge', [{'slug': 'crit', 'criteria': criteria,
+            'tags': ['science'], 'issuer': {'slug': 'iss0'}}],
+            system='sys', issuer='iss0', program='prog0')
+        self.export()
+        import_snapshot(self.dst_api, self.filename)
+        badge = self.dst_api.get(system='sys', issuer='iss0', program='prog0',
+                badge='crit')['badge']
+        self.assertEqual(badge['criteria'], criteria)
+        self.assertEqual(badge['tags'], ['science'])
+        self.assertNotIn('issuer', badge)
+
+    def test_overrides(self):
+        self.export()
+        self.target.populate('system', [{'slug': 'other'}])
+        stats = import_snapshot(self.dst_api, self.filename, system='other',
+                keep_going=True)
+        self.assertEqual(stats['created'], 20)
+        self.assertEqual(len(self.dst_api.list('issuer', system='other')
+            ['issuers']), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+from __future__ import unicode_literals
+import unittest
+
+import badgekit
+from badgekit.testing import StandInServer
+
+
+class StandInServerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer(secret='s3cret')
+        self.addCleanup(self.server.close)
+
+    def test_signed_requests(self):
+        bk = badgekit.BadgeKitAPI(self.server.url, 's3cret')
+        self.addCleanup(bk.close)
+        bk.create('system', {'slug': 'sys', 'name': 'System'})
+        self.assertEqual(bk.get(system='sys')['system']['name'], 'System')
+        self.assertEqual(self.server.hits[('POST', '/systems')], 1)
+        self.assertEqual(self.server.hits[('GET', '/systems/sys')], 1)
+
+    def test_wrong_secret(self):
+        bk = badgekit.BadgeKitAPI(self.server.url, 'wrong')
+        self.addCleanup(bk.close)
+        self.assertEqual(bk.server_version(), '0.5.0')
+        with self.assertRaises(badgekit.APIError):
+            bk.list('system')
+
+    def test_populate(self):
+        self.server.populate('system', [{'slug': 'sys'}])
+        self.server.populate('badge',
+                [{'slug': 'b%d' % i} for i in range(5)], system='sys')
+        bk = badgekit.BadgeKitAPI(self.server.url, 's3cret')
+        self.addCleanup(bk.close)
+        badges = bk.list('badge', system='sys')['badges']
+        self.assertEqual([b['slug'] for b in badges],
+                ['b0', 'b1', 'b2', 'b3', 'b4'])
+
+
+if __name__ == '__main__':
+    unittest.main()
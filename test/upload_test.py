@@ -0,0 +1,126 @@
+from __future__ import unicode_literals
+import hashlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import badgekit
+from badgekit.testing import StandInServer
+from badgekit.upload import MultipartBody, Upload
+
+
+class Unseekable(object):
+    "A file that can only be read once, like a pipe."
+    def __init__(self, content):
+        self._file = io.BytesIO(content)
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+
+class UploadTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.content = os.urandom(300 * 1024 + 17)
+        self.path = os.path.join(self.dir, 'super.png')
+        with open(self.path, 'wb') as f:
+            f.write(self.content)
+        self.sha256 = hashlib.sha256(self.content).hexdigest()
+
+        self.server = StandInServer(secret='s3cret')
+        self.addCleanup(self.server.close)
+        self.server.populate('system', [{'slug': 'sys'}])
+        self.api = badgekit.BadgeKitAPI(self.server.url, 's3cret')
+        self.addCleanup(self.api.close)
+
+    def test_create_from_path(self):
+        result = self.api.create('badge', {'slug': 'super', 'name': 'Super',
+            'image': Upload(self.path)}, system='sys')
+        self.assertEqual(result['badge']['name'], 'Super')
+        self.assertEqual(result['badge']['image'], {
+            'filename': 'super.png',
+            'contentType': 'image/png',
+            'size': len(self.content),
+            'sha256': self.sha256,
+            })
+
+    def test_create_with_criteria(self):
+        criteria = [
+                {'description': 'Wrote a test', 'required': 'true'},
+                {'description': 'Had it reviewed', 'note': 'by a peer'},
+                ]
+        result = self.api.create('badge', {'slug': 'super',
+            'criteria': criteria, 'image': Upload(self.path)}, system='sys')
+        self.assertEqual(result['badge']['criteria'], criteria)
+        self.assertEqual(result['badge']['image']['sha256'], self.sha256)
+
+        result = self.api.create('badge', {'slug': 'plain',
+            'criteria': criteria}, system='sys')
+        self.assertEqual(result['badge']['criteria'], criteria)
+
+    def test_create_from_files(self):
+        with open(self.path, 'rb') as f:
+            sources = [f, io.BytesIO(self.content), Unseekable(self.content)]
+            for i, source in enumerate(sources):
+                result = self.api.create('badge', {'slug': 'b%d' % i,
+                    'image': Upload(source, filename='b.png')}, system='sys')
+                self.assertEqual(result['badge']['image']['sha256'],
+                        self.sha256)
+            self.assertFalse(f.closed)
+
+        with open(self.path, 'rb') as f:
+            result = self.api.create('badge', {'slug': 'plain', 'image': f},
+                    system='sys')
+        self.assertEqual(result['badge']['image']['filename'], 'super.png')
+
+    def test_body(self):
+        with MultipartBody({'slug': 'super', 'tags': ['a', 'b'],
+                'image': Upload(self.path)}) as body:
+            self.assertIsNotNone(body._parts[-1][1]._map)
+            whole = b''.join(body)
+            self.assertEqual(len(body), len(whole))
+            self.assertEqual(b''.join(body), whole)
+            self.assertEqual(body.sha256(), hashlib.sha256(whole).hexdigest())
+            self.assertIn(b'name="tags[0]"', whole)
+            self.assertIn(b'name="tags[1]"', whole)
+            self.assertIn(self.content, whole)
+            self.assertTrue(body.content_type.endswith(body.boundary))
+
+        evil = Upload(io.BytesIO(b'x'),
+                filename='a"\r\nX-Injected: 1\r\n\r\n.png')
+        with MultipartBody({'image': evil}) as body:
+            whole = b''.join(body)
+        self.assertIn(b'filename="a%22%0D%0AX-Injected: 1%0D%0A%0D%0A.png"',
+                whole)
+        self.assertNotIn(b'\r\nX-Injected', whole)
+
+        empty = os.path.join(self.dir, 'empty.txt')
+        open(empty, 'wb').close()
+        with MultipartBody({'file': Upload(empty)}) as body:
+            self.assertEqual(len(body), len(b''.join(body)))
+
+    @unittest.skipIf(sys.version_info < (3, 4), 'needs tracemalloc')
+    def test_memory(self):
+        import tracemalloc
+        big = os.path.join(self.dir, 'evidence.bin')
+        with open(big, 'wb') as f:
+            for i in range(20):
+                f.write(b'x' * (1024 * 1024))
+        tracemalloc.start()
+        try:
+            with MultipartBody({'file': Upload(big)}) as body:
+                body.sha256()
+                sent = sum(len(chunk) for chunk in body)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertGreater(sent, 20 * 1024 * 1024)
+        self.assertLess(peak, 1024 * 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
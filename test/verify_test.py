@@ -0,0 +1,132 @@
+from __future__ import unicode_literals
+import hashlib
+import unittest
+
+import badgekit
+from badgekit.testing import StandInServer
+from badgekit.verify import Verifier, _timestamp
+
+
+class VerifierTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer(secret='s3cret', latency=0.005)
+        self.addCleanup(self.server.close)
+        publish = self.server.publish
+        issuer = publish('/public/issuer', {'name': 'Issuer',
+            'url': 'http://issuer.example.org'})
+        self.badges = [publish('/public/badges/b%d' % i, {'name': 'Badge',
+            'criteria': 'http://example.org/criteria', 'issuer': issuer})
+            for i in range(2)]
+        self.urls = [self.publish(n) for n in range(40)]
+        self.api = badgekit.BadgeKitAPI(self.server.url, 's3cret')
+        self.addCleanup(self.api.close)
+
+    def publish(self, n, **extra):
+        salt = 'salt%d' % n
+        identity = hashlib.sha256(
+                ('learner%d@example.org' % n + salt).encode('utf-8')).hexdigest()
+        path = '/public/assertions/%d' % n
+        doc = {
+                'uid': str(n),
+                'recipient': {'type': 'email', 'hashed': True, 'salt': salt,
+                    'identity': 'sha256$' + identity},
+                'badge': self.badges[n % 2],
+                'verify': {'type': 'hosted', 'url': self.server.url + path[1:]},
+                'issuedOn': '2014-06-01',
+                }
+        doc.update(extra)
+        return self.server.publish(path, doc)
+
+    def hits(self, path):
+        return self.server.hits.get(('GET', path), 0)
+
+    def test_shared_fetches(self):
+        verifier = Verifier(self.api, max_workers=8)
+        results = list(verifier.verify(self.urls))
+        self.assertEqual([r.url for r in results], self.urls)
+        self.assertTrue(all(r.valid for r in results), results)
+        self.assertEqual(self.hits('/public/issuer'), 1)
+        self.assertEqual(self.hits('/public/badges/b0'), 1)
+        self.assertEqual(results[0].issuer['name'], 'Issuer')
+        self.assertEqual(verifier.stats['assertions'], 40)
+        self.assertEqual(verifier.stats['fetches'], 43)
+        # Each assertion looks up a badge class and an issuer.
+        self.assertEqual(verifier.stats['shared'], 80 - 3)
+
+    def test_invalid(self):
+        self.publish(1, revoked=True)
+        self.publish(2, expires=1000)
+        self.publish(3, badge=self.server.url + 'public/badges/missing')
+        self.publish(4, verify=None)
+
+        verifier = Verifier(self.api)
+        results = list(verifier.verify(self.urls[:6] + [
+            (self.urls[5], 'learner5@example.org'),
+            (self.urls[5], 'someone@example.org'),
+            self.server.url + 'public/assertions/missing']))
+        self.assertEqual([r.valid for r in results],
+                [True, False, False, False, False, True, True, False, False])
+        self.assertEqual(results[1].errors, ['assertion has been revoked'])
+        self.assertEqual(results[2].errors, ['assertion has expired'])
+        self.assertIn('badge class could not be fetched', results[3].errors[0])
+        self.assertEqual(results[4].errors, ['assertion has no verify'])
+        self.assertEqual(results[7].errors,
+                ['assertion was not issued to someone@example.org'])
+        self.assertIn('assertion could not be fetched', results[8].errors[0])
+        self.assertEqual(verifier.stats['valid'], 3)
+        self.assertEqual(verifier.stats['invalid'], 6)
+
+    def test_failed_fetch_retried(self):
+        missing = self.server.url + 'public/badges/later'
+        url = self.publish(1, badge=missing)
+        verifier = Verifier(self.api)
+        result = list(verifier.verify([url]))[0]
+        self.assertIn('badge class could not be fetched', result.errors[0])
+
+        self.server.publish('/public/badges/later', {'name': 'Badge',
+            'criteria': 'http://example.org/criteria',
+            'issuer': self.server.url + 'public/issuer'})
+        result = list(verifier.verify([url]))[0]
+        self.assertTrue(result.valid, result.errors)
+
+    def test_embedded_documents(self):
+        self.publish(1, badge={'name': 'Embedded'})
+        self.server.publish('/public/badges/b9', {'name': 'Badge',
+            'criteria': 'http://example.org/criteria',
+            'issuer': {'name': 'Embedded'}})
+        self.publish(2, badge=self.server.url + 'public/badges/b9')
+        results = list(Verifier(self.api).verify(self.urls[:4]))
+        self.assertEqual([r.valid for r in results], [True, False, False, True])
+        self.assertEqual(results[1].errors,
+                ['assertion does not link to its badge class'])
+        self.assertEqual(results[2].errors,
+                ['badge class does not link to its issuer'])
+
+    def test_streamed(self):
+        taken = []
+
+        def items():
+            for url in self.urls:
+                taken.append(url)
+                yield url
+
+        results = Verifier(self.api, max_workers=4).verify(items())
+        self.assertTrue(next(results).valid)
+        self.assertLessEqual(len(taken), 5)
+        self.assertEqual(len(list(results)), 39)
+        self.assertEqual(len(taken), 40)
+
+
+class TimestampTest(unittest.TestCase):
+    def test_timestamp(self):
+        self.assertEqual(_timestamp(1402000000), 1402000000)
+        self.assertEqual(_timestamp('1402000000'), 1402000000)
+        self.assertEqual(_timestamp('2014-06-05T20:26:40Z'), 1402000000)
+        self.assertEqual(_timestamp('2014-06-05T22:26:40+02:00'), 1402000000)
+        self.assertEqual(_timestamp('2014-06-05'), 1401926400)
+        for unreadable in ('2030', '2014-02-30', 'soon', True, None, {}):
+            self.assertIsNone(_timestamp(unreadable))
+
+
+if __name__ == '__main__':
+    unittest.main()
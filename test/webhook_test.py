@@ -0,0 +1,185 @@
+from __future__ import unicode_literals
+import io
+import json
+import time
+import unittest
+try:
+    from urllib import unquote as unquote_to_bytes
+except ImportError:
+    from urllib.parse import unquote_to_bytes
+from wsgiref.util import setup_testing_defaults
+
+import jwt
+import requests
+
+from badgekit.api import _make_auth
+from badgekit.webhook import (WebhookError, WebhookMiddleware,
+        WebhookVerifier, token_from_header)
+
+
+def sign(method, url, body=None, secret='s3cret', key='master'):
+    "Returns a request signed as BadgeKit API signs webhook calls."
+    request = requests.Request(method, url, data=body).prepare()
+    return _make_auth(secret, key)(request)
+
+
+class WebhookVerifierTest(unittest.TestCase):
+    def setUp(self):
+        self.verifier = WebhookVerifier({'master': 's3cret', 'other': 'x'})
+
+    def check(self, request, method=None, path=None, body=None):
+        if body is None:
+            body = (request.body or '').encode('utf-8')
+        return self.verifier.verify(request.headers['Authorization'],
+                method or request.method, path or request.path_url, body)
+
+    def test_valid(self):
+        request = sign('POST', 'http://example.com/hooks/award?x=1',
+                json.dumps({'action': 'award'}))
+        claims = self.check(request)
+        self.assertEqual(claims['key'], 'master')
+        self.assertEqual(claims['path'], '/hooks/award?x=1')
+
+        request = sign('GET', 'http://example.com/hooks/ping')
+        self.assertEqual(self.check(request)['method'], 'GET')
+
+        request = sign('GET', 'http://example.com/hooks/ping', key='other',
+                secret='x')
+        self.assertEqual(self.check(request)['key'], 'other')
+
+    def test_single_secret(self):
+        verifier = WebhookVerifier('s3cret')
+        request = sign('GET', 'http://example.com/hooks/ping')
+        token = token_from_header(request.headers['Authorization'])
+        self.assertEqual(verifier.verify(token, 'GET', '/hooks/ping')['key'],
+                'master')
+        self.assertEqual(
+                verifier.verify('Bearer ' + token, 'GET', '/hooks/ping')['key'],
+                'master')
+
+    def assertRejected(self, message, *args, **kwargs):
+        with self.assertRaises(WebhookError) as cm:
+            self.check(*args, **kwargs)
+        self.assertIn(message, str(cm.exception))
+
+    def test_rejected(self):
+        request = sign('POST', 'http://example.com/hooks/award', 'a=1')
+        self.assertRejected('not', request, method='PUT')
+        self.assertRejected('not', request, path='/hooks/claim')
+        self.assertRejected('body does not match', request, body=b'a=2')
+        self.assertRejected('Unknown key',
+                sign('GET', 'http://example.com/', key='nobody'))
+        self.assertRejected('signature does not match',
+                sign('GET', 'http://example.com/', secret='wrong'))
+
+        request = sign('GET', 'http://example.com/')
+        request.headers['Authorization'] = 'Basic dXNlcjpwYXNz'
+        self.assertRejected('holds no JWT', request)
+        request.headers['Authorization'] = 'JWT token="nonsense"'
+        self.assertRejected('not a JWT', request)
+
+    def test_algorithm(self):
+        token = jwt.encode({'key': 'master', 'method': 'GET', 'path': '/',
+            'exp': time.time() + 30}, 's3cret', algorithm='HS512')
+        self.assertRaises(WebhookError, self.verifier.verify,
+                token.decode('ascii'), 'GET', '/')
+        token = jwt.encode({'key': 'master', 'method': 'GET', 'path': '/',
+            'exp': time.time() + 30}, None, algorithm='none')
+        self.assertRaises(WebhookError, self.verifier.verify,
+                token.decode('ascii'), 'GET', '/')
+
+    def test_expiry(self):
+        request = sign('GET', 'http://example.com/')
+        header = request.headers['Authorization']
+        self.verifier.verify(header, 'GET', '/', now=time.time() + 29)
+        self.assertRaises(WebhookError, self.verifier.verify, header, 'GET',
+                '/', now=time.time() + 31)
+        lenient = WebhookVerifier('s3cret', leeway=60)
+        lenient.verify(header, 'GET', '/', now=time.time() + 31)
+
+        token = jwt.encode({'key': 'master', 'method': 'GET', 'path': '/'},
+                's3cret').decode('ascii')
+        self.assertRaises(WebhookError, self.verifier.verify, token, 'GET', '/')
+        WebhookVerifier('s3cret', require_exp=False).verify(token, 'GET', '/')
+
+    def test_verify_many(self):
+        good = sign('POST', 'http://example.com/hooks', 'a=1')
+        bad = sign('POST', 'http://example.com/hooks', 'a=1', secret='wrong')
+        calls = [(r.headers['Authorization'], 'POST', '/hooks', b'a=1')
+                for r in (good, bad, good)]
+        results = self.verifier.verify_many(calls)
+        self.assertEqual([r.valid for r in results], [True, False, True])
+        self.assertEqual(results[0].claims['path'], '/hooks')
+        self.assertIsInstance(results[1].error, WebhookError)
+
+
+def hello(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    claims = environ.get('badgekit.webhook') or {}
+    return [environ['wsgi.input'].read() + b' ' +
+            claims.get('key', 'none').encode('utf-8')]
+
+
+class WebhookMiddlewareTest(unittest.TestCase):
+    def call(self, app, request, path=None, raw=False, chunked=False):
+        # Servers decode the path, and give it as latin-1.
+        target = path or request.path_url
+        path, _, query = target.partition('?')
+        environ = {
+                'REQUEST_METHOD': request.method,
+                'PATH_INFO': unquote_to_bytes(path).decode('latin-1'),
+                'QUERY_STRING': query,
+                'HTTP_AUTHORIZATION': request.headers['Authorization'],
+                }
+        if raw:
+            environ['RAW_URI'] = target
+        body = (request.body or '').encode('utf-8')
+        if chunked:
+            environ['wsgi.input_terminated'] = True
+        else:
+            environ['CONTENT_LENGTH'] = str(len(body))
+        environ['wsgi.input'] = io.BytesIO(body)
+        setup_testing_defaults(environ)
+        statuses = []
+        output = app(environ, lambda status, headers: statuses.append(status))
+        return statuses[0], b''.join(output)
+
+    def test_wsgi(self):
+        app = WebhookMiddleware(hello, WebhookVerifier('s3cret'),
+                prefix='/hooks/')
+        request = sign('POST', 'http://example.com/hooks/award', 'a=1')
+        self.assertEqual(self.call(app, request), ('200 OK', b'a=1 master'))
+
+        status, body = self.call(app, request, path='/hooks/claim')
+        self.assertEqual(status, '403 Forbidden')
+        self.assertEqual(json.loads(body.decode('utf-8'))['code'],
+                'Unauthorized')
+
+        request = sign('POST', 'http://example.com/other', 'a=1',
+                secret='wrong')
+        self.assertEqual(self.call(app, request), ('200 OK', b'a=1 none'))
+
+    def test_chunked(self):
+        # With no Content-Length, the body is read to the end of the input.
+        app = WebhookMiddleware(hello, WebhookVerifier('s3cret'))
+        request = sign('POST', 'http://example.com/hooks/award', 'a=1')
+        self.assertEqual(self.call(app, request, chunked=True),
+                ('200 OK', b'a=1 master'))
+
+    def test_encoded_path(self):
+        app = WebhookMiddleware(hello, WebhookVerifier('s3cret'))
+        request = sign('POST', 'http://example.com/hooks/my badge?to=a%20b',
+                'a=1')
+        self.assertEqual(request.path_url, '/hooks/my%20badge?to=a%20b')
+        self.assertEqual(self.call(app, request), ('200 OK', b'a=1 master'))
+        self.assertEqual(self.call(app, request, raw=True),
+                ('200 OK', b'a=1 master'))
+
+        # Only the path as sent tells an encoded slash from a real one.
+        request = sign('POST', 'http://example.com/hooks/a%2Fb', 'a=1')
+        self.assertEqual(self.call(app, request, raw=True),
+                ('200 OK', b'a=1 master'))
+
+
+if __name__ == '__main__':
+    unittest.main()